@@ -52,6 +52,8 @@ ALLOWED_EXTERNAL_SERVICES = [
 ]
 
 MIDDLEWARE = [
+    'myapp.metrics.MetricsMiddleware',
+    'myapp.resilience.DeadlineMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,138 @@ MIDDLEWARE = [
 ]
 
 BLOCKCYPHER_API_KEY = config('SECRET_KEY')
+COIN_SYMBOL = config('COIN_SYMBOL')
+
+# Chain data provider (myapp.providers.FakeProvider serves an in-memory chain for offline load tests)
+CHAIN_PROVIDER = config('CHAIN_PROVIDER', default='myapp.providers.BlockCypherProvider')
+CHAIN_PROVIDER_FIXTURES = config('CHAIN_PROVIDER_FIXTURES', default='')  # JSON file seeding FakeProvider
+# Injected into every upstream call when set (load tests against FakeProvider, see manage.py benchmark load)
+CHAIN_FAULT_LATENCY = config('CHAIN_FAULT_LATENCY', default=0, cast=float)  # seconds
+CHAIN_FAULT_JITTER = config('CHAIN_FAULT_JITTER', default=0, cast=float)  # seconds, +/- around the latency
+CHAIN_FAULT_ERROR_RATE = config('CHAIN_FAULT_ERROR_RATE', default=0, cast=float)  # fraction raising connection errors
+CHAIN_FAULT_RATE_LIMIT_RATE = config('CHAIN_FAULT_RATE_LIMIT_RATE', default=0, cast=float)  # fraction answering 429
+BLOCKCYPHER_TIMEOUT = config('BLOCKCYPHER_TIMEOUT', default=10, cast=float)  # seconds
+BLOCKCYPHER_POOL_SIZE = config('BLOCKCYPHER_POOL_SIZE', default=10, cast=int)  # keep-alive connections per worker
+BLOCKCYPHER_BATCH_SIZE = config('BLOCKCYPHER_BATCH_SIZE', default=100, cast=int)  # addresses per batched balance call
+
+# Local block-file index (manage.py index_blocks; use with CHAIN_PROVIDER=myapp.blockindex.LocalIndexProvider)
+BLOCK_INDEX_BLOCKS_DIR = config('BLOCK_INDEX_BLOCKS_DIR', default='')  # the node's blocks/ dir with blk*.dat
+BLOCK_INDEX_PATH = config('BLOCK_INDEX_PATH', default=str(BASE_DIR / 'blockindex.sqlite3'))
+# Answers what the index cannot: mempool, fees, broadcasts
+BLOCK_INDEX_FALLBACK = config('BLOCK_INDEX_FALLBACK', default='myapp.providers.BlockCypherProvider')
+BLOCK_INDEX_WORKERS = config('BLOCK_INDEX_WORKERS', default=4, cast=int)  # block parser processes
+BLOCK_INDEX_BATCH = 200  # blocks parsed and committed together
+BLOCK_INDEX_UNDO_DEPTH = 100  # blocks of spent outputs kept to roll back reorgs
+BLOCK_INDEX_INTERVAL = config('BLOCK_INDEX_INTERVAL', default=30, cast=int)  # seconds between catch-up runs
+
+# Upstream budget shared by every request in a worker (0 disables the limit)
+CHAIN_RATE_PER_SECOND = config('CHAIN_RATE_PER_SECOND', default=3, cast=float)
+CHAIN_RATE_BURST = config('CHAIN_RATE_BURST', default=5, cast=int)
+CHAIN_RATE_RESERVE = config('CHAIN_RATE_RESERVE', default=2, cast=int)  # tokens background calls may not use
+CHAIN_QUEUE_TIMEOUT = config('CHAIN_QUEUE_TIMEOUT', default=5, cast=float)  # seconds a request may queue for a token
+
+# Upstream deadlines and circuit breakers (myapp.resilience)
+UPSTREAM_DEADLINE = config('UPSTREAM_DEADLINE', default=8, cast=float)  # seconds of upstream time per request
+UPSTREAM_DEADLINES = {  # per URL name; reads with a stored fallback get the tightest budgets
+    'send_testnet_bitcoin': 8,
+    'send_batch': 15,
+    'get_confirmations': 3,
+    'get_book_details': 2,
+    'get_address_history': 3,
+    'create_book': 5,
+    'import_addresses': 60,
+}
+CHAIN_BREAKER_FAILURES = config('CHAIN_BREAKER_FAILURES', default=5, cast=int)  # consecutive failures that open it
+CHAIN_BREAKER_RESET = config('CHAIN_BREAKER_RESET', default=30, cast=float)  # seconds before a trial call
+
+# Confirmation tracker: one chain-tip poll per interval instead of one upstream call per client poll
+CONFIRMATION_POLL_INTERVAL = config('CONFIRMATION_POLL_INTERVAL', default=30, cast=int)  # seconds
+CONFIRMATION_TRACK_DEPTH = 6  # stop tracking transactions buried deeper than this
+CONFIRMATION_MAX_TRACKED = 10000
+# Hashes clients ask about that upstream has not returned yet; dropped after this many not-found lookups
+CONFIRMATION_MAX_UNVERIFIED = 1000
+CONFIRMATION_MAX_MISSES = 3
+CONFIRMATION_BATCH_LIMIT = 500  # hashes per batch status request
+CONFIRMATION_STREAM_TIMEOUT = config('CONFIRMATION_STREAM_TIMEOUT', default=25, cast=int)  # seconds per SSE connection
+CONFIRMATION_STREAM_RETRY = 5  # seconds EventSource waits before reconnecting for the next window
+
+# Fee rates (myapp.fees)
+FEE_REFRESH_INTERVAL = config('FEE_REFRESH_INTERVAL', default=60, cast=int)  # seconds between background refreshes
+FEE_MAX_AGE = 6 * 60 * 60  # seconds before stored rates are too old to use after a restart
+FEE_DEFAULT_TIER = config('FEE_DEFAULT_TIER', default='fast')  # fast, normal or economy
+
+# Per-address UTXO sets for sends (myapp.utxo_cache)
+UTXO_CACHE_TTL = config('UTXO_CACHE_TTL', default=300, cast=int)  # seconds; new blocks and n_tx changes refresh sooner
+UTXO_CACHE_SIZE = config('UTXO_CACHE_SIZE', default=10000, cast=int)  # addresses kept in memory per worker
+UTXO_PENDING_TTL = 60 * 60  # seconds an output spent by a queued broadcast stays out of coin selection
+
+# Batch payouts (myapp.payouts)
+PAYOUT_BATCH_LIMIT = 1000  # recipients per batch request
+PAYOUT_MAX_OUTPUTS = 250  # recipients per transaction when a batch is split
+
+# Upstream responses shared by all workers on the host (myapp.shared_cache; '' turns it off)
+SHARED_CACHE_PATH = config('SHARED_CACHE_PATH', default=str(BASE_DIR / 'upstream_cache.sqlite3'))
+SHARED_CACHE_MAX_BYTES = config('SHARED_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)  # packed values
+SHARED_CACHE_LEASE = 2  # seconds other workers wait for the one fetching a missing key
+SHARED_CACHE_ADDRESS_TTL = 60  # seconds; well under ADDRESS_FRESH_TTL so refreshes still see new data
+SHARED_CACHE_UNSPENT_TTL = 30  # seconds; keys also change with the chain tip and the stored n_tx
+SHARED_CACHE_RAW_TX_TTL = 24 * 60 * 60  # seconds; a transaction's bytes never change
+
+# Broadcast outbox (drained by in-process workers and/or manage.py run_outbox)
+# Start workers in each web process on its first request (the test suite turns this off); without them run manage.py run_outbox
+OUTBOX_IN_PROCESS = config('OUTBOX_IN_PROCESS', default=True, cast=bool)
+OUTBOX_WORKERS = config('OUTBOX_WORKERS', default=2, cast=int)
+OUTBOX_POLL_INTERVAL = config('OUTBOX_POLL_INTERVAL', default=5, cast=int)  # seconds between scans for due rows
+OUTBOX_LEASE = 60  # seconds a worker owns a claimed row before others may retry it
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_BACKOFF_BASE = 2  # seconds before the first retry, doubled on every attempt
+OUTBOX_BACKOFF_MAX = 600
+
+# Request/upstream metrics (served at /metrics/ in the Prometheus text format)
+METRICS_PROFILE_SLOW_REQUESTS = config('METRICS_PROFILE_SLOW_REQUESTS', default=False, cast=bool)  # sample stacks
+METRICS_SLOW_REQUEST_SECONDS = config('METRICS_SLOW_REQUEST_SECONDS', default=1.0, cast=float)  # report above this
+METRICS_PROFILE_INTERVAL = 0.01  # seconds between stack samples
+
+# Cold start (manage.py startup_report): django.setup() plus ROOT_URLCONF must stay under the budget
+# without importing the chain/numeric libraries myapp.lazy defers (requests comes in with DRF anyway)
+STARTUP_BUDGET = config('STARTUP_BUDGET', default=1.0, cast=float)  # seconds
+STARTUP_DEFERRED_MODULES = ('numpy', 'httpx', 'blockcypher', 'bit', 'bitcoin')
+
+# Serve send/broadcast/confirmation from myapp.async_views (run under uvicorn with caseStudy.asgi)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Offline address validation
+ADDRESS_VALIDATION_BATCH_LIMIT = 10000  # addresses per bulk validation request
+
+# Bulk address import
+ADDRESS_IMPORT_MAX = 20000  # addresses per import request; use the import_addresses command for more
+ADDRESS_IMPORT_WORKERS = config('ADDRESS_IMPORT_WORKERS', default=4, cast=int)  # concurrent upstream batches
+
+# Transaction history (TxRef store)
+TXREF_SYNC_TTL = config('TXREF_SYNC_TTL', default=60, cast=int)  # seconds between upstream deltas per address
+TXREF_REORG_DEPTH = 6  # blocks below the high-water mark that are re-fetched on every sync
+HISTORY_PAGE_DEFAULT_LIMIT = 50
+HISTORY_PAGE_MAX_LIMIT = 500
+
+# Address list (keyset pages; ?export=json|ndjson streams everything)
+ADDRESS_LIST_DEFAULT_LIMIT = 100
+ADDRESS_LIST_MAX_LIMIT = 1000
+
+# Address search (prefix index used by the address dropdown)
+ADDRESS_SEARCH_DEFAULT_LIMIT = 20
+ADDRESS_SEARCH_MAX_LIMIT = 100
+ADDRESS_INDEX_TTL = config('ADDRESS_INDEX_TTL', default=300, cast=int)  # seconds, picks up rows added by other workers
+
+# Address details cache (stale-while-revalidate)
+ADDRESS_FRESH_TTL = config('ADDRESS_FRESH_TTL', default=30 * 60, cast=int)  # seconds before a background refresh
+ADDRESS_CACHE_TTL = config('ADDRESS_CACHE_TTL', default=60, cast=int)  # seconds before re-reading the row from the DB
+ADDRESS_CACHE_SIZE = config('ADDRESS_CACHE_SIZE', default=10000, cast=int)  # entries kept in memory per worker
+ADDRESS_REFRESH_WORKERS = config('ADDRESS_REFRESH_WORKERS', default=2, cast=int)
+
+# Background refresher (manage.py refresh_addresses)
+ADDRESS_REFRESH_INTERVAL = config('ADDRESS_REFRESH_INTERVAL', default=60, cast=int)  # seconds between cycles
+ADDRESS_REFRESH_LIMIT = config('ADDRESS_REFRESH_LIMIT', default=500, cast=int)  # rows refreshed per cycle at most
+ADDRESS_REFRESH_RETRY = 10 * 60  # seconds before retrying rows upstream did not return
 
 ROOT_URLCONF = 'caseStudy.urls'
 
@@ -129,6 +263,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# The React build (npm run build) served by myapp.static_assets; run manage.py compress_static after building
+FRONTEND_BUILD_DIR = config('FRONTEND_BUILD_DIR',
+                            default=str(BASE_DIR.parent.parent / 'frontend' / 'my-react-app' / 'build'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -1,13 +1,27 @@
-from django.views.generic import TemplateView
-from myapp import views
+from django.conf import settings
+from myapp import async_views, views
 from django.urls import path, re_path
 
+chain_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('send_bitcoin/', views.get_transaction_data, name='send_testnet_bitcoin'),
-    path('broadcast_bitcoin/', views.broadcast_signed_transaction, name='broadcast_signed_transaction'),
-    path('get_confirmations/', views.get_confirmations, name='get_confirmations'),
+    path('send_bitcoin/', chain_views.get_transaction_data, name='send_testnet_bitcoin'),
+    path('send_bitcoin/batch/', views.send_batch, name='send_batch'),
+    path('broadcast_bitcoin/', chain_views.broadcast_signed_transaction, name='broadcast_signed_transaction'),
+    path('broadcast_bitcoin/status/<str:tx_hash>/', views.get_broadcast_status, name='broadcast_status'),
+    path('get_confirmations/', chain_views.get_confirmations, name='get_confirmations'),
+    path('get_confirmations/batch/', views.get_confirmations_batch, name='get_confirmations_batch'),
+    path('get_confirmations/stream/<str:tx_hash>/', chain_views.stream_confirmations, name='stream_confirmations'),
     path('path/to/get_addresses_endpoint/', views.get_addresses, name='get_books'),
+    path('path/to/search_addresses_endpoint/', views.search_addresses, name='search_books'),
+    path('api/validate-addresses/', views.validate_addresses, name='validate_addresses'),
     path('path/to/create_address_endpoint/', views.create_address, name='create_book'),
+    path('api/import-addresses/', views.import_addresses, name='import_addresses'),
     path('api/path-to-details/<str:bookId>/', views.get_address_details, name='get_book_details'),
-    re_path(r'^.*$', TemplateView.as_view(template_name="index.html")),
+    path('api/history/<str:bookId>/', views.get_address_history, name='get_address_history'),
+    path('api/fees/', views.get_fee_rates, name='fee_rates'),
+    path('api/upstream-stats/', views.get_upstream_stats, name='upstream_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('static/<path:path>', views.static_file, name='static_file'),
+    re_path(r'^(?P<path>.*)$', views.index, name='index'),
 ]
@@ -0,0 +1,86 @@
+"""
+Fast read path for the address list.
+
+Rows are read as ``values_list`` tuples and turned straight into dicts, skipping model instances
+and ModelSerializer. Pages use keyset pagination on ``(created_at, id)``, newest first, and full
+exports stream as JSON or NDJSON straight off a server-side iterator.
+"""
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Address
+from .serializers import AddressSerializer
+
+# Same keys, in the same order, as AddressSerializer
+FIELDS = [field.name for field in Address._meta.concrete_fields
+          if AddressSerializer.Meta.fields == '__all__' or field.name in AddressSerializer.Meta.fields]
+
+EXPORT_CHUNK_SIZE = 2000
+
+_encoder = JSONEncoder()
+
+
+def encode_cursor(created_at, pk):
+    micros = int(created_at.timestamp()) * 1000000 + created_at.microsecond
+    return '%d:%d' % (micros, pk)
+
+
+def decode_cursor(cursor):
+    micros, pk = cursor.split(':')
+    seconds, microsecond = divmod(int(micros), 1000000)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(microsecond=microsecond), int(pk)
+
+
+def _rows(queryset):
+    return (dict(zip(FIELDS, row)) for row in queryset.values_list(*FIELDS))
+
+
+def address_page(before=None, limit=None):
+    """
+    Returns (rows, next_cursor), newest first. ``before`` is the cursor of the previous page's
+    last row; ``next_cursor`` is None on the last page. Raises ValueError for a malformed cursor.
+    """
+    if limit is None:
+        limit = settings.ADDRESS_LIST_DEFAULT_LIMIT
+    limit = max(1, min(limit, settings.ADDRESS_LIST_MAX_LIMIT))
+    queryset = Address.objects.order_by('-created_at', '-id')
+    if before is not None:
+        created_at, pk = decode_cursor(before)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    # One extra row tells us whether another page exists
+    rows = list(_rows(queryset[:limit + 1]))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return rows, None
+
+
+def _batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_addresses(fmt):
+    """
+    Every row, newest first, as an iterator of ``json`` array or ``ndjson`` text chunks.
+    """
+    # iterator() streams from the cursor instead of caching the whole table in the queryset
+    rows = Address.objects.order_by('-created_at', '-id').values_list(*FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    # Rows are written in batches so the server does one write per chunk, not per row
+    batches = _batches((_encoder.encode(dict(zip(FIELDS, row))) for row in rows), EXPORT_CHUNK_SIZE)
+    if fmt == 'ndjson':
+        for batch in batches:
+            yield '\n'.join(batch) + '\n'
+        return
+    yield '['
+    for i, batch in enumerate(batches):
+        yield (',' if i else '') + ','.join(batch)
+    yield ']'
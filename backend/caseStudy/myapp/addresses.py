@@ -0,0 +1,242 @@
+"""
+Offline Bitcoin address codec: base58check (P2PKH/P2SH) and bech32/bech32m (segwit, BIP173/BIP350).
+
+Validation never touches the network, checks the checksum and the network prefix for the
+configured coin, and is memoized so repeated lookups of the same address are a dict hit.
+"""
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+NETWORKS = {
+    'btc': {'p2pkh': 0x00, 'p2sh': 0x05, 'hrp': 'bc'},
+    'btc-testnet': {'p2pkh': 0x6f, 'p2sh': 0xc4, 'hrp': 'tb'},
+    'bcy': {'p2pkh': 0x1b, 'p2sh': 0x1f, 'hrp': 'bcy'},
+}
+
+VALIDATION_CACHE_SIZE = 65536
+
+DecodedAddress = namedtuple('DecodedAddress', ['type', 'witness_version', 'payload'])
+
+B58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+B58_INDEX = {c: i for i, c in enumerate(B58_ALPHABET)}
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_INDEX = {c: i for i, c in enumerate(BECH32_CHARSET)}
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+
+class AddressError(ValueError):
+    pass
+
+
+def _sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def b58encode_check(payload):
+    data = payload + _sha256d(payload)[:4]
+    n = int.from_bytes(data, 'big')
+    chars = []
+    while n:
+        n, r = divmod(n, 58)
+        chars.append(B58_ALPHABET[r])
+    pad = len(data) - len(data.lstrip(b'\0'))
+    return '1' * pad + ''.join(reversed(chars))
+
+
+def b58decode_check(address):
+    n = 0
+    for c in address:
+        try:
+            n = n * 58 + B58_INDEX[c]
+        except KeyError:
+            raise AddressError("Invalid base58 character %r" % c)
+    pad = len(address) - len(address.lstrip('1'))
+    data = b'\0' * pad + (n.to_bytes((n.bit_length() + 7) // 8, 'big') if n else b'')
+    if len(data) < 5:
+        raise AddressError("Base58 payload too short")
+    payload, checksum = data[:-4], data[-4:]
+    if _sha256d(payload)[:4] != checksum:
+        raise AddressError("Bad base58 checksum")
+    return payload
+
+
+def _bech32_polymod(values):
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _hrp_expand(hrp):
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convertbits(data, frombits, tobits, pad):
+    acc = 0
+    bits = 0
+    out = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            out.append((acc >> bits) & maxv)
+    if pad:
+        if bits:
+            out.append((acc << (tobits - bits)) & maxv)
+    elif bits >= frombits or ((acc << (tobits - bits)) & maxv):
+        raise AddressError("Invalid bech32 padding")
+    return out
+
+
+def bech32_encode(hrp, witness_version, program):
+    const = BECH32_CONST if witness_version == 0 else BECH32M_CONST
+    data = [witness_version] + _convertbits(program, 8, 5, True)
+    polymod = _bech32_polymod(_hrp_expand(hrp) + data + [0] * 6) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(BECH32_CHARSET[d] for d in data + checksum)
+
+
+def bech32_decode(hrp, address):
+    """
+    Decode a segwit address for ``hrp`` and return (witness version, program bytes).
+    """
+    if address.lower() != address and address.upper() != address:
+        raise AddressError("Mixed-case bech32 address")
+    address = address.lower()
+    pos = address.rfind('1')
+    if pos < 1 or pos + 7 > len(address) or len(address) > 90:
+        raise AddressError("Invalid bech32 length")
+    if address[:pos] != hrp:
+        raise AddressError("Wrong network prefix")
+    try:
+        data = [BECH32_INDEX[c] for c in address[pos + 1:]]
+    except KeyError:
+        raise AddressError("Invalid bech32 character")
+    const = _bech32_polymod(_hrp_expand(hrp) + data)
+    if const not in (BECH32_CONST, BECH32M_CONST):
+        raise AddressError("Bad bech32 checksum")
+
+    witness_version = data[0]
+    program = bytes(_convertbits(data[1:-6], 5, 8, False))
+    if witness_version > 16 or not 2 <= len(program) <= 40:
+        raise AddressError("Invalid witness program")
+    if witness_version == 0 and len(program) not in (20, 32):
+        raise AddressError("Invalid witness v0 program length")
+    # BIP350: version 0 uses bech32, every later version bech32m
+    if (witness_version == 0) != (const == BECH32_CONST):
+        raise AddressError("Wrong checksum variant for witness version")
+    return witness_version, program
+
+
+def decode_address(address, coin_symbol):
+    """
+    Decode ``address`` for ``coin_symbol`` into a DecodedAddress; raises AddressError when invalid.
+    """
+    if not isinstance(address, str) or not address:
+        raise AddressError("Address must be a non-empty string")
+    try:
+        network = NETWORKS[coin_symbol]
+    except KeyError:
+        raise AddressError("Unsupported coin symbol %r" % coin_symbol)
+
+    if address.lower().startswith(network['hrp'] + '1'):
+        witness_version, program = bech32_decode(network['hrp'], address)
+        if witness_version == 0:
+            address_type = 'p2wpkh' if len(program) == 20 else 'p2wsh'
+        elif witness_version == 1 and len(program) == 32:
+            address_type = 'p2tr'
+        else:
+            address_type = 'witness_unknown'
+        return DecodedAddress(address_type, witness_version, program)
+
+    if not 26 <= len(address) <= 35:
+        raise AddressError("Invalid base58 address length")
+    payload = b58decode_check(address)
+    if len(payload) != 21:
+        raise AddressError("Invalid base58 payload length")
+    if payload[0] == network['p2pkh']:
+        return DecodedAddress('p2pkh', None, payload[1:])
+    if payload[0] == network['p2sh']:
+        return DecodedAddress('p2sh', None, payload[1:])
+    raise AddressError("Wrong network prefix")
+
+
+def script_pubkey(address, coin_symbol):
+    """
+    The output script (bytes) paying to ``address``; raises AddressError when invalid.
+    """
+    decoded = decode_address(address, coin_symbol)
+    if decoded.type == 'p2pkh':
+        # OP_DUP OP_HASH160 <20 bytes> OP_EQUALVERIFY OP_CHECKSIG
+        return b'\x76\xa9\x14' + decoded.payload + b'\x88\xac'
+    if decoded.type == 'p2sh':
+        # OP_HASH160 <20 bytes> OP_EQUAL
+        return b'\xa9\x14' + decoded.payload + b'\x87'
+    # OP_0 or OP_1..OP_16, then the witness program push
+    version_op = 0 if decoded.witness_version == 0 else 0x50 + decoded.witness_version
+    return bytes([version_op, len(decoded.payload)]) + decoded.payload
+
+
+def script_address(script, coin_symbol):
+    """
+    The address an output script pays to, or None for scripts without one (bare multisig, OP_RETURN, ...).
+    """
+    network = NETWORKS[coin_symbol]
+    size = len(script)
+    if size == 25 and script[:3] == b'\x76\xa9\x14' and script[23:] == b'\x88\xac':
+        return b58encode_check(bytes([network['p2pkh']]) + bytes(script[3:23]))
+    if size == 23 and script[:2] == b'\xa9\x14' and script[22] == 0x87:
+        return b58encode_check(bytes([network['p2sh']]) + bytes(script[2:22]))
+    if 4 <= size <= 42 and (script[0] == 0 or 0x51 <= script[0] <= 0x60) and script[1] + 2 == size:
+        witness_version = 0 if script[0] == 0 else script[0] - 0x50
+        if witness_version == 0 and size not in (22, 34):
+            return None
+        return bech32_encode(network['hrp'], witness_version, bytes(script[2:]))
+    return None
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def address_type(address, coin_symbol):
+    """
+    Memoized address type ('p2pkh', 'p2wpkh', ...) or None when the address is invalid.
+    """
+    try:
+        return decode_address(address, coin_symbol).type
+    except AddressError:
+        return None
+
+
+def normalize_address(address, coin_symbol):
+    """
+    The form ``address`` (or a prefix of one) is stored and compared in. Bech32 is case-insensitive,
+    so it is lower-cased; base58 is case-sensitive and returned unchanged.
+    """
+    hrp = NETWORKS.get(coin_symbol, {}).get('hrp')
+    if hrp and address.lower().startswith(hrp + '1'):
+        return address.lower()
+    return address
+
+
+def is_valid_address(address, coin_symbol):
+    if not isinstance(address, str):
+        return False
+    return address_type(address, coin_symbol) is not None
+
+
+def validate_addresses(addresses, coin_symbol):
+    """
+    Batch validation: one result dict per input address, in order.
+    """
+    return [{'address': address, 'valid': address_type(address, coin_symbol) is not None,
+             'type': address_type(address, coin_symbol)}
+            if isinstance(address, str) else {'address': address, 'valid': False, 'type': None}
+            for address in addresses]
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+class MyappConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'myapp'
+
+    def ready(self):
+        # OUTBOX_IN_PROCESS is checked on each request until the workers start, so override_settings applies
+        from .outbox import start_workers
+        request_started.connect(start_workers)
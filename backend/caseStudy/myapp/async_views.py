@@ -0,0 +1,202 @@
+"""
+Async versions of the send, broadcast and confirmation views for the ASGI entry point.
+
+Upstream calls that do not depend on each other run concurrently on the event loop, so
+a worker under uvicorn keeps serving other requests while BlockCypher is answering.
+Enabled with ``ASYNC_VIEWS=True``; see caseStudy/urls.py.
+"""
+import asyncio
+import json
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+
+from .coin_selection import InsufficientFunds
+from .compression import accepts_binary, compressed_json_response, compressed_response
+from .confirmations import aconfirmation_events, confirmation_tracker, track_confirmations
+from .fees import TIERS as FEE_TIERS, estimate_fee, fee_service
+from .lazy import lazy_import
+from .outbox import enqueue_broadcast, is_queued
+from .providers import get_provider
+from .psbt import build_psbt, needs_previous_transactions
+from .resilience import RATE_LIMITED, UPSTREAM_UNAVAILABLE, UpstreamUnavailable, fail_fast
+from .shared_cache import HEX, shared_cache
+from .throttle import Throttled
+from .utils import (
+    is_valid_amount,
+    is_valid_bitcoin_address,
+    is_valid_tx_hash,
+    parse_signed_transaction,
+    psbt_payload,
+    select_unspent,
+    to_satoshis,
+    unsigned_transaction_payload
+)
+from .utxo_cache import utxo_cache
+
+blockcypher_api = lazy_import('blockcypher.api')
+
+
+def require_POST(view):
+    # django.views.decorators.http.require_POST only learns about coroutines in Django 5.0
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+def require_GET(view):
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method != "GET":
+            return HttpResponseNotAllowed(["GET"])
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+async def fetch_raw_transactions(selected):
+    txids = list({utxo.txid for utxo in selected})
+    provider = get_provider()
+    raw = await asyncio.gather(*(shared_cache.aget_or_fetch('rawtx:%s' % txid, settings.SHARED_CACHE_RAW_TX_TTL,
+                                                            partial(provider.aget_raw_transaction, txid), HEX)
+                                 for txid in txids))
+    return dict(zip(txids, raw))
+
+
+async def generate_unsigned_transaction(unspent, fee_rate, source_address, amount_in_btc, to_address):
+    amount_in_satoshis = to_satoshis(amount_in_btc)
+    selected, selection = select_unspent(unspent, amount_in_satoshis, fee_rate)
+    raw_transactions = await fetch_raw_transactions(selected)
+    return unsigned_transaction_payload(selected, selection, raw_transactions, source_address, to_address,
+                                        amount_in_satoshis)
+
+
+async def generate_unsigned_psbt(unspent, fee_rate, source_address, amount_in_btc, to_address):
+    amount_in_satoshis = to_satoshis(amount_in_btc)
+    selected, selection = select_unspent(unspent, amount_in_satoshis, fee_rate)
+    raw_transactions = None
+    if needs_previous_transactions(source_address, settings.COIN_SYMBOL):
+        raw_transactions = await fetch_raw_transactions(selected)
+    psbt = build_psbt(selected, selection, source_address, to_address, amount_in_satoshis, settings.COIN_SYMBOL,
+                      raw_transactions)
+    return psbt, selection
+
+
+@require_POST
+@fail_fast
+async def get_transaction_data(request):
+    data = json.loads(request.body)
+    source_address = (data.get('from_address'))
+    to_address = (data.get('to_address'))
+    amount = is_valid_amount(data.get('amount'))
+    if not amount:
+        return JsonResponse({"status": "error", "message": "Invalid amount"})
+
+    if not is_valid_bitcoin_address(to_address) or not is_valid_bitcoin_address(source_address):
+        return JsonResponse({"status": "error", "message": "Invalid input type"})
+
+    fee_tier = data.get('fee_tier') or settings.FEE_DEFAULT_TIER
+    if fee_tier not in FEE_TIERS:
+        return JsonResponse({"status": "error", "message": "Invalid fee tier"})
+    # Only a cold start has to go to the DB (or upstream) for the rates
+    fee_rates = fee_service.cached_rates() or await sync_to_async(fee_service.rates)()
+    fee_rate = fee_rates[fee_tier]
+
+    # One cached set answers both the balance check and coin selection
+    unspent = await utxo_cache.aavailable(source_address)
+
+    if sum(utxo.amount for utxo in unspent) < to_satoshis(amount) + estimate_fee(1, 1, fee_tier, fee_rates):
+        return JsonResponse({"status": "error", "message": "Insufficient balance"})
+
+    try:
+        if data.get('format') == 'psbt':
+            psbt, selection = await generate_unsigned_psbt(unspent, fee_rate, source_address, amount, to_address)
+        else:
+            psbt, hsh = None, await generate_unsigned_transaction(unspent, fee_rate, source_address, amount,
+                                                                  to_address)
+    except InsufficientFunds as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": "Insufficient balance"})
+
+    if psbt is None:
+        return compressed_json_response(request, {"status": "success", 'message': hsh})
+    if accepts_binary(request):
+        return compressed_response(request, psbt, 'application/octet-stream')
+    return compressed_json_response(request, {"status": "success", 'message': psbt_payload(
+        psbt, selection, source_address, to_address, to_satoshis(amount))})
+
+
+@require_POST
+async def broadcast_signed_transaction(request):
+    data = json.loads(request.body)
+
+    signed_tx = data.get('signed_tx')
+
+    if not signed_tx:
+        print("Missing signed transaction data")
+        return JsonResponse({"status": "error", "message": "Missing signed transaction data"})
+
+    tx = parse_signed_transaction(signed_tx)
+    if tx is None:
+        print("Invalid signed transaction")
+        return JsonResponse({"status": "error", "message": "Invalid signed transaction"})
+
+    try:
+        item = await sync_to_async(enqueue_broadcast)(tx.txid, signed_tx)
+        return JsonResponse({"status": "success", "tx_details": item.txid, "broadcast_status": item.status})
+    except Exception as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": "Error broadcasting the transaction"})
+
+
+@require_POST
+async def get_confirmations(request):
+    data = json.loads(request.body)
+    tx_hash = data.get('hash')
+
+    if not tx_hash:
+        return JsonResponse({"status": "error", "message": "Missing transaction hash"})
+
+    if not is_valid_tx_hash(tx_hash):
+        return JsonResponse({"status": "error", "message": "Invalid transaction hash"})
+
+    try:
+        confirmations = confirmation_tracker.confirmations(tx_hash)
+        if confirmations is None:
+            confirmations = await get_provider().aget_confirmations(tx_hash)
+            if confirmations < 1:
+                track_confirmations(tx_hash)
+        return JsonResponse({"status": "success", "confirmations": confirmations})
+
+    except UpstreamUnavailable as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": UPSTREAM_UNAVAILABLE})
+    except (Throttled, blockcypher_api.RateLimitError):
+        return JsonResponse({"status": "error", "message": RATE_LIMITED})
+    except Exception as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": "Error getting confirmations"})
+
+
+@require_GET
+async def stream_confirmations(request, tx_hash):
+    if not is_valid_tx_hash(tx_hash):
+        return JsonResponse({"status": "error", "message": "Invalid transaction hash"}, status=400)
+    try:
+        target = int(request.GET.get('target', 1))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid target"}, status=400)
+
+    # Our own queued broadcasts are tracked even before the outbox has pushed them
+    track_confirmations(tx_hash, verified=await sync_to_async(is_queued)(tx_hash))
+    response = StreamingHttpResponse(
+        aconfirmation_events(confirmation_tracker, tx_hash, target, settings.CONFIRMATION_STREAM_TIMEOUT,
+                             retry=settings.CONFIRMATION_STREAM_RETRY),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
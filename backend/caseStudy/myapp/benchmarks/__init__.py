@@ -0,0 +1,29 @@
+"""
+Offline benchmarks, run with ``python manage.py benchmark <name>``.
+Every module here exposes ``run(**options)`` returning a list of result rows.
+"""
+import time
+
+import numpy as np
+
+
+def timed(fn, *args, repeat=5, **kwargs):
+    """
+    Call ``fn`` ``repeat`` times and return (last result, list of durations in milliseconds).
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, durations
+
+
+def summarize(durations):
+    durations = np.asarray(durations)
+    return {
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p95_ms": float(np.percentile(durations, 95)),
+        "p99_ms": float(np.percentile(durations, 99)),
+    }
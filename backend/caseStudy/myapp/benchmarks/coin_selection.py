@@ -0,0 +1,37 @@
+import numpy as np
+
+from . import summarize, timed
+from ..coin_selection import STRATEGIES
+
+UTXO_SETS = {
+    # Many small faucet-style payments
+    "small_utxos": lambda rng, n: rng.integers(1000, 50000, size=n),
+    # Log-normal spread, closer to a real wallet
+    "mixed": lambda rng, n: np.exp(rng.normal(11, 2, size=n)).astype(np.int64) + 1000,
+    # A handful of identical denominations, the worst case for branch-and-bound
+    "uniform": lambda rng, n: np.full(n, 100000, dtype=np.int64),
+}
+
+
+def run(sizes=(100, 10000, 50000), fee_rate=10, repeat=5, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for set_name, make in UTXO_SETS.items():
+        for size in sizes:
+            amounts = make(rng, size).astype(np.int64)
+            target = int(amounts.sum() // 50)
+            for strategy_name, strategy in STRATEGIES.items():
+                selection, durations = timed(strategy, amounts, target, fee_rate, repeat=repeat)
+                row = {
+                    "benchmark": "coin_selection",
+                    "utxo_set": set_name,
+                    "utxos": size,
+                    "strategy": strategy_name,
+                    "found": selection is not None,
+                    "inputs": len(selection.indices) if selection is not None else 0,
+                    "fee": selection.fee if selection is not None else 0,
+                    "change": selection.change if selection is not None else 0,
+                }
+                row.update(summarize(durations))
+                rows.append(row)
+    return rows
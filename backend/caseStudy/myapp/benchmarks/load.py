@@ -0,0 +1,231 @@
+"""
+In-process load test: drives a realistic request mix through the full Django stack (middleware,
+views, DB) against FakeProvider, with optional latency and error injection on every upstream call.
+
+``python manage.py benchmark load -o requests=2000 -o concurrency=16 -o latency=0.15 -o error_rate=0.02``
+runs against a throwaway SQLite database file, so the development database is never touched.
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from . import summarize
+from .tx_parser import synthetic_transaction
+from ..addresses import NETWORKS, b58encode_check
+from ..fees import fee_service
+from ..models import Address
+from ..providers import get_provider
+from ..shared_cache import shared_cache
+from ..txparser import parse_transaction
+from ..utils import address_fields
+
+# Relative weights, roughly what the frontend generates: details and confirmation polls dominate
+DEFAULT_MIX = {
+    'send': 10,
+    'broadcast': 5,
+    'confirmations': 30,
+    'list': 15,
+    'details': 40,
+}
+
+
+class LoadData:
+    """
+    Addresses, funded source addresses and transaction hashes known to the fake chain.
+    """
+
+    def __init__(self, addresses, sources, tx_hashes):
+        self.addresses = addresses
+        self.sources = sources
+        self.tx_hashes = tx_hashes
+
+
+def fake_chain(provider):
+    """
+    The FakeProvider behind get_provider()'s guard and fault injection.
+    """
+    while hasattr(provider, 'inner'):
+        provider = provider.inner
+    return provider
+
+
+def random_address(rng):
+    version = NETWORKS[settings.COIN_SYMBOL]['p2pkh']
+    return b58encode_check(bytes([version]) + rng.randbytes(20))
+
+
+def seed(n_addresses=500, n_sources=20, utxos_per_source=5, seed=0):
+    """
+    Fill the fake chain and the Address table. Sources are funded with outputs of synthetic
+    transactions whose hex the fake chain serves, so legacy sends can fetch them.
+    """
+    rng = random.Random(seed)
+    chain = fake_chain(get_provider())
+    addresses = [random_address(rng) for _ in range(n_addresses)]
+    sources = addresses[:n_sources]
+    tx_hashes = []
+    for source in sources:
+        outputs = []
+        for _ in range(utxos_per_source):
+            raw = synthetic_transaction(1, 2)
+            txid = parse_transaction(raw).txid
+            chain.transactions[txid] = {'hex': raw, 'confirmations': rng.randint(0, 6)}
+            outputs.append({'amount': 100000, 'txid': txid, 'txindex': 0})
+            tx_hashes.append(txid)
+        chain.add_unspent(source, outputs)
+    Address.objects.bulk_create([Address(**address_fields(chain.get_address_details(address)))
+                                 for address in addresses], ignore_conflicts=True)
+    # Measure steady state, not every thread racing to load the fee rates on a cold start
+    fee_service.refresh(low=False)
+    return LoadData(addresses, sources, tx_hashes)
+
+
+def make_request(client, name, data, rng):
+    """
+    Issue one request of kind ``name`` and return (response, failed).
+    """
+    if name == 'send':
+        source, destination = rng.sample(data.sources, 2)
+        response = client.post('/send_bitcoin/', {'from_address': source, 'to_address': destination,
+                                                  'amount': '0.0001', 'format': 'psbt'},
+                               content_type='application/json', secure=True)
+    elif name == 'broadcast':
+        response = client.post('/broadcast_bitcoin/', {'signed_tx': synthetic_transaction(1, 2)},
+                               content_type='application/json', secure=True)
+    elif name == 'confirmations':
+        response = client.post('/get_confirmations/', {'hash': rng.choice(data.tx_hashes)},
+                               content_type='application/json', secure=True)
+    elif name == 'list':
+        response = client.get('/path/to/get_addresses_endpoint/', secure=True)
+    elif name == 'details':
+        response = client.get('/api/path-to-details/%s/' % rng.choice(data.addresses), secure=True)
+    else:
+        raise ValueError("Unknown request kind %r" % name)
+    return response, _failed(response)
+
+
+def _failed(response):
+    if response.status_code >= 400:
+        return True
+    if response.get('Content-Type', '').startswith('application/json') and not response.get('Content-Encoding'):
+        body = response.json()
+        return isinstance(body, dict) and (body.get('status') == 'error' or body.get('success') is False)
+    return False
+
+
+def drive(data, requests=1000, concurrency=8, mix=None, seed=0):
+    """
+    Send ``requests`` requests drawn from ``mix`` from ``concurrency`` threads.
+    Returns ``({kind: [durations in ms]}, {kind: error count}, wall seconds)``.
+    """
+    mix = mix or DEFAULT_MIX
+    kinds, weights = list(mix), list(mix.values())
+    durations = {kind: [] for kind in kinds}
+    errors = dict.fromkeys(kinds, 0)
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(raise_request_exception=False)
+        try:
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                kind = rng.choices(kinds, weights)[0]
+                start = time.perf_counter()
+                try:
+                    _, failed = make_request(client, kind, data, rng)
+                except Exception as e:
+                    print(e)
+                    failed = True
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    durations[kind].append(elapsed)
+                    errors[kind] += failed
+        finally:
+            if concurrency > 1:
+                connections.close_all()
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return durations, errors, time.perf_counter() - start
+
+
+def report(durations, errors, wall, **config):
+    rows = []
+    everything = []
+    for kind, values in durations.items():
+        if not values:
+            continue
+        everything += values
+        row = {'benchmark': 'load', 'endpoint': kind, 'requests': len(values), 'errors': errors[kind]}
+        row.update(summarize(values))
+        row['req_per_s'] = len(values) / wall
+        row.update(config)
+        rows.append(row)
+    if everything:
+        row = {'benchmark': 'load', 'endpoint': 'all', 'requests': len(everything), 'errors': sum(errors.values())}
+        row.update(summarize(everything))
+        row['req_per_s'] = len(everything) / wall
+        row.update(config)
+        rows.append(row)
+    return rows
+
+
+@contextmanager
+def load_environment(latency=0, jitter=0, error_rate=0, rate_limit_rate=0):
+    """
+    FakeProvider with the given faults, no local rate limit, no in-process outbox workers, and a
+    throwaway database file and shared upstream cache used by every client thread.
+    """
+    fd, path = tempfile.mkstemp(suffix='.sqlite3', prefix='loadtest-')
+    os.close(fd)
+    cache_path = path + '.cache'
+    overrides = override_settings(
+        CHAIN_PROVIDER='myapp.providers.FakeProvider', CHAIN_PROVIDER_FIXTURES='',
+        CHAIN_FAULT_LATENCY=latency, CHAIN_FAULT_JITTER=jitter, CHAIN_FAULT_ERROR_RATE=error_rate,
+        CHAIN_FAULT_RATE_LIMIT_RATE=rate_limit_rate, CHAIN_RATE_PER_SECOND=0, OUTBOX_IN_PROCESS=False)
+    setup_test_environment()
+    overrides.enable()
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    get_provider.cache_clear()
+    previous_cache_path, shared_cache.path = shared_cache.path, cache_path
+    try:
+        yield
+    finally:
+        shared_cache.path = previous_cache_path
+        get_provider.cache_clear()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        overrides.disable()
+        teardown_test_environment()
+        for leftover in (path, cache_path, cache_path + '-wal', cache_path + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def run(requests=1000, concurrency=8, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+        addresses=500):
+    faults = {'latency': latency, 'jitter': jitter, 'error_rate': error_rate, 'rate_limit_rate': rate_limit_rate}
+    with load_environment(**faults):
+        data = seed(n_addresses=addresses)
+        durations, errors, wall = drive(data, requests=requests, concurrency=concurrency)
+    return report(durations, errors, wall, concurrency=concurrency, **faults)
@@ -0,0 +1,49 @@
+import json
+
+from bit.network.meta import Unspent
+
+from . import summarize, timed
+from .tx_parser import synthetic_transaction
+from ..compression import compress
+from ..coin_selection import CoinSelection
+from ..psbt import build_psbt
+from ..utils import unsigned_transaction_payload
+
+LEGACY = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+SEGWIT = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+COIN_SYMBOL = "btc-testnet"
+
+
+def run(input_counts=(1, 10, 100), prev_outputs=2, batch_size=200, repeat=5):
+    """
+    Time and size the unsigned-send payloads: the legacy JSON (every previous transaction's hex)
+    against PSBTs for legacy and segwit sources, raw and gzip-compressed.
+    """
+    rows = []
+    for n_inputs in input_counts:
+        raw_transactions = {}
+        selected = []
+        for i in range(n_inputs):
+            raw = synthetic_transaction(1, prev_outputs)
+            txid = '%064x' % i
+            raw_transactions[txid] = raw
+            selected.append(Unspent(100000, 1, '', txid, 0))
+        selection = CoinSelection(list(range(n_inputs)), 100000 * n_inputs, 1000, 50000, 'bnb')
+        amount = 100000 * n_inputs - 51000
+
+        paths = {
+            "legacy_json": lambda: json.dumps(unsigned_transaction_payload(
+                selected, selection, raw_transactions, LEGACY, DESTINATION, amount)).encode(),
+            "psbt_legacy": lambda: build_psbt(selected, selection, LEGACY, DESTINATION, amount, COIN_SYMBOL,
+                                              raw_transactions),
+            "psbt_segwit": lambda: build_psbt(selected, selection, SEGWIT, DESTINATION, amount, COIN_SYMBOL),
+        }
+        for name, fn in paths.items():
+            body, durations = timed(lambda: [fn() for _ in range(batch_size)], repeat=repeat)
+            row = {"benchmark": "serialization", "path": name, "inputs": n_inputs, "batch": batch_size,
+                   "bytes": len(body[0]), "gzip_bytes": len(compress(body[0], 'gzip'))}
+            row.update(summarize(durations))
+            row["payloads_per_s"] = batch_size / (row["p50_ms"] / 1000)
+            rows.append(row)
+    return rows
@@ -0,0 +1,69 @@
+import os
+
+from bitcoin import deserialize
+from bitcoin.core import CTransaction
+
+from . import summarize, timed
+from ..txparser import parse_transaction
+
+
+def _varint(n):
+    if n < 0xfd:
+        return bytes([n])
+    return b'\xfd' + n.to_bytes(2, 'little')
+
+
+def synthetic_transaction(n_inputs, n_outputs, segwit=False):
+    """
+    A structurally valid signed transaction with random outpoints and P2PKH-sized scripts.
+    """
+    script_sig = b'\x6a' + os.urandom(106)
+    parts = [(2).to_bytes(4, 'little')]
+    if segwit:
+        parts.append(b'\x00\x01')
+    parts.append(_varint(n_inputs))
+    for _ in range(n_inputs):
+        parts += [os.urandom(32), (0).to_bytes(4, 'little')]
+        parts += [b'\x00'] if segwit else [_varint(len(script_sig)), script_sig]
+        parts.append(b'\xff\xff\xff\xff')
+    parts.append(_varint(n_outputs))
+    for _ in range(n_outputs):
+        parts += [(1000).to_bytes(8, 'little'), b'\x19\x76\xa9\x14' + os.urandom(20) + b'\x88\xac']
+    if segwit:
+        for _ in range(n_inputs):
+            parts += [b'\x02', b'\x47' + os.urandom(71), b'\x21' + os.urandom(33)]
+    parts.append((0).to_bytes(4, 'little'))
+    return b''.join(parts).hex()
+
+
+def current_path(signed_hex):
+    """
+    What broadcast_signed_transaction did before: two independent deserializations.
+    """
+    CTransaction.deserialize(bytes.fromhex(signed_hex))
+    return deserialize(signed_hex)['ins'][0]['outpoint']['hash']
+
+
+def run(batch_size=1000, shapes=((1, 2), (10, 2), (100, 50)), repeat=5):
+    rows = []
+    for segwit in (False, True):
+        for n_inputs, n_outputs in shapes:
+            batch = [synthetic_transaction(n_inputs, n_outputs, segwit) for _ in range(batch_size)]
+            paths = {
+                "two_library": lambda: [current_path(tx) for tx in batch],
+                "single_pass": lambda: [parse_transaction(tx, require_signatures=True) for tx in batch],
+            }
+            for name, fn in paths.items():
+                try:
+                    _, durations = timed(fn, repeat=repeat)
+                except Exception as e:
+                    # pybitcointools cannot read segwit serialization at all
+                    rows.append({"benchmark": "tx_parser", "path": name, "segwit": segwit, "inputs": n_inputs,
+                                 "outputs": n_outputs, "error": type(e).__name__})
+                    continue
+                row = {"benchmark": "tx_parser", "path": name, "segwit": segwit, "inputs": n_inputs,
+                       "outputs": n_outputs, "batch": batch_size}
+                row.update(summarize(durations))
+                row["tx_per_s"] = batch_size / (row["p50_ms"] / 1000)
+                rows.append(row)
+    return rows
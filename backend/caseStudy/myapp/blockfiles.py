@@ -0,0 +1,153 @@
+"""
+Reader for a Bitcoin Core ``blocks/`` directory (``blk*.dat`` files), through mmap.
+
+Each file is a sequence of records: 4-byte network magic, 4-byte little-endian size, then the
+serialized block. Since Bitcoin Core 28 the files may be XOR-obfuscated with the 8-byte key in
+``xor.dat``; reads undo it transparently. Nothing here touches Django, so ``parse_block_at`` can run
+in worker processes.
+"""
+import hashlib
+import mmap
+import os
+import re
+from collections import namedtuple
+
+from .addresses import script_address
+from .txparser import _read_varint, parse_transaction_at
+
+NETWORK_MAGICS = {
+    bytes.fromhex('f9beb4d9'): 'main',
+    bytes.fromhex('0b110907'): 'testnet3',
+    bytes.fromhex('1c163f28'): 'testnet4',
+    bytes.fromhex('0a03cf40'): 'signet',
+    bytes.fromhex('fabfb5da'): 'regtest',
+}
+
+HEADER_SIZE = 80
+NULL_HASH = b'\x00' * 32
+
+BLOCK_FILE = re.compile(r'^blk(\d{5})\.dat$')
+
+# Location of one block record's payload (after magic and size)
+BlockRecord = namedtuple('BlockRecord', ['file', 'offset', 'size', 'hash', 'prev'])
+
+# What the index needs from a transaction: spent outpoints and (vout, address, value) outputs
+IndexedTransaction = namedtuple('IndexedTransaction', ['txid', 'offset', 'size', 'spends', 'outputs'])
+
+
+def block_hash(header):
+    """
+    Block hash in internal byte order, like the prev-hash field of the next header.
+    """
+    return hashlib.sha256(hashlib.sha256(header).digest()).digest()
+
+
+def unxor(data, key, position):
+    """
+    Undo the obfuscation of ``data`` read at byte ``position`` of its file.
+    """
+    if not key:
+        return data
+    shift = position % len(key)
+    key = key[shift:] + key[:shift]
+    stream = (key * (len(data) // len(key) + 1))[:len(data)]
+    return (int.from_bytes(data, 'little') ^ int.from_bytes(stream, 'little')).to_bytes(len(data), 'little')
+
+
+class BlockFiles:
+
+    def __init__(self, blocks_dir):
+        self.blocks_dir = blocks_dir
+        self.xor_key = self._read_xor_key()
+        self._maps = {}
+
+    def _read_xor_key(self):
+        try:
+            with open(os.path.join(self.blocks_dir, 'xor.dat'), 'rb') as f:
+                key = f.read()
+        except FileNotFoundError:
+            return None
+        return key if any(key) else None
+
+    def path(self, number):
+        return os.path.join(self.blocks_dir, 'blk%05d.dat' % number)
+
+    def numbers(self):
+        return sorted(int(match.group(1)) for match in map(BLOCK_FILE.match, os.listdir(self.blocks_dir)) if match)
+
+    def _view(self, number):
+        """
+        A read-only map of the file, remapped when the node has appended to it since.
+        """
+        path = self.path(number)
+        size = os.path.getsize(path)
+        cached = self._maps.get(number)
+        if cached is not None and len(cached) == size:
+            return cached
+        if cached is not None:
+            cached.close()
+        if size == 0:
+            return b''
+        with open(path, 'rb') as f:
+            view = self._maps[number] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return view
+
+    def read(self, number, offset, size):
+        return unxor(self._view(number)[offset:offset + size], self.xor_key, offset)
+
+    def records(self, number, offset=0):
+        """
+        Yield a BlockRecord for every complete block record from ``offset`` on. Stops at the
+        zero-filled preallocated tail or at a record the node is still writing.
+        """
+        view = self._view(number)
+        end = len(view)
+        while offset + 8 + HEADER_SIZE <= end:
+            prefix = unxor(view[offset:offset + 8], self.xor_key, offset)
+            if prefix[:4] not in NETWORK_MAGICS:
+                return
+            size = int.from_bytes(prefix[4:], 'little')
+            payload = offset + 8
+            if payload + size > end:
+                return
+            header = self.read(number, payload, HEADER_SIZE)
+            yield BlockRecord(number, payload, size, block_hash(header), header[4:36])
+            offset = payload + size
+
+    def close(self):
+        for view in self._maps.values():
+            view.close()
+        self._maps.clear()
+
+
+def parse_block(block, coin_symbol, base_offset=0):
+    """
+    IndexedTransaction tuples for every transaction in a serialized block; ``offset`` is relative to
+    the file when ``base_offset`` is where the block starts. The coinbase spends nothing.
+    """
+    buf = memoryview(block)
+    n_tx, offset = _read_varint(buf, HEADER_SIZE)
+    transactions = []
+    for i in range(n_tx):
+        outputs = []
+        parsed, end = parse_transaction_at(buf, offset, outputs)
+        spends = [] if i == 0 else [(bytes.fromhex(txin.txid), txin.vout) for txin in parsed.inputs]
+        indexed = [(vout, script_address(output.script, coin_symbol), output.value)
+                   for vout, output in enumerate(outputs)]
+        transactions.append(IndexedTransaction(bytes.fromhex(parsed.txid), base_offset + offset, end - offset,
+                                               spends, [output for output in indexed if output[1] is not None]))
+        offset = end
+    return transactions
+
+
+_files = {}
+
+
+def parse_block_at(blocks_dir, number, offset, size, coin_symbol):
+    """
+    Process-pool entry point: read and parse one block, keeping the files mapped between calls.
+    """
+    files = _files.get(blocks_dir)
+    if files is None:
+        files = _files[blocks_dir] = BlockFiles(blocks_dir)
+    return parse_block(files.read(number, offset, size), coin_symbol, offset)
@@ -0,0 +1,357 @@
+"""
+Self-hosted address index built from a node's ``blk*.dat`` files.
+
+``BlockIndex.update()`` (run by ``manage.py index_blocks``) scans new block records, links them
+into the best chain by their prev-hash, parses blocks in a process pool and applies them in height
+order to an SQLite file holding the UTXO set, per-block address deltas and transaction locations.
+Each run catches up from the last indexed height. Spent outputs are kept for BLOCK_INDEX_UNDO_DEPTH
+blocks so a reorg can be rolled back to the fork point.
+
+With ``CHAIN_PROVIDER = 'myapp.blockindex.LocalIndexProvider'`` balances, UTXOs and raw
+transactions come from the index. Everything it cannot answer (mempool, broadcast, fees, txrefs)
+goes to BLOCK_INDEX_FALLBACK, which keeps the usual rate limit.
+"""
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from bit.network.meta import Unspent
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .addresses import script_pubkey
+from .blockfiles import NULL_HASH, BlockFiles, parse_block_at
+from .providers import ChainProvider, GuardedProvider, make_bucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS headers (
+    hash BLOB PRIMARY KEY, prev BLOB NOT NULL, height INTEGER,
+    file INTEGER NOT NULL, offset INTEGER NOT NULL, size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS headers_height ON headers (height);
+CREATE TABLE IF NOT EXISTS chain (height INTEGER PRIMARY KEY, hash BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS txs (
+    txid BLOB PRIMARY KEY, height INTEGER NOT NULL, file INTEGER NOT NULL, offset INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS txs_height ON txs (height);
+CREATE TABLE IF NOT EXISTS utxos (
+    txid BLOB NOT NULL, vout INTEGER NOT NULL, address TEXT NOT NULL, value INTEGER NOT NULL,
+    height INTEGER NOT NULL, PRIMARY KEY (txid, vout)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS utxos_address ON utxos (address);
+CREATE INDEX IF NOT EXISTS utxos_height ON utxos (height);
+CREATE TABLE IF NOT EXISTS spent (
+    txid BLOB NOT NULL, vout INTEGER NOT NULL, address TEXT NOT NULL, value INTEGER NOT NULL,
+    height INTEGER NOT NULL, spent_height INTEGER NOT NULL, PRIMARY KEY (txid, vout)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS spent_height ON spent (spent_height);
+CREATE TABLE IF NOT EXISTS address_deltas (
+    address TEXT NOT NULL, height INTEGER NOT NULL, received INTEGER NOT NULL, sent INTEGER NOT NULL,
+    n_tx INTEGER NOT NULL, PRIMARY KEY (address, height)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS address_deltas_height ON address_deltas (height);
+"""
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    # WAL lets web workers read while the indexer writes
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+class BlockIndex:
+    """
+    Reads from the index; ``update()`` writes to it.
+    """
+
+    def __init__(self, path, blocks_dir, coin_symbol):
+        self.path = path
+        self.files = BlockFiles(blocks_dir)
+        self.coin_symbol = coin_symbol
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = connect(self.path)
+        return db
+
+    def _meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    # Lookups
+
+    def tip(self):
+        """
+        (height, hash in internal byte order) of the last indexed block, or (-1, None).
+        """
+        row = self.db.execute('SELECT height, hash FROM chain ORDER BY height DESC LIMIT 1').fetchone()
+        return (row[0], row[1]) if row else (-1, None)
+
+    def unspent(self, address):
+        """
+        (txid bytes, vout, value, height) for every indexed unspent output of ``address``.
+        """
+        return self.db.execute('SELECT txid, vout, value, height FROM utxos WHERE address = ? '
+                               'ORDER BY height, txid, vout', (address,)).fetchall()
+
+    def address_summary(self, address):
+        """
+        (total received, total sent, transaction count) over the indexed chain.
+        """
+        row = self.db.execute('SELECT COALESCE(SUM(received), 0), COALESCE(SUM(sent), 0), COALESCE(SUM(n_tx), 0) '
+                              'FROM address_deltas WHERE address = ?', (address,)).fetchone()
+        return tuple(row)
+
+    def transaction(self, txid):
+        """
+        (height, file, offset, size) of an indexed transaction, or None.
+        """
+        return self.db.execute('SELECT height, file, offset, size FROM txs WHERE txid = ?',
+                               (txid,)).fetchone()
+
+    def raw_transaction(self, txid):
+        location = self.transaction(txid)
+        if location is None:
+            return None
+        _, number, offset, size = location
+        return self.files.read(number, offset, size)
+
+    # Catch-up
+
+    def scan(self):
+        """
+        Store headers of block records written since the last scan; returns how many were found.
+        """
+        numbers = self.files.numbers()
+        if not numbers:
+            return 0
+        scan_file = self._meta('scan_file', numbers[0])
+        scan_offset = self._meta('scan_offset', 0)
+        found = 0
+        for number in numbers:
+            if number < scan_file:
+                continue
+            offset = scan_offset if number == scan_file else 0
+            records = list(self.files.records(number, offset))
+            self.db.execute('BEGIN')
+            self.db.executemany('INSERT OR IGNORE INTO headers (hash, prev, file, offset, size) '
+                                'VALUES (?, ?, ?, ?, ?)',
+                                [(record.hash, record.prev, record.file, record.offset, record.size)
+                                 for record in records])
+            if records:
+                offset = records[-1].offset + records[-1].size
+            self._set_meta('scan_file', number)
+            self._set_meta('scan_offset', offset)
+            self.db.execute('COMMIT')
+            found += len(records)
+        self._link_headers()
+        return found
+
+    def _link_headers(self):
+        """
+        Give every header whose parent is known a height. Files are not in chain order, so headers
+        are placed by walking down from the ones with a known parent; orphans wait for a later scan.
+        """
+        unplaced = dict(self.db.execute('SELECT hash, prev FROM headers WHERE height IS NULL'))
+        children = defaultdict(list)
+        queue = []
+        for block, prev in unplaced.items():
+            if prev == NULL_HASH:
+                queue.append((block, 0))
+            elif prev in unplaced:
+                children[prev].append(block)
+            else:
+                parent = self.db.execute('SELECT height FROM headers WHERE hash = ?', (prev,)).fetchone()
+                if parent is not None and parent[0] is not None:
+                    queue.append((block, parent[0] + 1))
+        placed = []
+        while queue:
+            block, height = queue.pop()
+            placed.append((height, block))
+            queue.extend((child, height + 1) for child in children.pop(block, ()))
+        self.db.execute('BEGIN')
+        self.db.executemany('UPDATE headers SET height = ? WHERE hash = ?', placed)
+        self.db.execute('COMMIT')
+
+    def best_path(self):
+        """
+        (fork height, [(height, hash), ...] ascending) from the indexed chain to the best header.
+        The best header is the highest one; on equal height the indexed chain is kept.
+        """
+        indexed_height, indexed_hash = self.tip()
+        row = self.db.execute('SELECT height, hash FROM headers WHERE height IS NOT NULL '
+                              'ORDER BY height DESC LIMIT 1').fetchone()
+        if row is None or (row[0] <= indexed_height):
+            return indexed_height, []
+        height, block = row
+        path = []
+        while height >= 0:
+            existing = self.db.execute('SELECT hash FROM chain WHERE height = ?', (height,)).fetchone()
+            if existing is not None and existing[0] == block:
+                break
+            path.append((height, block))
+            block = self.db.execute('SELECT prev FROM headers WHERE hash = ?', (block,)).fetchone()[0]
+            height -= 1
+        path.reverse()
+        return height, path
+
+    def rollback(self, fork_height):
+        """
+        Undo every indexed block above ``fork_height``.
+        """
+        db = self.db
+        db.execute('BEGIN')
+        db.execute('DELETE FROM utxos WHERE height > ?', (fork_height,))
+        db.execute('INSERT INTO utxos (txid, vout, address, value, height) SELECT txid, vout, address, value, height '
+                   'FROM spent WHERE spent_height > ? AND height <= ?', (fork_height, fork_height))
+        db.execute('DELETE FROM spent WHERE spent_height > ?', (fork_height,))
+        for table in ('address_deltas', 'txs', 'chain'):
+            db.execute('DELETE FROM %s WHERE height > ?' % table, (fork_height,))
+        db.execute('COMMIT')
+
+    def apply(self, height, block, transactions):
+        """
+        Add one parsed block on top of the indexed chain (inside the caller's transaction).
+        """
+        db = self.db
+        number = db.execute('SELECT file FROM headers WHERE hash = ?', (block,)).fetchone()[0]
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for tx in transactions:
+            touched = set()
+            for txid, vout in tx.spends:
+                row = db.execute('SELECT address, value, height FROM utxos WHERE txid = ? AND vout = ?',
+                                 (txid, vout)).fetchone()
+                if row is None:
+                    # Spends an output without an address (or one the index never saw)
+                    continue
+                address, value, created = row
+                db.execute('DELETE FROM utxos WHERE txid = ? AND vout = ?', (txid, vout))
+                db.execute('INSERT OR REPLACE INTO spent VALUES (?, ?, ?, ?, ?, ?)',
+                           (txid, vout, address, value, created, height))
+                deltas[address][1] += value
+                touched.add(address)
+            for vout, address, value in tx.outputs:
+                db.execute('INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?, ?)',
+                           (tx.txid, vout, address, value, height))
+                deltas[address][0] += value
+                touched.add(address)
+            for address in touched:
+                deltas[address][2] += 1
+            db.execute('INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?)',
+                       (tx.txid, height, number, tx.offset, tx.size))
+        db.executemany('INSERT OR REPLACE INTO address_deltas VALUES (?, ?, ?, ?, ?)',
+                       [(address, height, received, sent, n_tx) for address, (received, sent, n_tx) in deltas.items()])
+        db.execute('INSERT OR REPLACE INTO chain (height, hash) VALUES (?, ?)', (height, block))
+
+    def update(self, max_blocks=None, workers=None, batch_size=None):
+        """
+        Scan, roll back a reorg if there was one, and index up to ``max_blocks`` new blocks.
+        Returns the number of blocks indexed.
+        """
+        workers = workers if workers is not None else settings.BLOCK_INDEX_WORKERS
+        batch_size = batch_size or settings.BLOCK_INDEX_BATCH
+        self.scan()
+        fork_height, path = self.best_path()
+        if not path:
+            return 0
+        if fork_height < self.tip()[0]:
+            self.rollback(fork_height)
+        if max_blocks is not None:
+            path = path[:max_blocks]
+
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        parse = partial(parse_block_at, self.files.blocks_dir, coin_symbol=self.coin_symbol)
+        try:
+            for start in range(0, len(path), batch_size):
+                batch = path[start:start + batch_size]
+                locations = [self.db.execute('SELECT file, offset, size FROM headers WHERE hash = ?',
+                                             (block,)).fetchone() for _, block in batch]
+                args = zip(*locations)
+                parsed = executor.map(parse, *args) if executor else map(parse, *args)
+                self.db.execute('BEGIN')
+                for (height, block), transactions in zip(batch, parsed):
+                    self.apply(height, block, transactions)
+                self.db.execute('DELETE FROM spent WHERE spent_height <= ?',
+                                (batch[-1][0] - settings.BLOCK_INDEX_UNDO_DEPTH,))
+                self.db.execute('COMMIT')
+        finally:
+            if executor:
+                executor.shutdown()
+        return len(path)
+
+
+class LocalIndexProvider(ChainProvider):
+    """
+    Answers balances, UTXOs, raw transactions and confirmations from the local BlockIndex and
+    delegates the rest. The index only covers blocks: unconfirmed balances and outputs are not seen.
+    """
+    rate_limited = False
+
+    def __init__(self, index=None, fallback=None):
+        self.index = index or BlockIndex(settings.BLOCK_INDEX_PATH, settings.BLOCK_INDEX_BLOCKS_DIR,
+                                         settings.COIN_SYMBOL)
+        self.fallback = fallback or GuardedProvider(import_string(settings.BLOCK_INDEX_FALLBACK)(), make_bucket())
+
+    def get_address_details(self, address):
+        received, sent, n_tx = self.index.address_summary(address)
+        balance = received - sent
+        return {
+            'address': address,
+            'total_received': received,
+            'total_sent': sent,
+            'balance': balance,
+            'unconfirmed_balance': 0,
+            'final_balance': balance,
+            'n_tx': n_tx,
+            'unconfirmed_n_tx': 0,
+            'final_n_tx': n_tx,
+            'txrefs': [],
+        }
+
+    def get_unspent(self, address):
+        tip_height = self.index.tip()[0]
+        script = script_pubkey(address, self.index.coin_symbol).hex()
+        return [Unspent(value, tip_height - height + 1, script, txid.hex(), vout)
+                for txid, vout, value, height in self.index.unspent(address)]
+
+    def get_raw_transaction(self, txid):
+        raw = self.index.raw_transaction(bytes.fromhex(txid))
+        return raw.hex() if raw is not None else self.fallback.get_raw_transaction(txid)
+
+    def get_transaction(self, tx_hash):
+        location = self.index.transaction(bytes.fromhex(tx_hash))
+        if location is None:
+            return self.fallback.get_transaction(tx_hash)
+        return {'block_height': location[0], 'confirmations': self.index.tip()[0] - location[0] + 1}
+
+    def get_confirmations(self, tx_hash):
+        return self.get_transaction(tx_hash)['confirmations']
+
+    def get_chain_tip(self):
+        height, block = self.index.tip()
+        return {'height': height, 'hash': block[::-1].hex() if block else None}
+
+    def get_txrefs(self, address, after=None):
+        return self.fallback.get_txrefs(address, after)
+
+    def pushtx(self, tx_hex):
+        return self.fallback.pushtx(tx_hex)
+
+    def get_fee(self):
+        return self.fallback.get_fee()
+
+    def get_fee_rates(self):
+        return self.fallback.get_fee_rates()
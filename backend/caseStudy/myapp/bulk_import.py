@@ -0,0 +1,100 @@
+"""
+Bulk address import.
+
+Addresses are validated and de-duplicated locally (against each other and against the table)
+before anything goes upstream. Only new addresses are fetched, in provider-sized batches on a
+few threads, and the rows are written with one bulk INSERT that leaves existing rows alone.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Address
+from .providers import get_provider
+from .search import address_index
+from .utils import address_fields, canonical_address, validate_address
+from .versions import ADDRESSES, bump_table_version
+
+# Stay under SQLite's bound-parameter limit for ``address__in`` lookups
+LOOKUP_CHUNK_SIZE = 900
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def existing_addresses(addresses):
+    existing = set()
+    for chunk in _chunks(addresses, LOOKUP_CHUNK_SIZE):
+        existing.update(Address.objects.filter(address__in=chunk).values_list('address', flat=True))
+    return existing
+
+
+def _fetch_batch(batch):
+    try:
+        return get_provider().get_addresses_details(batch)
+    except Exception as e:
+        print(e)
+        return {}
+    finally:
+        close_old_connections()
+
+
+def fetch_addresses_details(addresses, batch_size=None, workers=None):
+    """
+    ``{address: details}`` for ``addresses``, fetched concurrently in batches.
+    Batches that fail upstream are left out of the result.
+    """
+    batch_size = batch_size or settings.BLOCKCYPHER_BATCH_SIZE
+    workers = workers or settings.ADDRESS_IMPORT_WORKERS
+    details = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='address-import') as executor:
+        # Pool threads do not inherit contextvars; each batch runs in a copy of the caller's context so
+        # the request's deadline, priority and metrics attribution apply to its upstream calls
+        futures = [executor.submit(contextvars.copy_context().run, _fetch_batch, batch)
+                   for batch in _chunks(addresses, batch_size)]
+        for future in futures:
+            details.update(future.result())
+    return details
+
+
+def import_addresses(addresses, batch_size=None, workers=None):
+    """
+    Import ``addresses`` and return counts plus the addresses that were invalid or could not be fetched.
+    Safe to re-run: addresses already in the table are skipped, including ones added concurrently.
+    """
+    unique = list(dict.fromkeys(address.strip() for address in addresses if isinstance(address, str)))
+    valid, invalid = [], []
+    for address in unique:
+        if validate_address(address):
+            valid.append(canonical_address(address))
+        else:
+            invalid.append(address)
+    # The same bech32 address in two cases is one address
+    valid = list(dict.fromkeys(valid))
+
+    existing = existing_addresses(valid)
+    new = [address for address in valid if address not in existing]
+    details = fetch_addresses_details(new, batch_size=batch_size, workers=workers)
+
+    fetched = [address for address in new if address in details]
+    # Rows another request added while the batches were upstream; bulk_create skips these
+    before = existing_addresses(fetched)
+    rows = [Address(**address_fields(details[address])) for address in fetched if address not in before]
+    # ignore_conflicts relies on the unique index on Address.address to drop concurrent duplicates
+    Address.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    created = len(existing_addresses(fetched) - before)
+    if created:
+        # bulk_create does not send post_save, so the prefix index and list version are updated here
+        address_index.invalidate()
+        bump_table_version(ADDRESSES)
+
+    return {
+        "received": len(addresses),
+        "created": created,
+        "existing": len(existing) + len(fetched) - created,
+        "invalid": invalid,
+        "failed": [address for address in new if address not in details],
+    }
@@ -0,0 +1,125 @@
+"""
+In-process caching used by the read-heavy address views.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from django.utils.http import http_date, quote_etag
+
+# ``updated_at`` is when the data was last fetched upstream, ``cached_at`` when this process read it
+CacheEntry = namedtuple('CacheEntry', ['data', 'etag', 'updated_at', 'cached_at'])
+
+
+def make_entry(data, updated_at):
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    return CacheEntry(data, quote_etag(hashlib.sha1(body).hexdigest()), updated_at, time.monotonic())
+
+
+def entry_headers(entry):
+    return {
+        'ETag': entry.etag,
+        'Last-Modified': http_date(entry.updated_at.timestamp()),
+        # Let browsers keep the body but always revalidate it with If-None-Match
+        'Cache-Control': 'no-cache',
+    }
+
+
+class LRUCache:
+    """
+    Thread-safe mapping that evicts the least recently used key once ``maxsize`` is reached.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Serves whatever copy it has immediately and refreshes stale keys in the background.
+
+    ``load(key)`` reads the stored copy (e.g. from the database) and ``refresh(key)`` fetches new data
+    upstream; both return a CacheEntry or None. Entries are re-read through ``load`` after ``cache_ttl``
+    seconds so refreshes done by other workers are picked up, and refreshed once their ``updated_at``
+    is older than ``fresh_ttl``. At most one refresh per key is in flight at any time.
+    """
+
+    def __init__(self, load, refresh, fresh_ttl, cache_ttl, maxsize, max_workers=2):
+        self.load = load
+        self.refresh = refresh
+        self.fresh_ttl = fresh_ttl
+        self.cache_ttl = cache_ttl
+        self.entries = LRUCache(maxsize)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swr-refresh')
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry.cached_at > self.cache_ttl:
+            entry = self.load(key)
+            if entry is None:
+                self.entries.pop(key)
+                return None
+            self.entries.set(key, entry)
+        if (now - entry.updated_at).total_seconds() > self.fresh_ttl:
+            self.revalidate(key)
+        return entry
+
+    def revalidate(self, key):
+        """
+        Schedule a background refresh of ``key`` unless one is already running. Returns the Future or None.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+        return self._executor.submit(self._refresh, key)
+
+    def _refresh(self, key):
+        try:
+            entry = self.refresh(key)
+            if entry is not None:
+                self.entries.set(key, entry)
+            return entry
+        except Exception as e:
+            print(e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+            close_old_connections()
+
+    def invalidate(self, key):
+        self.entries.pop(key)
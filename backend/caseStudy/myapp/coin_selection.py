@@ -0,0 +1,206 @@
+"""
+Coin selection for building multi-input transactions.
+
+All strategies work on NumPy arrays of UTXO amounts (in satoshis) and return indices into
+the caller's array, so the UTXO objects themselves never have to be copied or sorted.
+Amounts are compared by their effective value (amount minus the fee for spending that input),
+which keeps the fee estimate consistent no matter how many inputs end up being selected.
+"""
+from collections import namedtuple
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Size estimates in vbytes for a P2PKH spend (what the frontend signs today)
+TX_OVERHEAD_SIZE = 10
+INPUT_SIZE = 148
+OUTPUT_SIZE = 34
+DUST_THRESHOLD = 546
+
+BNB_MAX_TRIES = 100000
+KNAPSACK_TRIALS = 100
+
+CoinSelection = namedtuple('CoinSelection', ['indices', 'total', 'fee', 'change', 'strategy'])
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def estimate_tx_size(n_inputs, n_outputs, input_size=INPUT_SIZE):
+    return TX_OVERHEAD_SIZE + n_inputs * input_size + n_outputs * OUTPUT_SIZE
+
+
+def estimate_fee(n_inputs, n_outputs, fee_rate, input_size=INPUT_SIZE):
+    return int(np.ceil(estimate_tx_size(n_inputs, n_outputs, input_size) * fee_rate))
+
+
+def _effective_values(amounts, fee_rate, input_sizes):
+    amounts = np.asarray(amounts, dtype=np.int64)
+    if input_sizes is None:
+        input_sizes = INPUT_SIZE
+    return amounts - np.ceil(np.asarray(input_sizes) * fee_rate).astype(np.int64)
+
+
+def _finish(amounts, indices, target, fee_rate, n_outputs, input_sizes, strategy):
+    """
+    Turn a set of chosen inputs into a CoinSelection, adding a change output only when it is above dust.
+    """
+    indices = np.sort(np.asarray(indices, dtype=np.int64))
+    total = int(amounts[indices].sum())
+    inputs_size = int(INPUT_SIZE * len(indices) if input_sizes is None else np.asarray(input_sizes)[indices].sum())
+    base_size = TX_OVERHEAD_SIZE + inputs_size + n_outputs * OUTPUT_SIZE
+
+    fee_with_change = int(np.ceil((base_size + OUTPUT_SIZE) * fee_rate))
+    change = total - target - fee_with_change
+    if change >= DUST_THRESHOLD:
+        return CoinSelection(indices, total, fee_with_change, change, strategy)
+
+    fee = total - target
+    if fee < int(np.ceil(base_size * fee_rate)):
+        raise InsufficientFunds("Selected inputs do not cover the amount plus fee")
+    return CoinSelection(indices, total, fee, 0, strategy)
+
+
+def branch_and_bound(amounts, target, fee_rate, n_outputs=1, input_sizes=None, max_tries=BNB_MAX_TRIES):
+    """
+    Depth-first search for a subset whose effective value lands in
+    [target + fee, target + fee + cost of a change output], i.e. a transaction that needs no change.
+    Returns a CoinSelection or None when no changeless match is found within ``max_tries``.
+    """
+    amounts = np.asarray(amounts, dtype=np.int64)
+    effective = _effective_values(amounts, fee_rate, input_sizes)
+    candidates = np.flatnonzero(effective > 0)
+    if len(candidates) == 0:
+        return None
+
+    order = candidates[np.argsort(-effective[candidates], kind='stable')]
+    values = effective[order]
+    lower = target + int(np.ceil((TX_OVERHEAD_SIZE + n_outputs * OUTPUT_SIZE) * fee_rate))
+    upper = lower + int(np.ceil(OUTPUT_SIZE * fee_rate)) + DUST_THRESHOLD
+
+    # A single exact-enough UTXO is the common case; find it without walking the tree.
+    ascending = values[::-1]
+    i = np.searchsorted(ascending, lower)
+    if i < len(ascending) and ascending[i] <= upper:
+        return _finish(amounts, [order[len(values) - 1 - i]], target, fee_rate, n_outputs, input_sizes,
+                       'branch_and_bound')
+
+    # remaining[i] is the sum of values[i:], used to prune branches that can no longer reach the target
+    remaining = np.concatenate([np.cumsum(values[::-1])[::-1], [0]]).tolist()
+    if remaining[0] < lower:
+        return None
+    # next_distinct[i] is the first position after i holding a different value. Omitting one UTXO and
+    # including an identical one explores the same sums, so backtracking jumps straight past the run.
+    boundaries = np.flatnonzero(np.diff(values)) + 1
+    next_distinct = np.append(boundaries, len(values))[np.searchsorted(boundaries, np.arange(len(values)),
+                                                                        side='right')].tolist()
+    values = values.tolist()
+
+    selected = []
+    current = 0
+    depth = 0
+    for _ in range(max_tries):
+        if lower <= current <= upper:
+            return _finish(amounts, order[selected], target, fee_rate, n_outputs, input_sizes, 'branch_and_bound')
+        if current < lower and current + remaining[depth] >= lower:
+            # Include values[depth]; the "omit" branch is explored when we backtrack
+            selected.append(depth)
+            current += values[depth]
+            depth += 1
+            continue
+
+        if not selected:
+            return None
+        last = selected.pop()
+        current -= values[last]
+        depth = next_distinct[last]
+    return None
+
+
+def knapsack(amounts, target, fee_rate, n_outputs=1, input_sizes=None, trials=KNAPSACK_TRIALS, seed=None):
+    """
+    Stochastic approximation of the smallest subset sum above the target (Bitcoin Core's knapsack solver).
+    Each trial is a vectorized pass: draw a random subset, take it largest-first until it covers the target.
+    """
+    amounts = np.asarray(amounts, dtype=np.int64)
+    effective = _effective_values(amounts, fee_rate, input_sizes)
+    needed = target + int(np.ceil((TX_OVERHEAD_SIZE + (n_outputs + 1) * OUTPUT_SIZE) * fee_rate)) + DUST_THRESHOLD
+
+    candidates = np.flatnonzero(effective > 0)
+    if len(candidates) == 0 or effective[candidates].sum() < needed:
+        return None
+
+    # The smallest single UTXO that covers everything on its own is the baseline to beat
+    larger = candidates[effective[candidates] >= needed]
+    best = None
+    best_total = None
+    if len(larger):
+        smallest_larger = larger[np.argmin(effective[larger])]
+        best = np.array([smallest_larger])
+        best_total = int(effective[smallest_larger])
+
+    smaller = candidates[effective[candidates] < needed]
+    smaller = smaller[np.argsort(-effective[smaller], kind='stable')]
+    values = effective[smaller]
+    if values.sum() >= needed:
+        # Random subsets only need to range over the largest UTXOs: beyond twice the target the tail
+        # can only add more inputs, so it is cut off to keep each trial proportional to the answer.
+        cutoff = int(np.searchsorted(np.cumsum(values), 2 * needed)) + 1
+        smaller, values = smaller[:cutoff], values[:cutoff]
+        rng = np.random.default_rng(seed)
+        for trial in range(trials):
+            # The first trial is the deterministic largest-first pass over the smaller UTXOs
+            mask = np.ones(len(values), dtype=bool) if trial == 0 else rng.random(len(values)) < 0.5
+            picked = np.flatnonzero(mask)
+            sums = np.cumsum(values[picked])
+            k = np.searchsorted(sums, needed)
+            if k == len(sums):
+                continue
+            total = int(sums[k])
+            if best_total is None or total < best_total or (total == best_total and k + 1 < len(best)):
+                best = smaller[picked[:k + 1]]
+                best_total = total
+                if total == needed:
+                    break
+
+    if best is None:
+        return None
+    return _finish(amounts, best, target, fee_rate, n_outputs, input_sizes, 'knapsack')
+
+
+def largest_first(amounts, target, fee_rate, n_outputs=1, input_sizes=None):
+    amounts = np.asarray(amounts, dtype=np.int64)
+    effective = _effective_values(amounts, fee_rate, input_sizes)
+    order = np.argsort(-effective, kind='stable')
+    order = order[effective[order] > 0]
+    needed = target + int(np.ceil((TX_OVERHEAD_SIZE + n_outputs * OUTPUT_SIZE) * fee_rate))
+    sums = np.cumsum(effective[order])
+    k = np.searchsorted(sums, needed)
+    if k == len(sums):
+        return None
+    return _finish(amounts, order[:k + 1], target, fee_rate, n_outputs, input_sizes, 'largest_first')
+
+
+STRATEGIES = {
+    'branch_and_bound': branch_and_bound,
+    'knapsack': knapsack,
+    'largest_first': largest_first,
+}
+
+
+def select_coins(amounts, target, fee_rate, n_outputs=1, input_sizes=None, strategy=None):
+    """
+    Select inputs paying ``target`` satoshis to ``n_outputs`` outputs at ``fee_rate`` sat/vbyte.
+    Without an explicit strategy, a changeless branch-and-bound match is preferred,
+    then knapsack, then largest-first. Raises InsufficientFunds when nothing works.
+    """
+    if target <= 0:
+        raise ValueError("Target amount must be positive")
+    strategies = [strategy] if strategy else ['branch_and_bound', 'knapsack', 'largest_first']
+    for name in strategies:
+        selection = STRATEGIES[name](amounts, target, fee_rate, n_outputs=n_outputs, input_sizes=input_sizes)
+        if selection is not None:
+            return selection
+    raise InsufficientFunds("Not enough funds to cover the amount plus fee")
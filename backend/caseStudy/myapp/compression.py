@@ -0,0 +1,70 @@
+"""
+Content-Encoding negotiation for responses built in views.
+
+Brotli is preferred when the client accepts it and the ``brotli`` package is installed,
+then gzip. Small bodies are sent as-is since the framing would outweigh the savings.
+"""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_COMPRESS_SIZE = 200
+
+
+def accepted_encodings(request):
+    """
+    Encodings from the Accept-Encoding header that the client did not refuse with q=0.
+    """
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if name and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(name.lower())
+    return encodings
+
+
+def compress(body, encoding, best=False):
+    """
+    Per-response levels trade ratio for speed; ``best`` is for bodies compressed once and reused.
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else 5)
+    return gzip.compress(body, compresslevel=9 if best else 6)
+
+
+def choose_encoding(request):
+    accepted = accepted_encodings(request)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compressed_response(request, body, content_type):
+    """
+    HttpResponse with ``body`` (bytes) encoded with the best encoding the client accepts.
+    """
+    encoding = choose_encoding(request) if len(body) >= MIN_COMPRESS_SIZE else None
+    response = HttpResponse(compress(body, encoding) if encoding else body, content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def compressed_json_response(request, data):
+    return compressed_response(request, json.dumps(data, cls=DjangoJSONEncoder).encode(), 'application/json')
+
+
+def accepts_binary(request):
+    return 'application/octet-stream' in request.META.get('HTTP_ACCEPT', '')
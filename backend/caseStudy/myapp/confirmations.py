@@ -0,0 +1,279 @@
+"""
+Server-side confirmation tracking.
+
+Broadcast transactions are registered here instead of every client polling BlockCypher.
+A background thread watches the chain tip; when a new block arrives it looks up the block
+height of each still-unconfirmed transaction once, and confirmations for everything already
+mined are computed locally as ``tip - block_height + 1``.
+
+Hashes registered by clients (batch status, event streams) rather than by our own broadcasts are
+only tracked once upstream has returned them. Until then they sit in a separate, smaller pool, are
+looked up on every cycle, and are dropped after ``max_misses`` not-found answers, so made-up
+hashes cannot cost upstream calls forever or crowd out real broadcasts.
+
+Transactions buried deeper than ``max_depth`` are no longer looked up, but their block height is
+kept in a bounded ``buried`` map so their confirmations are still answered from the tip.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .providers import get_provider
+from .throttle import low_priority
+
+UNCONFIRMED = -1
+
+# Seconds between checks of the tracker's version in async streams
+ASYNC_STREAM_POLL = 1.0
+
+
+def is_not_found(error):
+    response = getattr(error, 'response', None)
+    return response is not None and getattr(response, 'status_code', None) == 404
+
+
+class ConfirmationTracker:
+
+    def __init__(self, poll_interval, max_depth, max_tracked, max_unverified=1000, max_misses=3, max_buried=None,
+                 autostart=True):
+        self.poll_interval = poll_interval
+        self.max_depth = max_depth
+        self.max_tracked = max_tracked
+        self.max_buried = max_tracked if max_buried is None else max_buried
+        self.max_unverified = max_unverified
+        self.max_misses = max_misses
+        self.autostart = autostart
+        self.tip = None
+        # Incremented whenever any status changes, so waiters can tell something happened
+        self.version = 0
+        self._heights = {}
+        self._unchecked = set()
+        # Client-registered hashes upstream has not returned yet, with their not-found count
+        self._unverified = {}
+        # Block heights of transactions past max_depth, oldest first
+        self._buried = OrderedDict()
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def ensure_started(self):
+        if not self.autostart or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='confirmation-tracker', daemon=True)
+                self._thread.start()
+
+    def track(self, tx_hash, verified=True):
+        """
+        Start tracking ``tx_hash``. ``verified=False`` is for hashes a client asked about, which are
+        only tracked once upstream knows them.
+        """
+        with self._condition:
+            if tx_hash in self._heights or tx_hash in self._unverified or tx_hash in self._buried:
+                return
+            if not verified:
+                if len(self._unverified) >= self.max_unverified:
+                    raise OverflowError("Too many unknown transactions are waiting for a lookup")
+                self._unverified[tx_hash] = 0
+            else:
+                if len(self._heights) >= self.max_tracked:
+                    raise OverflowError("Too many transactions are being tracked")
+                self._heights[tx_hash] = UNCONFIRMED
+                self._unchecked.add(tx_hash)
+        self.ensure_started()
+        self._wake.set()
+
+    def untrack(self, tx_hash):
+        """
+        Stop tracking ``tx_hash``, e.g. when its broadcast failed and it will never be mined.
+        """
+        with self._condition:
+            self._heights.pop(tx_hash, None)
+            self._unchecked.discard(tx_hash)
+            self._unverified.pop(tx_hash, None)
+            self._buried.pop(tx_hash, None)
+
+    def confirmations(self, tx_hash):
+        """
+        Confirmations for a tracked transaction, 0 while unconfirmed, None when it is not tracked
+        or its first lookup has not happened yet.
+        """
+        with self._condition:
+            height = self._heights.get(tx_hash, self._buried.get(tx_hash))
+            if height is None or tx_hash in self._unchecked:
+                return None
+            if height == UNCONFIRMED or self.tip is None:
+                return 0
+            return max(0, self.tip['height'] - height + 1)
+
+    def is_tracked(self, tx_hash):
+        with self._condition:
+            return tx_hash in self._heights or tx_hash in self._unverified or tx_hash in self._buried
+
+    def statuses(self, tx_hashes):
+        return {tx_hash: self.confirmations(tx_hash) for tx_hash in tx_hashes}
+
+    def wait_for_change(self, version, timeout):
+        """
+        Block until ``self.version`` moves past ``version`` or ``timeout`` seconds pass; returns the new version.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def poll_once(self):
+        """
+        One tracker cycle: one chain-tip call, plus one lookup per unconfirmed transaction
+        only when the tip moved (or the transaction was just registered).
+        """
+        provider = get_provider()
+        with low_priority():
+            tip = provider.get_chain_tip()
+        with self._condition:
+            new_block = self.tip is None or tip['hash'] != self.tip['hash']
+            if new_block:
+                # A reorg can undo confirmations above the new tip; look those transactions up again
+                for tx_hash, height in self._heights.items():
+                    if height > tip['height']:
+                        self._heights[tx_hash] = UNCONFIRMED
+            pending = [tx_hash for tx_hash, height in self._heights.items()
+                       if tx_hash in self._unchecked or (new_block and height == UNCONFIRMED)]
+            pending.extend(self._unverified)
+
+        heights = {}
+        not_found = []
+        for tx_hash in pending:
+            try:
+                with low_priority():
+                    heights[tx_hash] = provider.get_transaction(tx_hash)['block_height']
+            except Exception as e:
+                if is_not_found(e):
+                    not_found.append(tx_hash)
+                else:
+                    print(e)
+
+        with self._condition:
+            self.tip = tip
+            for tx_hash in not_found:
+                if tx_hash in self._unverified:
+                    self._unverified[tx_hash] += 1
+                    if self._unverified[tx_hash] >= self.max_misses:
+                        del self._unverified[tx_hash]
+            for tx_hash in list(heights):
+                # Upstream knows it now; track it like our own broadcasts while there is room
+                if self._unverified.pop(tx_hash, None) is not None and len(self._heights) < self.max_tracked:
+                    self._heights[tx_hash] = UNCONFIRMED
+            for tx_hash, height in heights.items():
+                if tx_hash in self._heights:
+                    self._heights[tx_hash] = height if height is not None and height >= 0 else UNCONFIRMED
+                    self._unchecked.discard(tx_hash)
+            # Deeply buried transactions will not change any more; only their height is kept
+            for tx_hash, height in list(self._heights.items()):
+                if height != UNCONFIRMED and tip['height'] - height + 1 > self.max_depth:
+                    del self._heights[tx_hash]
+                    self._buried[tx_hash] = height
+            while len(self._buried) > self.max_buried:
+                self._buried.popitem(last=False)
+            if new_block or heights or not_found:
+                self.version += 1
+                self._condition.notify_all()
+        return new_block
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(e)
+            self._wake.wait(self.poll_interval)
+
+
+def _next_event(tracker, tx_hash, target, last_sent):
+    """
+    (confirmations sent, event to send or None, whether the stream is over) for the tracker's current state.
+    """
+    confirmations = tracker.confirmations(tx_hash)
+    if confirmations is not None and confirmations != last_sent:
+        event = 'data: %s\n\n' % json.dumps({"hash": tx_hash, "confirmations": confirmations})
+        return confirmations, event, confirmations >= target
+    if confirmations is None and not tracker.is_tracked(tx_hash):
+        event = 'data: %s\n\n' % json.dumps({"hash": tx_hash, "confirmations": None, "error": "Transaction not found"})
+        return last_sent, event, True
+    return last_sent, None, False
+
+
+def confirmation_events(tracker, tx_hash, target, timeout, keepalive=15, retry=None):
+    """
+    Server-sent events for one transaction: a ``data:`` line whenever its confirmation count changes,
+    ending once it reaches ``target``, when upstream does not know the transaction, or after
+    ``timeout`` seconds. Streams are kept short because each one holds a worker thread while open;
+    ``retry`` (seconds) tells EventSource when to reconnect for the next window.
+    """
+    deadline = time.monotonic() + timeout
+    version = tracker.version
+    last_sent = None
+    if retry is not None:
+        yield 'retry: %d\n\n' % (retry * 1000)
+    while True:
+        last_sent, event, done = _next_event(tracker, tx_hash, target, last_sent)
+        if event:
+            yield event
+        if done:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        new_version = tracker.wait_for_change(version, timeout=min(keepalive, remaining))
+        if new_version == version:
+            yield ': keep-alive\n\n'
+        version = new_version
+
+
+async def aconfirmation_events(tracker, tx_hash, target, timeout, keepalive=15, retry=None):
+    """
+    confirmation_events for the ASGI views: waits on the event loop, so an open stream holds no thread.
+    """
+    deadline = time.monotonic() + timeout
+    version = tracker.version
+    last_sent = None
+    if retry is not None:
+        yield 'retry: %d\n\n' % (retry * 1000)
+    while True:
+        last_sent, event, done = _next_event(tracker, tx_hash, target, last_sent)
+        if event:
+            yield event
+        if done:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        # The tracker's version only moves once per block or lookup, so checking it now and then is enough
+        quiet_until = time.monotonic() + min(keepalive, remaining)
+        while tracker.version == version and time.monotonic() < quiet_until:
+            await asyncio.sleep(min(ASYNC_STREAM_POLL, max(0.0, quiet_until - time.monotonic())))
+        if tracker.version == version:
+            yield ': keep-alive\n\n'
+        version = tracker.version
+
+
+confirmation_tracker = ConfirmationTracker(
+    poll_interval=settings.CONFIRMATION_POLL_INTERVAL,
+    max_depth=settings.CONFIRMATION_TRACK_DEPTH,
+    max_tracked=settings.CONFIRMATION_MAX_TRACKED,
+    max_unverified=settings.CONFIRMATION_MAX_UNVERIFIED,
+    max_misses=settings.CONFIRMATION_MAX_MISSES,
+)
+
+
+def track_confirmations(tx_hash, verified=True):
+    try:
+        confirmation_tracker.track(tx_hash, verified)
+    except OverflowError as e:
+        # Clients can still ask BlockCypher directly through get_confirmations
+        print(e)
@@ -0,0 +1,113 @@
+"""
+Fee-rate service.
+
+Current rates for the fast/normal/economy tiers live in memory and in the FeeRate table, and a
+background thread refreshes both every FEE_REFRESH_INTERVAL seconds at low priority. Requests read
+the cached rates and never wait on the provider, except on a cold start with an empty table.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import coin_selection
+from .models import FeeRate
+from .providers import get_provider
+from .throttle import low_priority
+
+TIERS = ('fast', 'normal', 'economy')
+
+
+class FeeService:
+
+    def __init__(self, refresh_interval, autostart=True):
+        self.refresh_interval = refresh_interval
+        self.autostart = autostart
+        self.updated_at = None
+        self._rates = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_started(self):
+        if not self.autostart or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='fee-refresh', daemon=True)
+                self._thread.start()
+
+    def cached_rates(self):
+        """
+        The in-memory rates, or None before they were loaded; never touches the DB or the provider.
+        """
+        return self._rates
+
+    def rates(self):
+        """
+        ``{tier: sat/byte}``, from memory, else from the FeeRate table when it is not older than
+        FEE_MAX_AGE, else fetched once upstream.
+        """
+        self.ensure_started()
+        if self._rates is None:
+            stored = {row.tier: row for row in FeeRate.objects.filter(tier__in=TIERS)}
+            max_age = timezone.now() - timedelta(seconds=settings.FEE_MAX_AGE)
+            if len(stored) == len(TIERS) and all(row.updated_at >= max_age for row in stored.values()):
+                self._set({tier: row.sat_per_byte for tier, row in stored.items()},
+                          min(row.updated_at for row in stored.values()))
+            else:
+                self.refresh(low=False)
+        return self._rates
+
+    def rate(self, tier=None):
+        tier = tier or settings.FEE_DEFAULT_TIER
+        if tier not in TIERS:
+            raise ValueError("Unknown fee tier %r" % tier)
+        return self.rates()[tier]
+
+    def _set(self, rates, updated_at):
+        with self._lock:
+            self._rates = rates
+            self.updated_at = updated_at
+
+    def refresh(self, low=True):
+        """
+        Fetch current rates upstream and store them in memory and in the DB.
+        """
+        if low:
+            with low_priority():
+                rates = get_provider().get_fee_rates()
+        else:
+            rates = get_provider().get_fee_rates()
+        rates = {tier: max(1, int(rates[tier])) for tier in TIERS}
+        now = timezone.now()
+        with transaction.atomic():
+            for tier, rate in rates.items():
+                FeeRate.objects.update_or_create(tier=tier, defaults={'sat_per_byte': rate, 'updated_at': now})
+        self._set(rates, now)
+        return rates
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Shed or failed; the previous rates stay in use
+                print(e)
+            finally:
+                close_old_connections()
+
+
+fee_service = FeeService(refresh_interval=settings.FEE_REFRESH_INTERVAL)
+
+
+def estimate_fee(n_inputs, n_outputs, tier=None, rates=None):
+    """
+    Fee in satoshis for a transaction with the given input and output counts at a tier's rate.
+    """
+    tier = tier or settings.FEE_DEFAULT_TIER
+    rates = rates or fee_service.rates()
+    return coin_selection.estimate_fee(n_inputs, n_outputs, rates[tier])
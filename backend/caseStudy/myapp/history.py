@@ -0,0 +1,82 @@
+"""
+Incremental transaction history for tracked addresses.
+
+Confirmed txrefs are kept in the TxRef table. A sync only asks upstream for refs above the stored
+high-water block height (minus TXREF_REORG_DEPTH, which is re-fetched and replaced so a reorg
+cannot leave orphaned refs behind). Pages are read with keyset pagination on
+``(block_height, id)`` off the ``(address, block_height)`` index.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .cache import LRUCache
+from .models import TxRef
+from .providers import get_provider
+
+TXREF_FIELDS = ('tx_hash', 'block_height', 'tx_input_n', 'tx_output_n', 'value', 'ref_balance', 'confirmed',
+                'double_spend')
+
+# address -> (monotonic time of the last sync, unconfirmed refs it returned)
+_last_sync = LRUCache(maxsize=10000)
+
+
+def sync_txrefs(address):
+    """
+    Store confirmed refs newer than the high-water mark for an Address row and return its unconfirmed refs.
+    """
+    high_water = TxRef.objects.filter(address=address).aggregate(height=Max('block_height'))['height']
+    after = None if high_water is None else max(-1, high_water - settings.TXREF_REORG_DEPTH)
+    data = get_provider().get_txrefs(address.address, after=after)
+
+    refs = [TxRef(address=address, **{field: ref.get(field) for field in TXREF_FIELDS if field in ref})
+            for ref in data.get('txrefs', [])
+            if ref.get('block_height', -1) >= 0 and (after is None or ref['block_height'] > after)]
+    with transaction.atomic():
+        if after is not None:
+            TxRef.objects.filter(address=address, block_height__gt=after).delete()
+        TxRef.objects.bulk_create(refs, batch_size=500, ignore_conflicts=True)
+
+    unconfirmed = data.get('unconfirmed_txrefs', [])
+    _last_sync.set(address.address, (time.monotonic(), unconfirmed))
+    return unconfirmed
+
+
+def unconfirmed_txrefs(address):
+    """
+    Unconfirmed refs for an Address row, syncing first when the last sync is older than TXREF_SYNC_TTL.
+    """
+    last = _last_sync.get(address.address)
+    if last is not None and time.monotonic() - last[0] < settings.TXREF_SYNC_TTL:
+        return last[1]
+    return sync_txrefs(address)
+
+
+def parse_cursor(cursor):
+    height, pk = cursor.split(':')
+    return int(height), int(pk)
+
+
+def history_page(address, before=None, limit=None):
+    """
+    Returns (refs, next_cursor) for an Address row, newest first. ``before`` is the ``"height:id"``
+    cursor of the previous page's last ref; ``next_cursor`` is None on the last page.
+    """
+    if limit is None:
+        limit = settings.HISTORY_PAGE_DEFAULT_LIMIT
+    limit = max(1, min(limit, settings.HISTORY_PAGE_MAX_LIMIT))
+    refs = TxRef.objects.filter(address=address)
+    if before is not None:
+        height, pk = parse_cursor(before)
+        refs = refs.filter(Q(block_height__lt=height) | Q(block_height=height, id__lt=pk))
+    # One extra row tells us whether another page exists
+    rows = list(refs.order_by('-block_height', '-id').values('id', *TXREF_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = '%d:%d' % (rows[-1]['block_height'], rows[-1]['id'])
+    for row in rows:
+        del row['id']
+    return rows, next_cursor
@@ -0,0 +1,58 @@
+"""
+Third-party modules imported the first time they are used instead of at process start.
+
+numpy, httpx, requests, blockcypher (with pybitcointools and dateutil behind it) and bit account
+for most of what a worker or management command spends importing the app, while many processes
+(migrate, the test runner, a worker that has not served a send yet) need few of them, or only on
+an error path. ``lazy_import`` returns a stand-in whose first attribute read imports the real
+module, so callers keep writing ``np.cumsum(...)`` or ``except requests.HTTPError``.
+
+``manage.py startup_report`` checks that none of STARTUP_DEFERRED_MODULES is imported during
+startup again.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """
+    Attributes are copied onto the stand-in as they are first read, so later reads (``np.cumsum`` in
+    a selection loop) cost no more than a module attribute.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            # import_module holds the import lock, so concurrent first uses import once
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._name
+
+
+def lazy_import(name):
+    """
+    ``name`` (dotted names allowed) as a module imported on first attribute access.
+    """
+    return LazyModule(name)
+
+
+def lazy_isinstance(obj, module, class_name):
+    """
+    ``isinstance(obj, module.class_name)`` for a LazyModule, without importing it to find out:
+    nothing is an instance of a class whose module was never imported.
+    """
+    return module._name in sys.modules and isinstance(obj, getattr(module, class_name))
@@ -0,0 +1,50 @@
+import importlib
+import inspect
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+BENCHMARKS = ['coin_selection', 'tx_parser', 'serialization', 'load']
+
+
+class Command(BaseCommand):
+    help = "Run offline benchmarks and print one result row per line"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Benchmarks to run (default: all of %s)" % ", ".join(BENCHMARKS))
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help="Print rows as JSON lines")
+        parser.add_argument('-o', '--option', action='append', default=[], metavar='KEY=VALUE',
+                            help="Keyword argument for the benchmarks' run(), e.g. -o concurrency=16")
+
+    def handle(self, *args, **options):
+        names = options['names'] or BENCHMARKS
+        run_options = dict(self._parse_option(option) for option in options['option'])
+        run_options['repeat'] = options['repeat']
+        for name in names:
+            if name not in BENCHMARKS:
+                raise CommandError("Unknown benchmark %r, choose from %s" % (name, ", ".join(BENCHMARKS)))
+            module = importlib.import_module('myapp.benchmarks.%s' % name)
+            # Options only go to the benchmarks that take them, so one command line can run several
+            accepted = inspect.signature(module.run).parameters
+            for row in module.run(**{key: value for key, value in run_options.items() if key in accepted}):
+                if options['json']:
+                    self.stdout.write(json.dumps(row))
+                else:
+                    self.stdout.write("  ".join("%s=%s" % (key, self._format(value)) for key, value in row.items()))
+
+    @staticmethod
+    def _parse_option(option):
+        key, sep, value = option.partition('=')
+        if not sep:
+            raise CommandError("Options are KEY=VALUE, got %r" % option)
+        try:
+            return key, json.loads(value)
+        except ValueError:
+            return key, value
+
+    @staticmethod
+    def _format(value):
+        if isinstance(value, float):
+            return "%.3f" % value
+        return value
@@ -0,0 +1,21 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from myapp.static_assets import asset_roots, compressed_files, precompress
+
+
+class Command(BaseCommand):
+    help = "Write .br and .gz copies of the built frontend assets (run after npm run build)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recompress files that are already up to date")
+
+    def handle(self, *args, **options):
+        written = 0
+        saved = 0
+        for path in compressed_files(root for root in asset_roots() if os.path.isdir(root)):
+            for target in precompress(path, force=options['force']):
+                written += 1
+                saved += os.path.getsize(path) - os.path.getsize(target)
+        self.stdout.write("written=%d saved_bytes=%d" % (written, saved))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.bulk_import import import_addresses
+
+
+class Command(BaseCommand):
+    help = "Import addresses (one per line) from a file, or from stdin with '-'"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File with one address per line, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=None, help="Addresses per upstream call")
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent upstream calls")
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            try:
+                with open(options['path']) as f:
+                    lines = f.read().splitlines()
+            except OSError as e:
+                raise CommandError(e)
+
+        result = import_addresses([line for line in lines if line.strip()],
+                                  batch_size=options['batch_size'], workers=options['workers'])
+        self.stdout.write("created=%d existing=%d invalid=%d failed=%d" % (
+            result['created'], result['existing'], len(result['invalid']), len(result['failed'])))
+        for address in result['invalid']:
+            self.stderr.write("invalid %s" % address)
+        for address in result['failed']:
+            self.stderr.write("failed %s" % address)
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.blockindex import BlockIndex
+
+
+class Command(BaseCommand):
+    help = "Index the node's blk*.dat files into the local address index, once or every --interval seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Catch up once and exit")
+        parser.add_argument('--interval', type=int, default=settings.BLOCK_INDEX_INTERVAL)
+        parser.add_argument('--blocks-dir', default=settings.BLOCK_INDEX_BLOCKS_DIR)
+        parser.add_argument('--max-blocks', type=int, default=None, help="Blocks indexed per run at most")
+        parser.add_argument('--workers', type=int, default=settings.BLOCK_INDEX_WORKERS)
+
+    def handle(self, *args, **options):
+        if not options['blocks_dir']:
+            raise CommandError("Set BLOCK_INDEX_BLOCKS_DIR or pass --blocks-dir")
+        index = BlockIndex(settings.BLOCK_INDEX_PATH, options['blocks_dir'], settings.COIN_SYMBOL)
+        while True:
+            try:
+                indexed = index.update(max_blocks=options['max_blocks'], workers=options['workers'])
+                self.stdout.write("indexed=%d height=%d" % (indexed, index.tip()[0]))
+            except Exception as e:
+                print(e)
+            if options['once']:
+                return
+            time.sleep(options['interval'])
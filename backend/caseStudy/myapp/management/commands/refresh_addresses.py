@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.refresher import refresh_stale_addresses
+
+
+class Command(BaseCommand):
+    help = "Refresh stale Address rows from upstream in batches, once or every --interval seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single cycle and exit")
+        parser.add_argument('--interval', type=int, default=settings.ADDRESS_REFRESH_INTERVAL)
+        parser.add_argument('--limit', type=int, default=settings.ADDRESS_REFRESH_LIMIT,
+                            help="Rows refreshed per cycle at most")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                refreshed, skipped, missing = refresh_stale_addresses(limit=options['limit'])
+                self.stdout.write("refreshed=%d skipped=%d missing=%d" % (refreshed, skipped, missing))
+            except Exception as e:
+                print(e)
+            finally:
+                close_old_connections()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
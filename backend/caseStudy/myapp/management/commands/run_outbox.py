@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.outbox import process_due
+
+
+class Command(BaseCommand):
+    help = "Broadcast queued transactions from the outbox, once or continuously"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit")
+        parser.add_argument('--interval', type=int, default=settings.OUTBOX_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                processed = process_due()
+                if processed:
+                    self.stdout.write("processed=%d" % processed)
+            except Exception as e:
+                print(e)
+            finally:
+                close_old_connections()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,54 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.startup import by_package, deferred_imports, profile
+
+
+class Command(BaseCommand):
+    help = "Profile a cold start (django.setup() and ROOT_URLCONF) with -X importtime and check it against STARTUP_BUDGET"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help="Cold starts to time; the fastest is reported")
+        parser.add_argument('--top', type=int, default=15, help="Packages and modules to list")
+        parser.add_argument('--budget', type=float, help="Seconds allowed (default: STARTUP_BUDGET)")
+        parser.add_argument('--json', action='store_true', help="Print the report as one JSON object")
+
+    def handle(self, *args, **options):
+        budget = settings.STARTUP_BUDGET if options['budget'] is None else options['budget']
+        try:
+            result = profile(runs=options['runs'])
+        except RuntimeError as e:
+            raise CommandError("Startup failed: %s" % e)
+        total = result.setup + result.urls
+        packages = list(by_package(result.imports).items())[:options['top']]
+        modules = sorted(result.imports, key=lambda record: record.self_us, reverse=True)[:options['top']]
+        deferred = deferred_imports(result.modules)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'setup': result.setup, 'urls': result.urls, 'total': total, 'budget': budget,
+                'packages': [{'package': name, 'modules': count, 'self_ms': us / 1000}
+                             for name, (count, us) in packages],
+                'modules': [{'module': record.module, 'self_ms': record.self_us / 1000,
+                             'cumulative_ms': record.cumulative_us / 1000} for record in modules],
+                'deferred_imported': deferred,
+            }))
+        else:
+            self.stdout.write("setup=%.3f urls=%.3f total=%.3f budget=%.3f modules=%d"
+                              % (result.setup, result.urls, total, budget, len(result.imports)))
+            self.stdout.write("\npackage  modules  self_ms")
+            for name, (count, us) in packages:
+                self.stdout.write("%s  %d  %.1f" % (name, count, us / 1000))
+            self.stdout.write("\nmodule  self_ms  cumulative_ms")
+            for record in modules:
+                self.stdout.write("%s  %.1f  %.1f" % (record.module, record.self_us / 1000, record.cumulative_us / 1000))
+
+        problems = []
+        if total > budget:
+            problems.append("startup took %.3fs, over the %.3fs budget" % (total, budget))
+        if deferred:
+            problems.append("imported at startup instead of on first use: %s" % ", ".join(deferred))
+        if problems:
+            raise CommandError("; ".join(problems))
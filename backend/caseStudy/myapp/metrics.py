@@ -0,0 +1,293 @@
+"""
+Request and upstream-call instrumentation.
+
+MetricsMiddleware times every request into a per-view latency histogram. Upstream calls made by
+GuardedProvider while the request runs are timed into a per-(view, operation) histogram, with
+rate-limit and error counters, so a slow view can be split into time spent upstream and time spent
+here. ``render_prometheus()`` serves everything in the Prometheus text format.
+
+With METRICS_PROFILE_SLOW_REQUESTS on, one shared sampler thread also records the stacks of
+in-flight sync requests, and requests slower than METRICS_SLOW_REQUEST_SECONDS print their upstream
+calls and hottest stacks.
+"""
+import math
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .resilience import CLOSED, breakers
+from .throttle import upstream_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+BACKGROUND = 'background'  # upstream calls made outside a request (refresher, outbox, fee thread)
+UNRESOLVED = 'unresolved'  # requests answered before URL resolution (redirects, middleware errors)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label tuple, as Prometheus expects them.
+    """
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """
+        ``{label values: (cumulative bucket counts, sum, count)}``.
+        """
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in series.items():
+            for i in range(1, len(counts)):
+                counts[i] += counts[i - 1]
+        return series
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help_text), '# TYPE %s histogram' % self.name]
+        for label_values, (counts, total, count) in sorted(self.snapshot().items()):
+            labels = _labels(self.labels, label_values)
+            for bound, cumulative in zip(self.buckets, counts):
+                le = '+Inf' if bound == math.inf else repr(float(bound))
+                lines.append('%s_bucket{%s} %d' % (self.name, _join(labels, 'le="%s"' % le), cumulative))
+            lines.append('%s_sum{%s} %r' % (self.name, labels, total))
+            lines.append('%s_count{%s} %d' % (self.name, labels, count))
+        return lines
+
+
+class LabeledCounter:
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = Counter()
+
+    def incr(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help_text), '# TYPE %s counter' % self.name]
+        for label_values, value in sorted(self.snapshot().items()):
+            lines.append('%s{%s} %d' % (self.name, _labels(self.labels, label_values), value))
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    return ','.join('%s="%s"' % (name, _escape(value)) for name, value in zip(names, values))
+
+
+def _join(*parts):
+    return ','.join(part for part in parts if part)
+
+
+request_latency = Histogram('http_request_duration_seconds', 'Time until the view returned a response.',
+                            ('view', 'method'))
+requests_total = LabeledCounter('http_requests_total', 'Requests by view and status code.',
+                                ('view', 'method', 'status'))
+upstream_latency = Histogram('upstream_call_duration_seconds', 'Time spent in upstream chain calls.',
+                             ('view', 'operation'))
+upstream_errors = LabeledCounter('upstream_call_errors_total',
+                                 'Failed upstream calls; kind is rate_limited, throttled or error.',
+                                 ('view', 'operation', 'kind'))
+
+
+class RequestScope:
+    """
+    Per-request state shared with code running under the request's context.
+    """
+    __slots__ = ('view', 'upstream', 'samples')
+
+    def __init__(self):
+        self.view = UNRESOLVED
+        self.upstream = []
+        self.samples = None
+
+
+_scope = ContextVar('metrics_request_scope', default=None)
+
+
+def current_view():
+    scope = _scope.get()
+    return scope.view if scope is not None else BACKGROUND
+
+
+def record_upstream(operation, seconds, error_kind=None):
+    scope = _scope.get()
+    view = scope.view if scope is not None else BACKGROUND
+    upstream_latency.observe((view, operation), seconds)
+    if error_kind is not None:
+        upstream_errors.incr((view, operation, error_kind))
+    if scope is not None:
+        scope.upstream.append((operation, seconds, error_kind))
+
+
+def render_prometheus():
+    lines = []
+    for metric in (request_latency, requests_total, upstream_latency, upstream_errors):
+        lines.extend(metric.render())
+    lines.append('# HELP upstream_events_total Upstream calls, coalesced, throttled and shed requests.')
+    lines.append('# TYPE upstream_events_total counter')
+    for event, value in sorted(upstream_stats.snapshot().items()):
+        lines.append('upstream_events_total{event="%s"} %d' % (_escape(event), value))
+    lines.append('# HELP upstream_circuit_open Whether the circuit breaker of an upstream operation is open.')
+    lines.append('# TYPE upstream_circuit_open gauge')
+    for operation, state in sorted(breakers.snapshot().items()):
+        lines.append('upstream_circuit_open{operation="%s"} %d' % (_escape(operation), state != CLOSED))
+    return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    """
+    One daemon thread that samples the stacks of registered threads every ``interval`` seconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._thread = None
+
+    def register(self, scope):
+        scope.samples = Counter()
+        with self._lock:
+            self._threads[threading.get_ident()] = scope
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+                self._thread.start()
+
+    def unregister(self):
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+
+    def sample(self):
+        with self._lock:
+            threads = dict(self._threads)
+        if not threads:
+            return
+        frames = sys._current_frames()
+        for ident, scope in threads.items():
+            frame = frames.get(ident)
+            if frame is not None:
+                scope.samples[_collapse(frame)] += 1
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+
+
+def _collapse(frame, depth=12):
+    stack = []
+    while frame is not None and len(stack) < depth:
+        code = frame.f_code
+        stack.append('%s:%s' % (code.co_filename.rsplit('/', 1)[-1], code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+sampler = StackSampler(interval=settings.METRICS_PROFILE_INTERVAL)
+
+
+def slow_request_report(request, scope, elapsed):
+    lines = ['Slow request %s %s: %.3fs (view %s)' % (request.method, request.path, elapsed, scope.view)]
+    upstream = sum(seconds for _, seconds, _ in scope.upstream)
+    lines.append('  upstream: %.3fs in %d calls' % (upstream, len(scope.upstream)))
+    for operation, seconds, error_kind in scope.upstream:
+        lines.append('    %s %.3fs%s' % (operation, seconds, ' (%s)' % error_kind if error_kind else ''))
+    if scope.samples:
+        total = sum(scope.samples.values())
+        lines.append('  stacks (%d samples):' % total)
+        for stack, count in scope.samples.most_common(5):
+            lines.append('    %3d%% %s' % (100 * count // total, stack))
+    return '\n'.join(lines)
+
+
+class MetricsMiddleware:
+    """
+    Times every request and attributes upstream calls made while it runs to its view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        scope = RequestScope()
+        token = _scope.set(scope)
+        profile = settings.METRICS_PROFILE_SLOW_REQUESTS
+        if profile:
+            sampler.register(scope)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile:
+                sampler.unregister()
+            _scope.reset(token)
+        self.record(request, response, scope, elapsed)
+        return response
+
+    async def __acall__(self, request):
+        # Stacks are not sampled here: the event loop thread is shared by every async request
+        scope = RequestScope()
+        token = _scope.set(scope)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            _scope.reset(token)
+        self.record(request, response, scope, elapsed)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = _scope.get()
+        if scope is not None:
+            match = request.resolver_match
+            scope.view = match.url_name or match.view_name or view_func.__name__
+
+    @staticmethod
+    def record(request, response, scope, elapsed):
+        request_latency.observe((scope.view, request.method), elapsed)
+        requests_total.incr((scope.view, request.method, str(response.status_code)))
+        if settings.METRICS_PROFILE_SLOW_REQUESTS and elapsed >= settings.METRICS_SLOW_REQUEST_SECONDS:
+            print(slow_request_report(request, scope, elapsed))
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def drop_duplicate_addresses(apps, schema_editor):
+    # Keep the most recently fetched row for every address so the unique index can be built.
+    Address = apps.get_model('myapp', 'Address')
+    seen = set()
+    duplicates = []
+    for pk, address in Address.objects.order_by('address', '-created_at', '-id').values_list('id', 'address'):
+        if address in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(address)
+    if duplicates:
+        Address.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_delete_txref'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_addresses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='address',
+            name='address',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    # created_at used to be bumped on every refresh, so it is the best guess for existing rows
+    Address = apps.get_model('myapp', 'Address')
+    Address.objects.update(refreshed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_address_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='refreshed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_address_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TxRef',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_hash', models.CharField(max_length=64)),
+                ('block_height', models.IntegerField()),
+                ('tx_input_n', models.IntegerField()),
+                ('tx_output_n', models.IntegerField()),
+                ('value', models.BigIntegerField()),
+                ('ref_balance', models.BigIntegerField(null=True)),
+                ('confirmed', models.DateTimeField(blank=True, null=True)),
+                ('double_spend', models.BooleanField(default=False)),
+                ('address', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='txrefs', to='myapp.address')),
+            ],
+            options={
+                'ordering': ['-block_height', '-id'],
+                'indexes': [models.Index(fields=['address', 'block_height'], name='txref_address_height')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='txref',
+            constraint=models.UniqueConstraint(fields=('address', 'tx_hash', 'tx_input_n', 'tx_output_n'), name='unique_txref'),
+        ),
+    ]
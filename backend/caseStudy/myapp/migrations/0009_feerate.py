@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_outboxtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeRate',
+            fields=[
+                ('tier', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('sat_per_byte', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Address(models.Model):
-    address = models.CharField(max_length=200)
+    address = models.CharField(max_length=200, unique=True)
     total_received = models.PositiveBigIntegerField()
     total_sent = models.PositiveBigIntegerField()
     balance = models.BigIntegerField()
@@ -13,11 +14,92 @@ class Address(models.Model):
     final_n_tx = models.PositiveIntegerField()
     tx_url = models.URLField(blank=True)
 
-    # Timestamp
+    # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
+    # When the balances were last fetched upstream; indexed so the refresher can find stale rows cheaply
+    refreshed_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination of the address list walks this index
+        indexes = [models.Index(fields=['created_at', 'id'], name='address_created_id')]
 
     def __str__(self):
         return self.address
+
+
+class TxRef(models.Model):
+    """
+    One confirmed input or output of a transaction touching a tracked address.
+    Unconfirmed refs are not stored; they change until mined and are fetched live.
+    """
+    address = models.ForeignKey(Address, on_delete=models.CASCADE, related_name='txrefs')
+    tx_hash = models.CharField(max_length=64)
+    block_height = models.IntegerField()
+    tx_input_n = models.IntegerField()
+    tx_output_n = models.IntegerField()
+    value = models.BigIntegerField()
+    ref_balance = models.BigIntegerField(null=True)
+    confirmed = models.DateTimeField(null=True, blank=True)
+    double_spend = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-block_height', '-id']
+        indexes = [models.Index(fields=['address', 'block_height'], name='txref_address_height')]
+        constraints = [
+            models.UniqueConstraint(fields=['address', 'tx_hash', 'tx_input_n', 'tx_output_n'], name='unique_txref'),
+        ]
+
+    def __str__(self):
+        return self.tx_hash
+
+
+class TableVersion(models.Model):
+    """
+    Counter bumped on every write to a table, so list responses can be revalidated with one primary-key read.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return '%s@%d' % (self.name, self.version)
+
+
+class OutboxTransaction(models.Model):
+    """
+    A signed transaction accepted for broadcast. Rows are written before anything goes upstream,
+    so a queued transaction survives worker crashes; ``txid`` makes resubmissions idempotent.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    txid = models.CharField(max_length=64, unique=True)
+    raw_tx = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # A worker owns the row until this time; an expired lease means the worker died mid-broadcast
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_attempt')]
+
+    def __str__(self):
+        return self.txid
+
+
+class FeeRate(models.Model):
+    """
+    Last known fee rate per tier, so a restarted worker has usable rates before its first refresh.
+    """
+    tier = models.CharField(max_length=20, primary_key=True)
+    sat_per_byte = models.PositiveIntegerField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return '%s: %d sat/B' % (self.tier, self.sat_per_byte)
@@ -0,0 +1,219 @@
+"""
+Durable broadcast outbox.
+
+The broadcast endpoint only parses the signed transaction and inserts an OutboxTransaction row
+keyed by its txid, so resubmitting the same transaction is a no-op and request latency does not
+depend on the provider. Workers claim due rows with a time-limited lease (a conditional UPDATE,
+so several processes can share the table without row locks), push them upstream, and retry
+transient failures with exponential backoff. A worker that dies mid-broadcast just lets its lease
+expire and another worker picks the row up; pushing the same txid twice is harmless.
+"""
+import random
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .confirmations import confirmation_tracker, track_confirmations
+from .lazy import lazy_import, lazy_isinstance
+from .models import OutboxTransaction
+from .providers import get_provider
+from .throttle import Throttled
+from .txparser import parse_transaction
+from .utxo_cache import utxo_cache
+
+blockcypher_api = lazy_import('blockcypher.api')
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+DUPLICATE = 'duplicate'
+
+# Node reject reasons meaning the transaction itself is already in the mempool or a block. Conflicts
+# ("txn-mempool-conflict", "... has already been spent") are rejections of this transaction, not duplicates.
+ALREADY_KNOWN = re.compile(r'txn-already-in-mempool|txn-already-known|transaction already in block chain')
+
+
+def is_duplicate(text, txid):
+    """
+    Whether a pushtx error body says the network already has ``txid``.
+    """
+    text = (text or '').lower()
+    if ALREADY_KNOWN.search(text):
+        return True
+    # BlockCypher: "Transaction with hash <txid> already exists."
+    return bool(txid) and txid.lower() in text and 'already exists' in text
+
+
+def classify_error(e, txid=None):
+    """
+    Whether a pushtx failure is worth retrying, final, or means the network already has the transaction.
+    """
+    if isinstance(e, Throttled) or lazy_isinstance(e, blockcypher_api, 'RateLimitError'):
+        return TRANSIENT
+    response = getattr(e, 'response', None)
+    if response is not None:
+        if is_duplicate(response.text, txid):
+            return DUPLICATE
+        return TRANSIENT if response.status_code >= 500 or response.status_code == 429 else PERMANENT
+    # Connection errors and timeouts, requests' included (its exceptions are OSErrors)
+    if isinstance(e, OSError):
+        return TRANSIENT
+    # Unknown errors are retried until OUTBOX_MAX_ATTEMPTS rather than dropping a signed transaction
+    return TRANSIENT
+
+
+def backoff(attempts):
+    delay = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    # Jitter keeps retries from many workers from arriving upstream in lockstep
+    return delay * random.uniform(0.5, 1.0)
+
+
+def enqueue_broadcast(txid, raw_tx):
+    """
+    Durably queue a parsed, signed transaction; returns its OutboxTransaction (existing one for a resubmission).
+    Resubmitting a transaction whose broadcast failed queues it again.
+    """
+    try:
+        with transaction.atomic():
+            item, _ = OutboxTransaction.objects.get_or_create(txid=txid, defaults={'raw_tx': raw_tx})
+    except IntegrityError:
+        # Lost a race with a concurrent submission of the same transaction
+        item = OutboxTransaction.objects.get(txid=txid)
+    if item.status == OutboxTransaction.FAILED:
+        OutboxTransaction.objects.filter(pk=item.pk, status=OutboxTransaction.FAILED).update(
+            status=OutboxTransaction.PENDING, attempts=0, next_attempt_at=timezone.now(), leased_until=None)
+        item.refresh_from_db()
+    if item.status == OutboxTransaction.PENDING:
+        # The outputs it spends must not be selected for another send in the meantime
+        utxo_cache.hold([(txin.txid, txin.vout) for txin in parse_transaction(raw_tx).inputs], txid)
+    if settings.OUTBOX_IN_PROCESS:
+        outbox_workers.wake()
+    return item
+
+
+def is_queued(txid):
+    """
+    Whether ``txid`` was handed to the outbox and has not failed, i.e. it should become known upstream.
+    """
+    return OutboxTransaction.objects.filter(txid=txid).exclude(status=OutboxTransaction.FAILED).exists()
+
+
+def _due(now):
+    return (Q(status=OutboxTransaction.PENDING, next_attempt_at__lte=now)
+            & (Q(leased_until__isnull=True) | Q(leased_until__lt=now)))
+
+
+def claim(now=None):
+    """
+    Lease the next due transaction to the calling worker, or return None when nothing is due.
+    """
+    now = now or timezone.now()
+    candidates = OutboxTransaction.objects.filter(_due(now)).order_by('next_attempt_at').values_list('pk', flat=True)
+    for pk in candidates[:10]:
+        lease = now + timedelta(seconds=settings.OUTBOX_LEASE)
+        # Only one worker's UPDATE can match while the lease is free
+        if OutboxTransaction.objects.filter(_due(now), pk=pk).update(leased_until=lease):
+            return OutboxTransaction.objects.get(pk=pk)
+    return None
+
+
+def broadcast(item):
+    """
+    Push one claimed transaction and record the outcome on its row; returns the new status.
+    """
+    item.attempts += 1
+    try:
+        get_provider().pushtx(item.raw_tx)
+        outcome = None
+    except Exception as e:
+        print(e)
+        outcome = classify_error(e, item.txid)
+        item.last_error = str(e)[:1000]
+
+    now = timezone.now()
+    if outcome is None or outcome == DUPLICATE:
+        item.status = OutboxTransaction.SENT
+        item.sent_at = now
+        track_confirmations(item.txid)
+    elif outcome == PERMANENT or item.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        item.status = OutboxTransaction.FAILED
+        utxo_cache.release(item.txid)
+        # A confirmation stream may have registered it while it was queued; it will never be mined
+        confirmation_tracker.untrack(item.txid)
+    else:
+        item.next_attempt_at = now + timedelta(seconds=backoff(item.attempts))
+    item.leased_until = None
+    item.save(update_fields=['status', 'attempts', 'next_attempt_at', 'leased_until', 'last_error', 'sent_at'])
+    return item.status
+
+
+def process_due(limit=None):
+    """
+    Broadcast due transactions until none are left (or ``limit`` is reached); returns how many were processed.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        item = claim()
+        if item is None:
+            break
+        broadcast(item)
+        processed += 1
+    return processed
+
+
+class OutboxWorkerPool:
+    """
+    Daemon threads draining the outbox, woken early when a transaction is queued in this process.
+    Started on a web process's first request (see MyappConfig.ready), so rows left pending by a
+    crash or restart are sent without waiting for a new broadcast.
+    """
+
+    def __init__(self, workers, poll_interval):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name='outbox-%d' % i, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        self.ensure_started()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                process_due()
+            except Exception as e:
+                print(e)
+            finally:
+                close_old_connections()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+def start_workers(**kwargs):
+    """
+    request_started receiver: start the pool in the process serving the request when OUTBOX_IN_PROCESS
+    is set, then stop listening.
+    """
+    if not settings.OUTBOX_IN_PROCESS:
+        return
+    # After any fork, so the threads live in the worker process and not in a preloading parent
+    request_started.disconnect(start_workers)
+    outbox_workers.ensure_started()
+
+
+outbox_workers = OutboxWorkerPool(workers=settings.OUTBOX_WORKERS, poll_interval=settings.OUTBOX_POLL_INTERVAL)
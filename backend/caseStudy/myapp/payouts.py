@@ -0,0 +1,84 @@
+"""
+Batch payouts: one source address paying many recipients in one request.
+
+Recipients are validated in a single pass. The source's unspent outputs are loaded once (through
+the UTXO cache), as are the fee rate and any previous transactions legacy inputs need. The batch
+becomes either one transaction with an output per recipient, or consecutive groups of at most
+``max_outputs`` recipients. Each group selects from the outputs the earlier ones left over, so the
+transactions never spend the same output and can be signed and broadcast independently.
+"""
+from collections import namedtuple
+
+from decouple import config
+from django.conf import settings
+
+from .addresses import is_valid_address
+from .coin_selection import DUST_THRESHOLD
+from .psbt import build_payout_psbt, needs_previous_transactions
+from .utils import fetch_raw_transactions, select_unspent, to_satoshis
+from .utxo_cache import utxo_cache
+
+MODES = ('single', 'split')
+
+# (address, satoshis) in request order
+Payment = namedtuple('Payment', ['address', 'amount'])
+
+# One unsigned transaction of the batch and the payments it carries
+Payout = namedtuple('Payout', ['psbt', 'payments', 'selection'])
+
+
+def parse_recipients(recipients, coin_symbol):
+    """
+    Validate ``[{"to_address": ..., "amount": btc}, ...]`` in one pass.
+    Returns (payments, errors); ``errors`` holds ``{"index", "message"}`` for every bad entry.
+    """
+    payments, errors = [], []
+    for index, recipient in enumerate(recipients):
+        if not isinstance(recipient, dict):
+            errors.append({"index": index, "message": "Expected an object"})
+            continue
+        address = recipient.get('to_address')
+        if not isinstance(address, str) or not is_valid_address(address, coin_symbol):
+            errors.append({"index": index, "message": "Invalid address"})
+            continue
+        try:
+            amount = to_satoshis(float(recipient.get('amount')))
+        except (TypeError, ValueError, OverflowError):
+            errors.append({"index": index, "message": "Invalid amount"})
+            continue
+        if amount < DUST_THRESHOLD:
+            errors.append({"index": index, "message": "Amount below dust threshold"})
+            continue
+        payments.append(Payment(address, amount))
+    return payments, errors
+
+
+def _groups(payments, mode, max_outputs):
+    if mode == 'single':
+        return [payments]
+    return [payments[i:i + max_outputs] for i in range(0, len(payments), max_outputs)]
+
+
+def build_payouts(source_address, payments, fee_rate, mode='single', max_outputs=None):
+    """
+    Unsigned PSBTs paying ``payments`` from ``source_address``, change going back to it.
+    ``max_outputs`` defaults to PAYOUT_MAX_OUTPUTS. Raises InsufficientFunds when the source cannot
+    cover a group (and so the whole batch).
+    """
+    coin_symbol = config('COIN_SYMBOL')
+    max_outputs = max_outputs or settings.PAYOUT_MAX_OUTPUTS
+    available = utxo_cache.available(source_address)
+    selections = []
+    for group in _groups(payments, mode, max_outputs):
+        selected, selection = select_unspent(available, sum(payment.amount for payment in group), fee_rate,
+                                             n_outputs=len(group))
+        selections.append((group, selected, selection))
+        spent = {(utxo.txid, utxo.txindex) for utxo in selected}
+        available = [utxo for utxo in available if (utxo.txid, utxo.txindex) not in spent]
+
+    raw_transactions = None
+    if needs_previous_transactions(source_address, coin_symbol):
+        raw_transactions = fetch_raw_transactions({utxo.txid for _, selected, _ in selections for utxo in selected})
+    return [Payout(build_payout_psbt(selected, selection, source_address, group, coin_symbol, raw_transactions),
+                   group, selection)
+            for group, selected, selection in selections]
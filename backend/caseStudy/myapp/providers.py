@@ -0,0 +1,699 @@
+"""
+Chain-data providers.
+
+Views and utils never talk to BlockCypher (or any other backend) directly; they call
+``get_provider()`` and use the ChainProvider interface below. Amounts are in satoshis and
+fee rates in satoshis per byte. Which backend is used comes from ``settings.CHAIN_PROVIDER``.
+Every method has an ``a``-prefixed coroutine twin (``aget_unspent`` ...) for the async views.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+import weakref
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .lazy import lazy_import, lazy_isinstance
+from .metrics import record_upstream
+from .resilience import CircuitOpen, DeadlineExceeded, aguarded_call, breakers as default_breakers, call_timeout, \
+    guarded_call, remaining
+from .throttle import SingleFlight, Throttled, TokenBucket, current_priority, upstream_stats
+
+# Imported by the first provider that needs them, not by every process that imports this module
+bit_meta = lazy_import('bit.network.meta')
+blockcypher_api = lazy_import('blockcypher.api')
+blockcypher_constants = lazy_import('blockcypher.constants')
+httpx = lazy_import('httpx')
+requests = lazy_import('requests')
+
+BLOCKCYPHER_DOMAIN = 'https://api.blockcypher.com/v1'
+
+
+class ChainProvider:
+    """
+    Interface every chain-data backend implements.
+    """
+    # Whether calls count against the shared upstream budget (local backends answer for free)
+    rate_limited = True
+
+    def get_address_details(self, address):
+        """
+        Balance summary for an address, in BlockCypher's address-endpoint format.
+        """
+        raise NotImplementedError
+
+    def get_addresses_details(self, addresses):
+        """
+        Balance summaries for several addresses as ``{address: details}``; addresses the backend
+        could not answer for are left out. Backends with a batch endpoint override this.
+        """
+        return {address: self.get_address_details(address) for address in addresses}
+
+    def get_unspent(self, address):
+        """
+        List of bit ``Unspent`` outputs owned by the address.
+        """
+        raise NotImplementedError
+
+    def get_address_unspent(self, address):
+        """
+        ``{'final_balance': ..., 'final_n_tx': ..., 'unspent': [...]}``: the balance summary and unspent
+        outputs together. Backends that return both from one call override this.
+        """
+        details = self.get_address_details(address)
+        return {'final_balance': details['final_balance'], 'final_n_tx': details['final_n_tx'],
+                'unspent': self.get_unspent(address)}
+
+    def get_txrefs(self, address, after=None):
+        """
+        ``{'txrefs': [...], 'unconfirmed_txrefs': [...]}`` in BlockCypher's txref format.
+        With ``after``, only confirmed refs above that block height are returned.
+        """
+        raise NotImplementedError
+
+    def get_raw_transaction(self, txid):
+        """
+        Raw transaction hex, or None when the transaction is unknown.
+        """
+        raise NotImplementedError
+
+    def pushtx(self, tx_hex):
+        """
+        Broadcast a signed transaction and return its hash.
+        """
+        raise NotImplementedError
+
+    def get_confirmations(self, tx_hash):
+        raise NotImplementedError
+
+    def get_fee(self):
+        """
+        Fee rate in satoshis per byte that gets a transaction into the next few blocks.
+        """
+        raise NotImplementedError
+
+    def get_fee_rates(self):
+        """
+        ``{'fast': ..., 'normal': ..., 'economy': ...}`` fee rates in satoshis per byte.
+        """
+        raise NotImplementedError
+
+    def get_chain_tip(self):
+        """
+        ``{'height': ..., 'hash': ...}`` of the latest block.
+        """
+        raise NotImplementedError
+
+    def get_transaction(self, tx_hash):
+        """
+        ``{'block_height': ..., 'confirmations': ...}``; block_height is -1 while unconfirmed.
+        """
+        raise NotImplementedError
+
+    # Async twins. By default they run the blocking method in a worker thread;
+    # providers with a native async client override them.
+
+    def _to_async(self, method):
+        return sync_to_async(method, thread_sensitive=False)
+
+    async def aget_address_details(self, address):
+        return await self._to_async(self.get_address_details)(address)
+
+    async def aget_addresses_details(self, addresses):
+        details = await asyncio.gather(*(self.aget_address_details(address) for address in addresses))
+        return dict(zip(addresses, details))
+
+    async def aget_unspent(self, address):
+        return await self._to_async(self.get_unspent)(address)
+
+    async def aget_address_unspent(self, address):
+        return await self._to_async(self.get_address_unspent)(address)
+
+    async def aget_txrefs(self, address, after=None):
+        return await self._to_async(self.get_txrefs)(address, after)
+
+    async def aget_raw_transaction(self, txid):
+        return await self._to_async(self.get_raw_transaction)(txid)
+
+    async def apushtx(self, tx_hex):
+        return await self._to_async(self.pushtx)(tx_hex)
+
+    async def aget_confirmations(self, tx_hash):
+        return await self._to_async(self.get_confirmations)(tx_hash)
+
+    async def aget_fee(self):
+        return await self._to_async(self.get_fee)()
+
+    async def aget_fee_rates(self):
+        return await self._to_async(self.get_fee_rates)()
+
+
+class BlockCypherProvider(ChainProvider):
+    """
+    BlockCypher REST client sharing one keep-alive connection pool across requests.
+    """
+
+    def __init__(self, coin_symbol=None, api_key=None, timeout=None, pool_size=None):
+        coin_symbol = coin_symbol or settings.COIN_SYMBOL
+        mapping = blockcypher_constants.COIN_SYMBOL_MAPPINGS[coin_symbol]
+        self.base_url = '%s/%s/%s' % (BLOCKCYPHER_DOMAIN, mapping['blockcypher_code'], mapping['blockcypher_network'])
+        self.api_key = api_key if api_key is not None else settings.BLOCKCYPHER_API_KEY
+        self.timeout = timeout or settings.BLOCKCYPHER_TIMEOUT
+        self.pool_size = pool_size or settings.BLOCKCYPHER_POOL_SIZE
+
+        self.session = requests.Session()
+        # Only idempotent GETs are retried; a pushtx must never be sent twice by the transport.
+        retries = requests.adapters.Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                                          allowed_methods=['GET'])
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retries)
+        self.session.mount('https://', adapter)
+        # httpx.AsyncClient is bound to the event loop it was first used on
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _params(self, params=None):
+        params = dict(params or {})
+        if self.api_key:
+            params['token'] = self.api_key
+        return params
+
+    @staticmethod
+    def _json(response):
+        if response.status_code == 429:
+            raise blockcypher_api.RateLimitError('Status Code 429', response.text)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _unspent_from_txrefs(txrefs):
+        return [bit_meta.Unspent(ref['value'], ref.get('confirmations', 0), ref.get('script', ''), ref['tx_hash'],
+                                 ref['tx_output_n']) for ref in txrefs]
+
+    @staticmethod
+    def _new_txrefs(txrefs, seen):
+        """
+        The refs in ``txrefs`` not already in ``seen``, which they are added to. Spends in a full history
+        carry tx_input_n with a tx_output_n of -1, so both are part of the key.
+        """
+        new = []
+        for ref in txrefs:
+            key = (ref['tx_hash'], ref.get('tx_input_n', -1), ref['tx_output_n'])
+            if key not in seen:
+                seen.add(key)
+                new.append(ref)
+        return new
+
+    @staticmethod
+    def _next_before(confirmed, new):
+        # ``before`` is exclusive and a page can end part way through a block, so the next page starts
+        # at that block again and its refs already seen are dropped. Paging only steps past the block
+        # when a whole page brought nothing new (one block holding more refs than a page).
+        height = confirmed[-1]['block_height']
+        return height + 1 if new else height
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            client = httpx.AsyncClient(base_url=self.base_url + '/', timeout=self.timeout, limits=limits,
+                                       transport=httpx.AsyncHTTPTransport(retries=2))
+            self._async_clients[loop] = client
+        return client
+
+    def _get(self, path, params=None):
+        response = self.session.get('%s/%s' % (self.base_url, path), params=self._params(params),
+                                    timeout=call_timeout(self.timeout))
+        return self._json(response)
+
+    def _post(self, path, data):
+        response = self.session.post('%s/%s' % (self.base_url, path), json=data, params=self._params(),
+                                     timeout=call_timeout(self.timeout))
+        return self._json(response)
+
+    def get_address_details(self, address):
+        return self._get('addrs/%s' % address)
+
+    @staticmethod
+    def _by_address(results):
+        # A one-address batch comes back as a bare object; failed entries carry an 'error' key
+        if isinstance(results, dict):
+            results = [results]
+        return {details['address']: details for details in results if 'address' in details and 'error' not in details}
+
+    def get_addresses_details(self, addresses):
+        """
+        Balance endpoint batched with semicolons, up to BLOCKCYPHER_BATCH_SIZE addresses per call.
+        """
+        details = {}
+        for i in range(0, len(addresses), settings.BLOCKCYPHER_BATCH_SIZE):
+            batch = addresses[i:i + settings.BLOCKCYPHER_BATCH_SIZE]
+            details.update(self._by_address(self._get('addrs/%s/balance' % ';'.join(batch))))
+        return details
+
+    def get_unspent(self, address):
+        return self.get_address_unspent(address)['unspent']
+
+    def get_address_unspent(self, address):
+        # The address endpoint carries the balance summary on every page
+        unspent, seen = [], set()
+        params = {'unspentOnly': 'true', 'includeScript': 'true', 'limit': 2000}
+        while True:
+            details = self._get('addrs/%s' % address, params)
+            confirmed = details.get('txrefs', [])
+            new = self._new_txrefs(confirmed, seen)
+            unconfirmed = self._new_txrefs(details.get('unconfirmed_txrefs', []), seen)
+            unspent.extend(self._unspent_from_txrefs(new + unconfirmed))
+            if not details.get('hasMore') or not confirmed:
+                return self._address_unspent(details, unspent)
+            params['before'] = self._next_before(confirmed, new)
+
+    @staticmethod
+    def _address_unspent(details, unspent):
+        return {'final_balance': details['final_balance'], 'final_n_tx': details['final_n_tx'], 'unspent': unspent}
+
+    def get_txrefs(self, address, after=None):
+        params = {'limit': 2000}
+        if after is not None:
+            params['after'] = after
+        txrefs, seen = [], set()
+        while True:
+            details = self._get('addrs/%s' % address, params)
+            confirmed = details.get('txrefs', [])
+            new = self._new_txrefs(confirmed, seen)
+            txrefs.extend(new)
+            if not details.get('hasMore') or not confirmed:
+                return {'txrefs': txrefs, 'unconfirmed_txrefs': details.get('unconfirmed_txrefs', [])}
+            params['before'] = self._next_before(confirmed, new)
+
+    def get_raw_transaction(self, txid):
+        try:
+            return self._get('txs/%s' % txid, {'includeHex': 'true', 'limit': 1})['hex']
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def pushtx(self, tx_hex):
+        return self._post('txs/push', {'tx': tx_hex})['tx']['hash']
+
+    def get_confirmations(self, tx_hash):
+        return self._get('txs/%s' % tx_hash, {'limit': 1}).get('confirmations', 0)
+
+    def get_fee(self):
+        return max(1, self._get('')['high_fee_per_kb'] // 1000)
+
+    def get_fee_rates(self):
+        overview = self._get('')
+        return {tier: max(1, overview[key] // 1000)
+                for tier, key in (('fast', 'high_fee_per_kb'), ('normal', 'medium_fee_per_kb'),
+                                  ('economy', 'low_fee_per_kb'))}
+
+    def get_chain_tip(self):
+        overview = self._get('')
+        return {'height': overview['height'], 'hash': overview['hash']}
+
+    def get_transaction(self, tx_hash):
+        tx = self._get('txs/%s' % tx_hash, {'limit': 1})
+        return {'block_height': tx.get('block_height', -1), 'confirmations': tx.get('confirmations', 0)}
+
+    async def _aget(self, path, params=None):
+        response = await self._async_client().get(path, params=self._params(params),
+                                                  timeout=call_timeout(self.timeout))
+        return self._json(response)
+
+    async def _apost(self, path, data):
+        response = await self._async_client().post(path, json=data, params=self._params(),
+                                                   timeout=call_timeout(self.timeout))
+        return self._json(response)
+
+    async def aget_address_details(self, address):
+        return await self._aget('addrs/%s' % address)
+
+    async def aget_addresses_details(self, addresses):
+        batches = [addresses[i:i + settings.BLOCKCYPHER_BATCH_SIZE]
+                   for i in range(0, len(addresses), settings.BLOCKCYPHER_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._aget('addrs/%s/balance' % ';'.join(batch)) for batch in batches))
+        details = {}
+        for result in results:
+            details.update(self._by_address(result))
+        return details
+
+    async def aget_unspent(self, address):
+        return (await self.aget_address_unspent(address))['unspent']
+
+    async def aget_address_unspent(self, address):
+        unspent, seen = [], set()
+        params = {'unspentOnly': 'true', 'includeScript': 'true', 'limit': 2000}
+        while True:
+            details = await self._aget('addrs/%s' % address, params)
+            confirmed = details.get('txrefs', [])
+            new = self._new_txrefs(confirmed, seen)
+            unconfirmed = self._new_txrefs(details.get('unconfirmed_txrefs', []), seen)
+            unspent.extend(self._unspent_from_txrefs(new + unconfirmed))
+            if not details.get('hasMore') or not confirmed:
+                return self._address_unspent(details, unspent)
+            params['before'] = self._next_before(confirmed, new)
+
+    async def aget_raw_transaction(self, txid):
+        try:
+            return (await self._aget('txs/%s' % txid, {'includeHex': 'true', 'limit': 1}))['hex']
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+
+    async def apushtx(self, tx_hex):
+        return (await self._apost('txs/push', {'tx': tx_hex}))['tx']['hash']
+
+    async def aget_confirmations(self, tx_hash):
+        return (await self._aget('txs/%s' % tx_hash, {'limit': 1})).get('confirmations', 0)
+
+    async def aget_fee(self):
+        return max(1, (await self._aget(''))['high_fee_per_kb'] // 1000)
+
+
+class FakeProvider(ChainProvider):
+    """
+    In-memory chain for offline development and load tests.
+    Optionally seeded from a JSON file shaped like::
+
+        {"addresses": {"<address>": {...address details...}},
+         "unspent": {"<address>": [{"amount": ..., "txid": ..., "txindex": ..., ...}]},
+         "transactions": {"<txid>": {"hex": "...", "confirmations": 0}},
+         "fee": 10,
+         "height": 0}
+
+    Unknown addresses report an empty balance so arbitrary test addresses can be used.
+    """
+
+    def __init__(self, fixtures=None):
+        self.addresses = {}
+        self.unspent = {}
+        self.transactions = {}
+        self.fee = 10
+        self.height = 0
+        fixtures = fixtures if fixtures is not None else settings.CHAIN_PROVIDER_FIXTURES
+        if fixtures:
+            self.load(fixtures)
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        self.addresses.update(data.get('addresses', {}))
+        for address, outputs in data.get('unspent', {}).items():
+            self.add_unspent(address, outputs)
+        self.transactions.update(data.get('transactions', {}))
+        self.fee = data.get('fee', self.fee)
+        self.height = data.get('height', self.height)
+
+    def add_unspent(self, address, outputs):
+        """
+        Fund ``address`` with outputs shaped like the fixture file's ``unspent`` entries.
+        """
+        self.unspent.setdefault(address, []).extend(
+            bit_meta.Unspent(output['amount'], output.get('confirmations', 1), output.get('script', ''), output['txid'],
+                             output['txindex'])
+            for output in outputs)
+
+    def _to_async(self, method):
+        # Everything is in memory, so there is nothing to offload to a thread
+        async def run(*args):
+            return method(*args)
+        return run
+
+    def get_address_details(self, address):
+        if address in self.addresses:
+            return dict(self.addresses[address])
+        balance = sum(utxo.amount for utxo in self.unspent.get(address, []))
+        return {
+            'address': address,
+            'total_received': balance,
+            'total_sent': 0,
+            'balance': balance,
+            'unconfirmed_balance': 0,
+            'final_balance': balance,
+            'n_tx': len(self.unspent.get(address, [])),
+            'unconfirmed_n_tx': 0,
+            'final_n_tx': len(self.unspent.get(address, [])),
+            'txrefs': [],
+        }
+
+    def get_unspent(self, address):
+        return list(self.unspent.get(address, []))
+
+    def get_txrefs(self, address, after=None):
+        details = self.addresses.get(address, {})
+        txrefs = [ref for ref in details.get('txrefs', []) if after is None or ref['block_height'] > after]
+        return {'txrefs': txrefs, 'unconfirmed_txrefs': list(details.get('unconfirmed_txrefs', []))}
+
+    def get_raw_transaction(self, txid):
+        tx = self.transactions.get(txid)
+        return tx['hex'] if tx else None
+
+    def pushtx(self, tx_hex):
+        tx_hash = hashlib.sha256(hashlib.sha256(bytes.fromhex(tx_hex)).digest()).digest()[::-1].hex()
+        self.transactions.setdefault(tx_hash, {'hex': tx_hex, 'confirmations': 0})
+        return tx_hash
+
+    def get_confirmations(self, tx_hash):
+        return self.get_transaction(tx_hash)['confirmations']
+
+    def get_fee(self):
+        return self.fee
+
+    def get_fee_rates(self):
+        return {'fast': self.fee, 'normal': max(1, self.fee * 2 // 3), 'economy': max(1, self.fee // 3)}
+
+    def get_chain_tip(self):
+        return {'height': self.height, 'hash': '%064x' % self.height}
+
+    def get_transaction(self, tx_hash):
+        tx = self.transactions.get(tx_hash)
+        if not tx:
+            return {'block_height': -1, 'confirmations': 0}
+        block_height = tx.get('block_height', -1)
+        if block_height >= 0:
+            return {'block_height': block_height, 'confirmations': self.height - block_height + 1}
+        return {'block_height': -1, 'confirmations': tx.get('confirmations', 0)}
+
+    def mine_block(self):
+        """
+        Advance the tip by one block, confirming every pending transaction in it.
+        """
+        self.height += 1
+        for tx in self.transactions.values():
+            if tx.get('block_height', -1) < 0 and not tx.get('confirmations'):
+                tx['block_height'] = self.height
+
+
+OPERATIONS = frozenset(name for name, value in vars(ChainProvider).items()
+                       if callable(value) and not name.startswith('_'))
+
+
+class FaultInjectingProvider:
+    """
+    Wraps another provider and adds latency, connection errors and 429s to every call, for load tests
+    against FakeProvider. ``latency`` and ``jitter`` are in seconds, the rates are fractions of calls.
+    Async twins sleep on the event loop, so they do not block other requests.
+    """
+
+    def __init__(self, inner, latency=0, jitter=0, error_rate=0, rate_limit_rate=0, seed=None):
+        self.inner = inner
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+
+    def _fault(self):
+        """
+        (delay in seconds, exception to raise or None) for one call.
+        """
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return delay, blockcypher_api.RateLimitError('Status Code 429', 'Injected rate limit')
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, requests.ConnectionError('Injected upstream error')
+        return delay, None
+
+    def __getattr__(self, name):
+        method = getattr(self.inner, name)
+        if name not in OPERATIONS:
+            return method
+
+        if asyncio.iscoroutinefunction(method):
+            async def call(*args):
+                delay, error = self._fault()
+                await asyncio.sleep(delay)
+                if error is not None:
+                    raise error
+                return await method(*args)
+        else:
+            def call(*args):
+                delay, error = self._fault()
+                time.sleep(delay)
+                if error is not None:
+                    raise error
+                return method(*args)
+        return call
+
+
+def _error_kind(error):
+    if isinstance(error, CircuitOpen):
+        return 'circuit_open'
+    if isinstance(error, DeadlineExceeded):
+        return 'deadline'
+    if isinstance(error, Throttled):
+        return 'throttled'
+    if lazy_isinstance(error, blockcypher_api, 'RateLimitError'):
+        return 'rate_limited'
+    return 'error'
+
+
+class GuardedProvider(ChainProvider):
+    """
+    Wraps another provider so identical concurrent calls are coalesced and the rest are rate limited.
+    Calls also stay within the request's deadline and fail fast while their operation's circuit
+    breaker is open (``myapp.resilience``). Each call is timed (queueing for a token included) into
+    ``myapp.metrics``.
+    """
+
+    def __init__(self, inner, bucket, flight=None, breakers=None):
+        self.inner = inner
+        self.bucket = bucket
+        self.flight = flight or SingleFlight()
+        self.breakers = breakers or default_breakers
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _call(self, method, *args):
+        priority = current_priority()
+
+        def call():
+            self.bucket.acquire(priority, timeout=remaining())
+            upstream_stats.incr('calls')
+            return getattr(self.inner, method)(*args)
+
+        def call_upstream():
+            start = time.perf_counter()
+            try:
+                result = guarded_call(self.breakers.get(method), call)
+            except Exception as e:
+                record_upstream(method, time.perf_counter() - start, _error_kind(e))
+                raise
+            record_upstream(method, time.perf_counter() - start)
+            return result
+        # Priority is part of the key: a request joining a background call would share its shedding
+        return self.flight.do((method, priority) + args, call_upstream)
+
+    async def _acall(self, method, *args):
+        priority = current_priority()
+        operation = method[1:]  # aget_unspent is timed as get_unspent
+
+        async def call():
+            await self.bucket.aacquire(priority, timeout=remaining())
+            upstream_stats.incr('calls')
+            return await getattr(self.inner, method)(*args)
+
+        async def call_upstream():
+            start = time.perf_counter()
+            try:
+                result = await aguarded_call(self.breakers.get(operation), call)
+            except Exception as e:
+                record_upstream(operation, time.perf_counter() - start, _error_kind(e))
+                raise
+            record_upstream(operation, time.perf_counter() - start)
+            return result
+        return await self.flight.ado((method, priority) + args, call_upstream)
+
+    def get_address_details(self, address):
+        return self._call('get_address_details', address)
+
+    def get_addresses_details(self, addresses):
+        return self._call('get_addresses_details', tuple(addresses))
+
+    def get_unspent(self, address):
+        return self._call('get_unspent', address)
+
+    def get_address_unspent(self, address):
+        return self._call('get_address_unspent', address)
+
+    def get_txrefs(self, address, after=None):
+        return self._call('get_txrefs', address, after)
+
+    def get_raw_transaction(self, txid):
+        return self._call('get_raw_transaction', txid)
+
+    def pushtx(self, tx_hex):
+        return self._call('pushtx', tx_hex)
+
+    def get_confirmations(self, tx_hash):
+        return self._call('get_confirmations', tx_hash)
+
+    def get_fee(self):
+        return self._call('get_fee')
+
+    def get_fee_rates(self):
+        return self._call('get_fee_rates')
+
+    def get_chain_tip(self):
+        return self._call('get_chain_tip')
+
+    def get_transaction(self, tx_hash):
+        return self._call('get_transaction', tx_hash)
+
+    async def aget_address_details(self, address):
+        return await self._acall('aget_address_details', address)
+
+    async def aget_addresses_details(self, addresses):
+        return await self._acall('aget_addresses_details', tuple(addresses))
+
+    async def aget_unspent(self, address):
+        return await self._acall('aget_unspent', address)
+
+    async def aget_address_unspent(self, address):
+        return await self._acall('aget_address_unspent', address)
+
+    async def aget_txrefs(self, address, after=None):
+        return await self._acall('aget_txrefs', address, after)
+
+    async def aget_raw_transaction(self, txid):
+        return await self._acall('aget_raw_transaction', txid)
+
+    async def apushtx(self, tx_hex):
+        return await self._acall('apushtx', tx_hex)
+
+    async def aget_confirmations(self, tx_hash):
+        return await self._acall('aget_confirmations', tx_hash)
+
+    async def aget_fee(self):
+        return await self._acall('aget_fee')
+
+    async def aget_fee_rates(self):
+        return await self._acall('aget_fee_rates')
+
+
+def make_bucket():
+    return TokenBucket(settings.CHAIN_RATE_PER_SECOND, settings.CHAIN_RATE_BURST,
+                       reserve=settings.CHAIN_RATE_RESERVE, timeout=settings.CHAIN_QUEUE_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_provider():
+    """
+    The process-wide provider instance configured by ``settings.CHAIN_PROVIDER``,
+    behind request coalescing and the shared upstream rate limit.
+    """
+    inner = import_string(settings.CHAIN_PROVIDER)()
+    bucket = make_bucket() if inner.rate_limited else TokenBucket(0, 0)
+    if settings.CHAIN_FAULT_LATENCY or settings.CHAIN_FAULT_ERROR_RATE or settings.CHAIN_FAULT_RATE_LIMIT_RATE:
+        inner = FaultInjectingProvider(inner, settings.CHAIN_FAULT_LATENCY, settings.CHAIN_FAULT_JITTER,
+                                       settings.CHAIN_FAULT_ERROR_RATE, settings.CHAIN_FAULT_RATE_LIMIT_RATE)
+    return GuardedProvider(inner, bucket)
@@ -0,0 +1,100 @@
+"""
+Minimal BIP174 PSBT (v0) builder for the send flow.
+
+Instead of shipping every funding transaction's full hex to the browser, the server builds the
+unsigned transaction and returns it as a PSBT. Inputs spending segwit outputs carry only the
+spent output (PSBT_IN_WITNESS_UTXO: amount and script). Legacy inputs still need the whole
+previous transaction (PSBT_IN_NON_WITNESS_UTXO), since that is the only way a signer can verify
+the amount it is signing for.
+"""
+import base64
+
+from .addresses import script_pubkey
+
+PSBT_MAGIC = b'psbt\xff'
+
+PSBT_GLOBAL_UNSIGNED_TX = 0x00
+PSBT_IN_NON_WITNESS_UTXO = 0x00
+PSBT_IN_WITNESS_UTXO = 0x01
+
+TX_VERSION = 2
+SEQUENCE_FINAL = 0xffffffff
+
+
+def _varint(n):
+    if n < 0xfd:
+        return bytes([n])
+    if n <= 0xffff:
+        return b'\xfd' + n.to_bytes(2, 'little')
+    if n <= 0xffffffff:
+        return b'\xfe' + n.to_bytes(4, 'little')
+    return b'\xff' + n.to_bytes(8, 'little')
+
+
+def _bytes(data):
+    return _varint(len(data)) + data
+
+
+def _pair(key_type, value, key_data=b''):
+    return _bytes(bytes([key_type]) + key_data) + _bytes(value)
+
+
+def is_segwit_script(script):
+    # A witness program is OP_0..OP_16 followed by a single 2-40 byte push (BIP141)
+    return (4 <= len(script) <= 42 and (script[0] == 0 or 0x51 <= script[0] <= 0x60)
+            and script[1] + 2 == len(script))
+
+
+def needs_previous_transactions(source_address, coin_symbol):
+    return not is_segwit_script(script_pubkey(source_address, coin_symbol))
+
+
+def serialize_unsigned_tx(inputs, outputs, locktime=0):
+    """
+    ``inputs`` are (txid hex, vout) pairs and ``outputs`` (value, script bytes) pairs.
+    """
+    tx = [TX_VERSION.to_bytes(4, 'little'), _varint(len(inputs))]
+    for txid, vout in inputs:
+        tx.append(bytes.fromhex(txid)[::-1] + vout.to_bytes(4, 'little') + b'\x00'
+                  + SEQUENCE_FINAL.to_bytes(4, 'little'))
+    tx.append(_varint(len(outputs)))
+    for value, script in outputs:
+        tx.append(value.to_bytes(8, 'little') + _bytes(script))
+    tx.append(locktime.to_bytes(4, 'little'))
+    return b''.join(tx)
+
+
+def build_psbt(selected, selection, source_address, to_address, amount_in_satoshis, coin_symbol,
+               raw_transactions=None):
+    """
+    Serialized PSBT paying ``amount_in_satoshis`` to ``to_address`` with change back to ``source_address``.
+    ``raw_transactions`` (txid -> hex) is only needed when the source address is not segwit.
+    """
+    return build_payout_psbt(selected, selection, source_address, [(to_address, amount_in_satoshis)], coin_symbol,
+                             raw_transactions)
+
+
+def build_payout_psbt(selected, selection, source_address, payments, coin_symbol, raw_transactions=None):
+    """
+    Like build_psbt, with one output per (address, satoshis) pair in ``payments``, in order.
+    """
+    source_script = script_pubkey(source_address, coin_symbol)
+    outputs = [(amount, script_pubkey(address, coin_symbol)) for address, amount in payments]
+    if selection.change > 0:
+        outputs.append((selection.change, source_script))
+    unsigned_tx = serialize_unsigned_tx([(utxo.txid, utxo.txindex) for utxo in selected], outputs)
+
+    psbt = [PSBT_MAGIC, _pair(PSBT_GLOBAL_UNSIGNED_TX, unsigned_tx), b'\x00']
+    segwit = is_segwit_script(source_script)
+    for utxo in selected:
+        if segwit:
+            psbt.append(_pair(PSBT_IN_WITNESS_UTXO, utxo.amount.to_bytes(8, 'little') + _bytes(source_script)))
+        else:
+            psbt.append(_pair(PSBT_IN_NON_WITNESS_UTXO, bytes.fromhex(raw_transactions[utxo.txid])))
+        psbt.append(b'\x00')
+    psbt.append(b'\x00' * len(outputs))
+    return b''.join(psbt)
+
+
+def psbt_to_base64(psbt):
+    return base64.b64encode(psbt).decode('ascii')
@@ -0,0 +1,74 @@
+"""
+Background refresh of stale Address rows.
+
+Each cycle takes the stalest rows past ADDRESS_FRESH_TTL off the ``refreshed_at`` index, fetches
+them with batched upstream calls at low priority (so interactive requests keep their share of the
+API budget), and writes them back with one bulk_update inside a transaction. Rows upstream did not
+return keep their old ``refreshed_at``, so they still read as stale, and are skipped by this process
+for ADDRESS_REFRESH_RETRY seconds so they cannot hold up the rest of the queue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Address
+from .providers import get_provider
+from .throttle import low_priority
+from .utils import ADDRESS_FIELDS, address_fields
+from .versions import ADDRESSES, bump_table_version
+
+
+# Addresses upstream did not return, and when this process may ask for them again
+_retry_at = {}
+
+
+def stale_addresses(now, limit):
+    cutoff = now - timedelta(seconds=settings.ADDRESS_FRESH_TTL)
+    for address, retry_at in list(_retry_at.items()):
+        if retry_at <= now:
+            del _retry_at[address]
+    rows = Address.objects.filter(refreshed_at__lt=cutoff).order_by('refreshed_at')[:limit + len(_retry_at)]
+    return [row for row in rows if row.address not in _retry_at][:limit]
+
+
+def refresh_stale_addresses(now=None, limit=None, batch_size=None):
+    """
+    Run one refresh cycle and return ``(refreshed, skipped, missing)``: rows updated, rows picked
+    this cycle but left for the next one because the upstream budget ran out, and rows upstream
+    returned nothing for.
+    """
+    now = now or timezone.now()
+    limit = settings.ADDRESS_REFRESH_LIMIT if limit is None else limit
+    batch_size = batch_size or settings.BLOCKCYPHER_BATCH_SIZE
+    rows = stale_addresses(now, limit)
+
+    provider = get_provider()
+    updated = []
+    missing = []
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            with low_priority():
+                details = provider.get_addresses_details([row.address for row in batch])
+        except Exception as e:
+            # Shed or failed upstream; whatever is left stays stale until the next cycle
+            print(e)
+            break
+        for row in batch:
+            if row.address not in details:
+                missing.append(row)
+                _retry_at[row.address] = now + timedelta(seconds=settings.ADDRESS_REFRESH_RETRY)
+                continue
+            for key, value in address_fields(details[row.address]).items():
+                setattr(row, key, value)
+            row.refreshed_at = now
+            updated.append(row)
+
+    if updated:
+        with transaction.atomic():
+            Address.objects.bulk_update(updated, sorted(ADDRESS_FIELDS) + ['refreshed_at'], batch_size=500)
+            bump_table_version(ADDRESSES)
+    return len(updated), len(rows) - len(updated) - len(missing), len(missing)
+
@@ -0,0 +1,334 @@
+"""
+Deadlines and circuit breakers for upstream chain calls.
+
+Every request gets a budget of upstream time (UPSTREAM_DEADLINES by URL name, else
+UPSTREAM_DEADLINE), set by DeadlineMiddleware. GuardedProvider refuses to start a call once the
+budget is spent and hands the remainder to the HTTP client as its timeout, so a slow provider
+costs a request at most its budget instead of the client's full timeout plus retries.
+
+Each upstream operation has its own CircuitBreaker. After CHAIN_BREAKER_FAILURES consecutive
+failures it opens and calls fail immediately with CircuitOpen; after CHAIN_BREAKER_RESET seconds
+one trial call is let through, and its outcome closes or re-opens the circuit. Views that can fall
+back to stored data check ``breakers.is_open`` and flag what they serve as stale; the others are
+wrapped in ``fail_fast`` and answer with an error instead.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from .lazy import lazy_import, lazy_isinstance
+from .throttle import Throttled
+
+blockcypher_api = lazy_import('blockcypher.api')
+httpx = lazy_import('httpx')
+requests = lazy_import('requests')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+UPSTREAM_UNAVAILABLE = "Chain provider unavailable. Please try again later."
+RATE_LIMITED = "API rate limit exceeded. Please try again later."
+
+
+class UpstreamUnavailable(Exception):
+    """
+    An upstream call was not made (or was abandoned) to keep the request within its bounds.
+    """
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class Deadline:
+    __slots__ = ('expires',)
+
+    def __init__(self, expires=None):
+        self.expires = expires
+
+
+_deadline = ContextVar('upstream_deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Bound the upstream calls made inside the block (commands, background jobs, tests) to ``seconds``.
+    """
+    token = _deadline.set(Deadline(time.monotonic() + seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """
+    Seconds left in the current budget, or None when there is no deadline.
+    """
+    current = _deadline.get()
+    if current is None or current.expires is None:
+        return None
+    return current.expires - time.monotonic()
+
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded('Upstream deadline exceeded')
+    return left
+
+
+def call_timeout(timeout):
+    """
+    ``timeout`` cut down to what is left of the current budget.
+    """
+    left = remaining()
+    return timeout if left is None else max(0.001, min(timeout, left))
+
+
+def is_upstream_error(error):
+    """
+    Whether ``error`` came from the HTTP client talking to the provider (connection errors, timeouts,
+    error statuses), as opposed to a bug in our own code.
+    """
+    return lazy_isinstance(error, requests, 'RequestException') or lazy_isinstance(error, httpx, 'HTTPError')
+
+
+def is_failure(error):
+    """
+    Whether ``error`` says the provider is unhealthy. Local throttling and 4xx answers
+    (bad address, unknown transaction) do not count.
+    """
+    if isinstance(error, (Throttled, CircuitOpen)):
+        return False
+    if lazy_isinstance(error, blockcypher_api, 'RateLimitError'):
+        return True
+    response = getattr(error, 'response', None)
+    if response is not None and (lazy_isinstance(error, requests, 'HTTPError')
+                                 or lazy_isinstance(error, httpx, 'HTTPStatusError')):
+        return response.status_code >= 500
+    return True
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise CircuitOpen unless a call may go upstream now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                # Exactly one trial call; everyone else keeps failing fast until it reports back
+                self._trial = True
+                return
+            raise CircuitOpen('Upstream circuit is open')
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+    def record_error(self, error):
+        if is_failure(error):
+            self.record_failure()
+        elif isinstance(error, Throttled):
+            # Never reached upstream, so it says nothing about its health; let another call try
+            with self._lock:
+                self._trial = False
+        else:
+            # Upstream answered, just not with what we asked for
+            self.record_success()
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+
+class CircuitBreakers:
+    """
+    One CircuitBreaker per operation name, created on first use.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, operation):
+        with self._lock:
+            breaker = self._breakers.get(operation)
+            if breaker is None:
+                breaker = self._breakers[operation] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def is_open(self, *operations):
+        return any(self.get(operation).is_open() for operation in operations)
+
+    def snapshot(self):
+        with self._lock:
+            return {operation: breaker.state for operation, breaker in self._breakers.items()}
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+breakers = CircuitBreakers(settings.CHAIN_BREAKER_FAILURES, settings.CHAIN_BREAKER_RESET)
+
+
+def guarded_call(breaker, fn):
+    """
+    Run the upstream call ``fn`` through ``breaker`` within the current deadline.
+    """
+    check_deadline()
+    breaker.before_call()
+    try:
+        result = fn()
+    except Exception as e:
+        breaker.record_error(e)
+        raise
+    breaker.record_success()
+    return result
+
+
+async def aguarded_call(breaker, coro_fn):
+    left = check_deadline()
+    breaker.before_call()
+    try:
+        if left is None:
+            result = await coro_fn()
+        else:
+            # Unlike a blocking call, a coroutine can be abandoned the moment the budget runs out
+            try:
+                result = await asyncio.wait_for(coro_fn(), left)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded('Upstream deadline exceeded')
+    except Exception as e:
+        breaker.record_error(e)
+        raise
+    breaker.record_success()
+    return result
+
+
+def request_budget(url_name):
+    return settings.UPSTREAM_DEADLINES.get(url_name, settings.UPSTREAM_DEADLINE)
+
+
+class DeadlineMiddleware:
+    """
+    Starts the upstream budget of every request once its view is known.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _deadline.set(Deadline())
+        try:
+            return self.get_response(request)
+        finally:
+            _deadline.reset(token)
+
+    async def __acall__(self, request):
+        token = _deadline.set(Deadline())
+        try:
+            return await self.get_response(request)
+        finally:
+            _deadline.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current = _deadline.get()
+        if current is not None:
+            current.expires = time.monotonic() + request_budget(request.resolver_match.url_name)
+
+
+def upstream_error_response(error):
+    """
+    The error response for a view that failed because of ``error``, or None when it is not an upstream problem.
+    """
+    if isinstance(error, UpstreamUnavailable):
+        message = UPSTREAM_UNAVAILABLE
+    elif isinstance(error, Throttled) or lazy_isinstance(error, blockcypher_api, 'RateLimitError'):
+        message = RATE_LIMITED
+    elif is_upstream_error(error):
+        # Transport errors and error statuses before the circuit opens get the same answer
+        message = UPSTREAM_UNAVAILABLE
+    else:
+        return None
+    print(error)
+    return JsonResponse({"status": "error", "message": message})
+
+
+def fail_fast(view):
+    """
+    Answer with an error as soon as an upstream call runs out of budget, hits an open circuit, is rate limited
+    or fails. Works for sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def ainner(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except Exception as e:
+                response = upstream_error_response(e)
+                if response is None:
+                    raise
+                return response
+        return ainner
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Exception as e:
+            response = upstream_error_response(e)
+            if response is None:
+                raise
+            return response
+    return inner
+
@@ -0,0 +1,95 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Address
+
+
+class AddressPrefixIndex:
+    """
+    Sorted in-memory array of every tracked address.
+    Prefix lookups are two binary searches, so a keystroke in the dropdown never scans the table.
+    The array is rebuilt from the unique index on Address.address when it gets older than ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._addresses = []
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_built(self):
+        if self._built_at is not None and time.monotonic() - self._built_at < self.ttl:
+            return
+        with self._lock:
+            if self._built_at is not None and time.monotonic() - self._built_at < self.ttl:
+                return
+            self._addresses = list(Address.objects.order_by('address').values_list('address', flat=True))
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def add(self, address):
+        with self._lock:
+            if self._built_at is None:
+                return
+            i = bisect_left(self._addresses, address)
+            if i == len(self._addresses) or self._addresses[i] != address:
+                insort(self._addresses, address, lo=i)
+
+    def discard(self, address):
+        with self._lock:
+            i = bisect_left(self._addresses, address)
+            if i < len(self._addresses) and self._addresses[i] == address:
+                del self._addresses[i]
+
+    def search(self, prefix, after=None, limit=20):
+        """
+        Return up to ``limit`` addresses starting with ``prefix`` in ascending order.
+        ``after`` is the keyset cursor: the last address of the previous page.
+        """
+        self._ensure_built()
+        addresses = self._addresses
+        start = bisect_left(addresses, prefix)
+        if after is not None and after >= prefix:
+            start = max(start, bisect_right(addresses, after))
+        matches = []
+        for address in addresses[start:start + limit]:
+            if not address.startswith(prefix):
+                break
+            matches.append(address)
+        return matches
+
+
+address_index = AddressPrefixIndex(ttl=settings.ADDRESS_INDEX_TTL)
+
+
+def search_addresses(prefix, after=None, limit=None):
+    """
+    Returns (addresses, next_cursor). ``next_cursor`` is None on the last page.
+    """
+    if limit is None:
+        limit = settings.ADDRESS_SEARCH_DEFAULT_LIMIT
+    limit = max(1, min(limit, settings.ADDRESS_SEARCH_MAX_LIMIT))
+    # Ask for one extra row so we know whether another page exists.
+    matches = address_index.search(prefix, after=after, limit=limit + 1)
+    if len(matches) > limit:
+        return matches[:limit], matches[limit - 1]
+    return matches, None
+
+
+@receiver(post_save, sender=Address)
+def _index_saved_address(sender, instance, created, **kwargs):
+    if created:
+        address_index.add(instance.address)
+
+
+@receiver(post_delete, sender=Address)
+def _unindex_deleted_address(sender, instance, **kwargs):
+    address_index.discard(instance.address)
@@ -0,0 +1,250 @@
+"""
+Upstream responses shared by every worker process on the host.
+
+Entries live in one SQLite file in WAL mode (SHARED_CACHE_PATH), so readers in any worker never
+block on a writer and no cache service has to run next to the app. Every entry has its own TTL.
+Once the file holds more than SHARED_CACHE_MAX_BYTES of values, the oldest entries are dropped.
+Values are packed into compact binary by a Codec per kind of data: raw bytes for transaction hex,
+fixed-width records for unspent outputs, and compressed JSON for everything else.
+
+``get_or_fetch`` is read-through. On a miss, one caller per key takes a short lease and goes
+upstream. Callers in other workers wait for its result instead of fetching too, so N workers make
+about one upstream call per key per TTL. Calls inside one worker are already coalesced by
+GuardedProvider. An empty SHARED_CACHE_PATH turns the cache off, and every call then goes upstream.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+
+from .lazy import lazy_import
+from .resilience import remaining
+
+bit_meta = lazy_import('bit.network.meta')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, stored REAL NOT NULL, size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored);
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, until REAL NOT NULL) WITHOUT ROWID;
+"""
+
+# Writes between two eviction passes, per process
+EVICT_EVERY = 100
+LEASE_POLL_INTERVAL = 0.02  # seconds between checks while another worker fetches
+
+Codec = namedtuple('Codec', ['pack', 'unpack'])
+
+
+def _pack_json(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+
+def _unpack_json(data):
+    return json.loads(zlib.decompress(data))
+
+
+JSON = Codec(_pack_json, _unpack_json)
+
+# Transaction hex, stored as the bytes it encodes
+HEX = Codec(bytes.fromhex, bytes.hex)
+
+# get_address_unspent() results: balance, n_tx and output count, then one record per output
+_SUMMARY = struct.Struct('<qqI')
+_OUTPUT = struct.Struct('<32sIqiHB')
+
+
+def _pack_address_unspent(value):
+    parts = [_SUMMARY.pack(value['final_balance'], value['final_n_tx'], len(value['unspent']))]
+    for utxo in value['unspent']:
+        script = bytes.fromhex(utxo.script or '')
+        utxo_type = utxo.type.encode()
+        parts.append(_OUTPUT.pack(bytes.fromhex(utxo.txid), utxo.txindex, utxo.amount, utxo.confirmations,
+                                  len(script), len(utxo_type)))
+        parts.append(script)
+        parts.append(utxo_type)
+    return b''.join(parts)
+
+
+def _unpack_address_unspent(data):
+    final_balance, final_n_tx, count = _SUMMARY.unpack_from(data)
+    offset = _SUMMARY.size
+    unspent = []
+    for _ in range(count):
+        txid, txindex, amount, confirmations, script_size, type_size = _OUTPUT.unpack_from(data, offset)
+        offset += _OUTPUT.size
+        script = data[offset:offset + script_size].hex()
+        offset += script_size
+        utxo_type = data[offset:offset + type_size].decode()
+        offset += type_size
+        unspent.append(bit_meta.Unspent(amount, confirmations, script, txid.hex(), txindex, utxo_type))
+    return {'final_balance': final_balance, 'final_n_tx': final_n_tx, 'unspent': unspent}
+
+
+ADDRESS_UNSPENT = Codec(_pack_address_unspent, _unpack_address_unspent)
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+    # WAL lets every worker read while one of them writes
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+class SharedCache:
+
+    def __init__(self, path, max_bytes, lease_timeout):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_timeout = lease_timeout
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    @property
+    def db(self):
+        # A connection must not cross a fork, so each process (and thread) opens its own
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.opened != (os.getpid(), self.path):
+            db = self._local.db = connect(self.path)
+            self._local.opened = (os.getpid(), self.path)
+        return db
+
+    def get(self, key, codec):
+        """
+        The unpacked value stored under ``key``, or None when missing or expired.
+        """
+        try:
+            row = self.db.execute('SELECT value FROM entries WHERE key = ? AND expires > ?',
+                                  (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            # The cache is an optimization; a locked or broken file only costs an upstream call
+            print(e)
+            return None
+        return None if row is None else codec.unpack(row[0])
+
+    def set(self, key, value, ttl, codec):
+        data = codec.pack(value)
+        now = time.time()
+        try:
+            self.db.execute('INSERT OR REPLACE INTO entries (key, value, expires, stored, size) '
+                            'VALUES (?, ?, ?, ?, ?)', (key, data, now + ttl, now, len(data)))
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            print(e)
+
+    def evict(self):
+        """
+        Drop expired entries, then the oldest ones until the values fit in ``max_bytes``.
+        """
+        db = self.db
+        db.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+        # Newest first, the first entry whose running total goes past the limit and everything older go
+        row = db.execute('SELECT stored FROM (SELECT stored, SUM(size) OVER (ORDER BY stored DESC) AS total '
+                         'FROM entries) WHERE total > ? ORDER BY stored DESC LIMIT 1', (self.max_bytes,)).fetchone()
+        if row is not None:
+            db.execute('DELETE FROM entries WHERE stored <= ?', (row[0],))
+
+    def _lease(self, key):
+        """
+        Try to become the one caller fetching ``key``; True on success.
+        """
+        now = time.time()
+        try:
+            db = self.db
+            db.execute('DELETE FROM leases WHERE key = ? AND until <= ?', (key, now))
+            return db.execute('INSERT OR IGNORE INTO leases (key, until) VALUES (?, ?)',
+                              (key, now + self.lease_timeout)).rowcount == 1
+        except sqlite3.Error as e:
+            print(e)
+            return True
+
+    def _release(self, key):
+        try:
+            self.db.execute('DELETE FROM leases WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(e)
+
+    def _wait_until(self):
+        # Waiting for another worker counts against the request's upstream budget too
+        left = remaining()
+        return time.monotonic() + (self.lease_timeout if left is None else min(self.lease_timeout, left))
+
+    def _remember(self, key, ttl, codec, value):
+        if value is not None:
+            self.set(key, value, ttl, codec)
+        return value
+
+    def get_or_fetch(self, key, ttl, fetch, codec=JSON):
+        """
+        The cached value of ``key``, or ``fetch()``'s result, stored for ``ttl`` seconds.
+        None results are returned but never stored.
+        """
+        if not self.enabled:
+            return fetch()
+        value = self.get(key, codec)
+        if value is not None:
+            return value
+        if not self._lease(key):
+            # Someone else is fetching it; wait for their result, up to the lease
+            give_up = self._wait_until()
+            while time.monotonic() < give_up:
+                time.sleep(LEASE_POLL_INTERVAL)
+                value = self.get(key, codec)
+                if value is not None:
+                    return value
+            return self._remember(key, ttl, codec, fetch())
+        try:
+            return self._remember(key, ttl, codec, fetch())
+        finally:
+            self._release(key)
+
+    async def aget_or_fetch(self, key, ttl, fetch, codec=JSON):
+        """
+        get_or_fetch for coroutine ``fetch`` functions; waits without blocking the event loop.
+        """
+        if not self.enabled:
+            return await fetch()
+        value = self.get(key, codec)
+        if value is not None:
+            return value
+        if not self._lease(key):
+            give_up = self._wait_until()
+            while time.monotonic() < give_up:
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+                value = self.get(key, codec)
+                if value is not None:
+                    return value
+            return self._remember(key, ttl, codec, await fetch())
+        try:
+            return self._remember(key, ttl, codec, await fetch())
+        finally:
+            self._release(key)
+
+    def delete(self, key):
+        if self.enabled:
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def clear(self):
+        if self.enabled:
+            self.db.execute('DELETE FROM entries')
+            self.db.execute('DELETE FROM leases')
+
+
+shared_cache = SharedCache(settings.SHARED_CACHE_PATH, settings.SHARED_CACHE_MAX_BYTES, settings.SHARED_CACHE_LEASE)
@@ -0,0 +1,95 @@
+"""
+Cold-start profile: what a new worker spends importing modules before it can serve a request.
+
+``profile()`` runs ``django.setup()`` and imports ROOT_URLCONF (which pulls in every view module)
+in a fresh interpreter started with ``-X importtime``, and parses the interpreter's import log.
+Modules imported by the interpreter itself (``site``, ``encodings``) are left out, so only the app,
+Django and the libraries they import are counted. ``manage.py startup_report`` prints the result
+and fails when startup goes over STARTUP_BUDGET or imports one of STARTUP_DEFERRED_MODULES (see
+``myapp.lazy``).
+"""
+import json
+import subprocess
+import sys
+from collections import namedtuple
+
+from django.conf import settings
+
+MARKER = 'startup_report: begin'
+
+# Runs in the child interpreter; everything it imports after MARKER is part of the app's startup
+PROBE = """
+import sys
+sys.stderr.write(%(marker)r + '\\n')
+import importlib, json, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.conf import settings
+importlib.import_module(settings.ROOT_URLCONF)
+end = time.perf_counter()
+print(json.dumps({'setup': setup - start, 'urls': end - setup, 'modules': sorted(sys.modules)}))
+""" % {'marker': MARKER}
+
+# One line of -X importtime output: self and cumulative microseconds, module indented by depth
+ImportTime = namedtuple('ImportTime', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+Profile = namedtuple('Profile', ['setup', 'urls', 'imports', 'modules'])
+
+
+def parse_importtime(lines):
+    """
+    ImportTime records from ``-X importtime`` output, in the order the imports finished.
+    """
+    records = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line ("self [us] | cumulative | imported package")
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        records.append(ImportTime(module, int(fields[0]), int(fields[1]), (len(name) - len(module) - 1) // 2))
+    return records
+
+
+def profile(runs=3):
+    """
+    The fastest of ``runs`` cold starts, each in its own interpreter.
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], capture_output=True, text=True,
+                                cwd=str(settings.BASE_DIR))
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'probe failed')
+        _, _, log = result.stderr.partition(MARKER)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        run = Profile(timings['setup'], timings['urls'], parse_importtime(log.splitlines()), timings['modules'])
+        if best is None or run.setup + run.urls < best.setup + best.urls:
+            best = run
+    return best
+
+
+def by_package(imports):
+    """
+    {top-level package: (modules, self microseconds)}, slowest first.
+    """
+    packages = {}
+    for record in imports:
+        package = record.module.partition('.')[0]
+        count, total = packages.get(package, (0, 0))
+        packages[package] = (count + 1, total + record.self_us)
+    return dict(sorted(packages.items(), key=lambda item: item[1][1], reverse=True))
+
+
+def deferred_imports(modules, deferred=None):
+    """
+    Which of ``deferred`` (default STARTUP_DEFERRED_MODULES) were imported during startup.
+    """
+    deferred = settings.STARTUP_DEFERRED_MODULES if deferred is None else deferred
+    loaded = {module.partition('.')[0] for module in modules}
+    return [name for name in deferred if name in loaded]
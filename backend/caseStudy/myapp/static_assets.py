@@ -0,0 +1,190 @@
+"""
+Serving the built React app without a separate web server or CDN.
+
+Assets come from the CRA build's ``static/`` directory (and STATICFILES_DIRS); the top-level files
+next to ``index.html`` (favicon, manifest, ...) come from FRONTEND_BUILD_DIR itself. ``.br`` and
+``.gz`` siblings written by ``manage.py compress_static`` are sent as-is to clients that accept
+them, so nothing is compressed per request. Files whose name carries a content hash
+(``main.dce1a395.js``) never change under that name and are cached by browsers for a year;
+everything else is revalidated with its ETag. Bodies go out through FileResponse, which the WSGI
+server can hand to sendfile.
+
+``index.html`` is rendered once per process and kept in memory with its compressed variants.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.template.loader import render_to_string
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .compression import MIN_COMPRESS_SIZE, accepted_encodings, brotli, compress
+
+# CRA names: main.dce1a395.js, 787.c3a8e1f4.chunk.js, logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}(\.chunk)?\.\w+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# File extension per Content-Encoding, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+COMPRESSIBLE = ('.js', '.css', '.html', '.json', '.map', '.svg', '.txt', '.ico', '.webmanifest')
+
+
+class Asset:
+    __slots__ = ('path', 'content_type', 'etag', 'last_modified', 'cache_control', 'variants', 'mtime')
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.mtime = stat.st_mtime
+        self.etag = quote_etag('%x-%x' % (int(stat.st_mtime * 1000000), stat.st_size))
+        self.last_modified = http_date(stat.st_mtime)
+        self.cache_control = IMMUTABLE if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE
+        # Precompressed siblings that are at least as new as the file itself
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                if os.stat(path + suffix).st_mtime >= stat.st_mtime:
+                    self.variants[encoding] = path + suffix
+            except OSError:
+                pass
+
+
+def asset_roots():
+    return [os.path.join(settings.FRONTEND_BUILD_DIR, 'static')] + [str(path) for path in settings.STATICFILES_DIRS]
+
+
+class AssetFinder:
+    """
+    Resolves URL paths to Assets under a list of directories, remembering each lookup until the
+    file changes on disk.
+    """
+
+    def __init__(self, roots):
+        self.roots = roots
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def find(self, path):
+        for root in self.roots:
+            try:
+                full_path = safe_join(root, path)
+            except SuspiciousFileOperation:
+                return None
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            if not os.path.isfile(full_path):
+                continue
+            with self._lock:
+                asset = self._assets.get(full_path)
+                if asset is None or asset.mtime != stat.st_mtime:
+                    asset = self._assets[full_path] = Asset(full_path, stat)
+            return asset
+        return None
+
+
+def best_encoding(request, available):
+    accepted = accepted_encodings(request)
+    return next((encoding for encoding, _ in ENCODINGS if encoding in available and encoding in accepted), None)
+
+
+def asset_response(request, asset):
+    """
+    FileResponse for ``asset`` in the best precompressed form the client accepts, or 304.
+    """
+    encoding = best_encoding(request, asset.variants)
+    # Each encoding is its own representation, so it gets its own validator
+    etag = asset.etag if encoding is None else '%s-%s"' % (asset.etag[:-1], encoding)
+    response = get_conditional_response(request, etag=etag, last_modified=int(asset.mtime))
+    if response is None:
+        response = FileResponse(open(asset.variants.get(encoding, asset.path), 'rb'), content_type=asset.content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Last-Modified'] = asset.last_modified
+    response['ETag'] = etag
+    response['Cache-Control'] = asset.cache_control
+    if asset.variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def compressed_files(roots):
+    """
+    Paths of every file under ``roots`` worth precompressing.
+    """
+    for root in roots:
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(COMPRESSIBLE):
+                    yield os.path.join(directory, name)
+
+
+def precompress(path, force=False):
+    """
+    Write ``path.br`` (when brotli is installed) and ``path.gz`` at maximum compression.
+    Skips variants that are already up to date or would not be smaller. Returns the paths written.
+    """
+    stat = os.stat(path)
+    if stat.st_size < MIN_COMPRESS_SIZE:
+        return []
+    with open(path, 'rb') as f:
+        body = f.read()
+    written = []
+    for encoding, suffix in ENCODINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        target = path + suffix
+        if not force and os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+            continue
+        data = compress(body, encoding, best=True)
+        if len(data) >= len(body):
+            continue
+        with open(target, 'wb') as f:
+            f.write(data)
+        written.append(target)
+    return written
+
+
+class RenderedPage:
+    """
+    A template rendered once, with its compressed variants and ETag.
+    """
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self._page = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        page = self._page
+        if page is None:
+            with self._lock:
+                if self._page is None:
+                    body = render_to_string(self.template_name).encode()
+                    variants = {None: body}
+                    for encoding, _ in ENCODINGS:
+                        if encoding != 'br' or brotli is not None:
+                            variants[encoding] = compress(body, encoding, best=True)
+                    self._page = (variants, quote_etag(hashlib.sha1(body).hexdigest()))
+                page = self._page
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._page = None
+
+
+asset_finder = AssetFinder(asset_roots())
+root_finder = AssetFinder([str(settings.FRONTEND_BUILD_DIR)])
+index_page = RenderedPage('index.html')
@@ -0,0 +1,4 @@
+from django.test import override_settings
+
+# No background broadcasters in the test process, whichever runner imports the tests
+override_settings(OUTBOX_IN_PROCESS=False).enable()
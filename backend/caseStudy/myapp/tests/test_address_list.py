@@ -0,0 +1,51 @@
+import json
+from django.test import TestCase
+from ..address_list import address_page
+from ..models import Address
+from ..serializers import AddressSerializer
+from .test_search import make_address
+
+URL = "/path/to/get_addresses_endpoint/"
+
+
+class TestAddressList(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            make_address("maddr%d" % i)
+
+    def test_rows_match_serializer(self):
+        rows, _ = address_page(limit=1)
+        book = Address.objects.get(address=rows[0]["address"])
+        self.assertEqual(json.loads(json.dumps(AddressSerializer(book).data)),
+                         self.client.get(URL, {"limit": 1}, secure=True).json()["results"][0])
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            rows, cursor = address_page(before=cursor, limit=2)
+            seen.extend(row["address"] for row in rows)
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["maddr4", "maddr3", "maddr2", "maddr1", "maddr0"])
+
+    def test_etag_changes_only_on_writes(self):
+        response = self.client.get(URL, secure=True)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(URL, secure=True, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        make_address("maddr5")
+        response = self.client.get(URL, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["address"], "maddr5")
+
+    def test_streamed_exports(self):
+        response = self.client.get(URL, {"export": "ndjson"}, secure=True)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["address"] for line in lines], ["maddr%d" % i for i in range(4, -1, -1)])
+        response = self.client.get(URL, {"export": "json"}, secure=True)
+        self.assertEqual(len(json.loads(b"".join(response.streaming_content))), 5)
+        self.assertEqual(self.client.get(URL, {"export": "xml"}, secure=True).status_code, 400)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(URL, {"before": "nope"}, secure=True).status_code, 400)
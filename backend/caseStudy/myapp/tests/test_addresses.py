@@ -0,0 +1,82 @@
+from django.test import TestCase
+from ..addresses import (
+    AddressError,
+    b58encode_check,
+    bech32_encode,
+    decode_address,
+    is_valid_address,
+    normalize_address,
+    script_address,
+    script_pubkey,
+    validate_addresses
+)
+
+# BIP173 / BIP350 test vectors
+P2WPKH_MAIN = "BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4"
+P2WSH_TEST = "tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7"
+P2TR_MAIN = "bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0"
+
+
+class TestAddressDecoding(TestCase):
+
+    def test_base58_types_and_networks(self):
+        self.assertEqual(decode_address("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "btc").type, "p2pkh")
+        self.assertEqual(decode_address("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy", "btc").type, "p2sh")
+        self.assertEqual(decode_address("mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "btc-testnet").type, "p2pkh")
+        self.assertFalse(is_valid_address("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "btc-testnet"))
+
+    def test_base58_checksum(self):
+        with self.assertRaises(AddressError):
+            decode_address("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNb", "btc")
+
+    def test_bech32_and_bech32m(self):
+        self.assertEqual(decode_address(P2WPKH_MAIN, "btc").type, "p2wpkh")
+        self.assertEqual(decode_address(P2WSH_TEST, "btc-testnet").type, "p2wsh")
+        self.assertEqual(decode_address(P2TR_MAIN, "btc").type, "p2tr")
+        self.assertFalse(is_valid_address(P2WSH_TEST, "btc"))
+
+    def test_bech32_rejects_wrong_checksum_variant_and_mixed_case(self):
+        # Witness v1 with a bech32 (not bech32m) checksum, and v0 with bech32m
+        self.assertFalse(is_valid_address("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqh2y7hd", "btc"))
+        self.assertFalse(is_valid_address("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kemeawh", "btc"))
+        self.assertFalse(is_valid_address("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kV8F3T4", "btc"))
+
+    def test_bech32_is_normalized_to_lower_case(self):
+        self.assertEqual(normalize_address(P2WPKH_MAIN, "btc"), P2WPKH_MAIN.lower())
+        self.assertEqual(normalize_address("TB1Q", "btc-testnet"), "tb1q")
+        self.assertEqual(normalize_address("mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "btc-testnet"),
+                         "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi")
+
+    def test_encode_round_trip(self):
+        decoded = decode_address(P2TR_MAIN, "btc")
+        self.assertEqual(bech32_encode("bc", decoded.witness_version, decoded.payload), P2TR_MAIN)
+        decoded = decode_address("mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "btc-testnet")
+        self.assertEqual(b58encode_check(b"\x6f" + decoded.payload), "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi")
+
+    def test_script_address_round_trip(self):
+        for address, coin_symbol in [("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "btc"),
+                                     ("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy", "btc"),
+                                     (P2WPKH_MAIN.lower(), "btc"), (P2WSH_TEST, "btc-testnet"), (P2TR_MAIN, "btc")]:
+            self.assertEqual(script_address(script_pubkey(address, coin_symbol), coin_symbol), address)
+        # OP_RETURN and bare multisig have no address
+        self.assertIsNone(script_address(bytes.fromhex("6a0568656c6c6f"), "btc"))
+        self.assertIsNone(script_address(bytes.fromhex("5121" + "02" * 33 + "51ae"), "btc"))
+
+    def test_batch_validation(self):
+        results = validate_addresses(["mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "nope", None], "btc-testnet")
+        self.assertEqual([r["valid"] for r in results], [True, False, False])
+        self.assertEqual(results[0]["type"], "p2pkh")
+
+
+class TestValidateAddressesView(TestCase):
+
+    def test_bulk_endpoint(self):
+        response = self.client.post("/api/validate-addresses/", {"addresses": ["mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "x"]},
+                                    content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["valid"] for r in response.json()["results"]], [True, False])
+
+    def test_bulk_endpoint_requires_list(self):
+        response = self.client.post("/api/validate-addresses/", {"addresses": "x"},
+                                    content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from django.test import RequestFactory, TestCase
+from unittest.mock import patch
+from bit.network.meta import Unspent
+from .. import async_views, utxo_cache
+from ..providers import FakeProvider
+from ..shared_cache import shared_cache
+
+SOURCE = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+
+
+class SlowProvider(FakeProvider):
+    """
+    FakeProvider whose async calls take a while and record how many overlap.
+    """
+
+    def __init__(self):
+        super().__init__(fixtures='')
+        self.unspent[SOURCE] = [Unspent(60000, 1, '', 'aa' * 32, 0), Unspent(50000, 1, '', 'bb' * 32, 1)]
+        self.transactions = {'aa' * 32: {'hex': '01', 'confirmations': 1},
+                             'bb' * 32: {'hex': '02', 'confirmations': 1}}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def _to_async(self, method):
+        async def run(*args):
+            self.calls.append(method.__name__)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return method(*args)
+        return run
+
+
+class TestAsyncViews(TestCase):
+
+    def setUp(self):
+        self.provider = SlowProvider()
+        for module in (async_views, utxo_cache):
+            patcher = patch.object(module, 'get_provider', return_value=self.provider)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        utxo_cache.utxo_cache.clear()
+        disabled = patch.object(shared_cache, 'path', '')
+        disabled.start()
+        self.addCleanup(disabled.stop)
+        rates = patch.object(async_views.fee_service, 'cached_rates', return_value=self.provider.get_fee_rates())
+        rates.start()
+        self.addCleanup(rates.stop)
+
+    def post(self, view, data):
+        request = RequestFactory().post('/', data=json.dumps(data), content_type='application/json')
+        return json.loads(asyncio.run(view(request)).content)
+
+    def test_send_fetches_upstream_data_concurrently(self):
+        response = self.post(async_views.get_transaction_data,
+                             {"from_address": SOURCE, "to_address": DESTINATION, "amount": "0.001"})
+        self.assertEqual(response["status"], "success")
+        self.assertEqual(response["message"]["amount"], 100000)
+        self.assertEqual(len(response["message"]["inputs"]), 2)
+        # One call for balance and outputs together, then both previous transactions at once;
+        # the fee rate comes from the cache
+        self.assertEqual(self.provider.calls.count("get_address_unspent"), 1)
+        self.assertEqual(self.provider.calls.count("get_raw_transaction"), 2)
+        self.assertEqual(self.provider.max_in_flight, 2)
+
+    def test_send_insufficient_balance(self):
+        response = self.post(async_views.get_transaction_data,
+                             {"from_address": SOURCE, "to_address": DESTINATION, "amount": "1"})
+        self.assertEqual(response["status"], "error")
+
+    def test_get_confirmations(self):
+        response = self.post(async_views.get_confirmations, {"hash": "aa" * 32})
+        self.assertEqual(response, {"status": "success", "confirmations": 1})
+
+    def test_rejects_get(self):
+        request = RequestFactory().get('/')
+        self.assertEqual(asyncio.run(async_views.get_confirmations(request)).status_code, 405)
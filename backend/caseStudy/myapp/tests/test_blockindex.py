@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from ..addresses import script_pubkey
+from ..blockfiles import BlockFiles, block_hash, unxor
+from ..blockindex import BlockIndex, LocalIndexProvider
+from ..providers import FakeProvider
+from ..psbt import serialize_unsigned_tx
+from ..txparser import parse_transaction
+
+REGTEST_MAGIC = bytes.fromhex('fabfb5da')
+COIN_SYMBOL = "btc-testnet"
+ALICE = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+BOB = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+CAROL = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+
+
+def coinbase(address, value, tag):
+    # The locktime tag keeps coinbase txids unique
+    return serialize_unsigned_tx([('00' * 32, 0xffffffff)], [(value, script_pubkey(address, COIN_SYMBOL))], tag)
+
+
+def spend(outpoints, payments):
+    return serialize_unsigned_tx(outpoints, [(value, script_pubkey(address, COIN_SYMBOL))
+                                             for address, value in payments])
+
+
+def txid(raw):
+    return parse_transaction(raw).txid
+
+
+def block(prev, transactions, nonce=0):
+    header = ((1).to_bytes(4, 'little') + prev + b'\x00' * 32 + (0).to_bytes(4, 'little') + b'\xff\xff\x7f\x20'
+              + nonce.to_bytes(4, 'little'))
+    return header + bytes([len(transactions)]) + b''.join(transactions)
+
+
+@override_settings(BLOCK_INDEX_UNDO_DEPTH=100, BLOCK_INDEX_BATCH=2)
+class TestBlockIndex(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.blocks_dir = os.path.join(self.dir, 'blocks')
+        os.mkdir(self.blocks_dir)
+        self.xor_key = None
+
+        self.cb0 = coinbase(ALICE, 5000, 0)
+        self.b0 = block(b'\x00' * 32, [self.cb0])
+        self.cb1 = coinbase(ALICE, 5000, 1)
+        self.b1 = block(block_hash(self.b0[:80]), [self.cb1])
+        self.pay = spend([(txid(self.cb0), 0)], [(BOB, 3000), (ALICE, 1900)])
+        self.b2 = block(block_hash(self.b1[:80]), [coinbase(CAROL, 5000, 2), self.pay])
+
+    def write(self, number, blocks, append=False):
+        path = os.path.join(self.blocks_dir, 'blk%05d.dat' % number)
+        position = os.path.getsize(path) if append and os.path.exists(path) else 0
+        data = b''.join(REGTEST_MAGIC + len(b).to_bytes(4, 'little') + b for b in blocks)
+        with open(path, 'ab' if append else 'wb') as f:
+            f.write(unxor(data, self.xor_key, position))
+
+    def index(self):
+        return BlockIndex(os.path.join(self.dir, 'index.sqlite3'), self.blocks_dir, COIN_SYMBOL)
+
+    def test_indexes_blocks_written_out_of_order(self):
+        self.write(0, [self.b0, self.b2, self.b1])
+        index = self.index()
+        self.assertEqual(index.update(workers=1), 3)
+        self.assertEqual(index.tip()[0], 2)
+
+        self.assertEqual(index.address_summary(ALICE), (5000 + 5000 + 1900, 5000, 3))
+        self.assertEqual(index.address_summary(BOB), (3000, 0, 1))
+        self.assertEqual(sorted(value for _, _, value, _ in index.unspent(ALICE)), [1900, 5000])
+        self.assertEqual(index.raw_transaction(bytes.fromhex(txid(self.pay))).hex(), self.pay.hex())
+
+    def test_provider_answers_from_the_index(self):
+        self.write(0, [self.b0, self.b1, self.b2])
+        index = self.index()
+        index.update(workers=1)
+        provider = LocalIndexProvider(index, fallback=FakeProvider(fixtures=''))
+
+        details = provider.get_address_details(ALICE)
+        self.assertEqual(details['final_balance'], 6900)
+        self.assertEqual(details['n_tx'], 3)
+        unspent = {utxo.txid: utxo for utxo in provider.get_unspent(ALICE)}
+        self.assertEqual(unspent[txid(self.pay)].amount, 1900)
+        self.assertEqual(unspent[txid(self.pay)].txindex, 1)
+        self.assertEqual(unspent[txid(self.pay)].confirmations, 1)
+        self.assertEqual(unspent[txid(self.cb1)].confirmations, 2)
+        self.assertEqual(provider.get_raw_transaction(txid(self.pay)), self.pay.hex())
+        self.assertEqual(provider.get_transaction(txid(self.cb0)), {'block_height': 0, 'confirmations': 3})
+        self.assertEqual(provider.get_chain_tip()['hash'], block_hash(self.b2[:80])[::-1].hex())
+        self.assertFalse(provider.rate_limited)
+        # Unknown to the index, answered by the fallback
+        self.assertEqual(provider.get_transaction('ab' * 32), {'block_height': -1, 'confirmations': 0})
+
+    def test_catches_up_incrementally(self):
+        self.write(0, [self.b0, self.b1])
+        index = self.index()
+        self.assertEqual(index.update(workers=1), 2)
+        self.assertEqual(index.update(workers=1), 0)
+        self.write(0, [self.b2], append=True)
+        self.assertEqual(index.update(workers=1), 1)
+        self.assertEqual(index.address_summary(BOB), (3000, 0, 1))
+
+    def test_rolls_back_a_reorg(self):
+        self.write(0, [self.b0, self.b1, self.b2])
+        index = self.index()
+        index.update(workers=1)
+
+        # A longer branch from block 1 without the payment to Bob
+        fork = [block(block_hash(self.b1[:80]), [coinbase(CAROL, 5000, 2)], nonce=1)]
+        fork.append(block(block_hash(fork[0][:80]), [coinbase(CAROL, 5000, 3)], nonce=1))
+        self.write(1, fork)
+        self.assertEqual(index.update(workers=1), 2)
+
+        self.assertEqual(index.tip(), (3, block_hash(fork[1][:80])))
+        self.assertEqual(index.address_summary(BOB), (0, 0, 0))
+        self.assertEqual(index.address_summary(ALICE), (10000, 0, 2))
+        self.assertEqual(sorted(value for _, _, value, _ in index.unspent(ALICE)), [5000, 5000])
+        self.assertIsNone(index.transaction(bytes.fromhex(txid(self.pay))))
+
+    def test_reads_obfuscated_files_in_worker_processes(self):
+        self.xor_key = bytes.fromhex('0102030405060708')
+        with open(os.path.join(self.blocks_dir, 'xor.dat'), 'wb') as f:
+            f.write(self.xor_key)
+        self.write(0, [self.b0])
+        self.write(0, [self.b1, self.b2], append=True)
+        index = self.index()
+        self.assertEqual(index.update(workers=2), 3)
+        self.assertEqual(index.address_summary(BOB), (3000, 0, 1))
+        self.assertEqual(index.raw_transaction(bytes.fromhex(txid(self.pay))), self.pay)
+
+
+class TestBlockFiles(SimpleTestCase):
+
+    def test_stops_at_a_partially_written_record(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        b0 = block(b'\x00' * 32, [coinbase(ALICE, 5000, 0)])
+        with open(os.path.join(directory, 'blk00000.dat'), 'wb') as f:
+            f.write(REGTEST_MAGIC + len(b0).to_bytes(4, 'little') + b0)
+            f.write(REGTEST_MAGIC + (1000).to_bytes(4, 'little') + b0)
+        records = list(BlockFiles(directory).records(0))
+        self.assertEqual([record.hash for record in records], [block_hash(b0[:80])])
@@ -0,0 +1,96 @@
+from django.test import TestCase
+from unittest.mock import patch
+from .. import bulk_import
+from ..models import Address
+from ..providers import FakeProvider
+from ..resilience import deadline, remaining
+from .test_search import make_address
+
+SOURCE = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+OTHER = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+
+
+class CountingProvider(FakeProvider):
+
+    def __init__(self):
+        super().__init__(fixtures='')
+        self.requested = []
+
+    def get_addresses_details(self, addresses):
+        self.requested.extend(addresses)
+        return super().get_addresses_details(addresses)
+
+
+class TestBulkImport(TestCase):
+
+    def setUp(self):
+        self.provider = CountingProvider()
+        patcher = patch.object(bulk_import, 'get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dedupes_before_fetching(self):
+        make_address(SOURCE)
+        result = bulk_import.import_addresses([SOURCE, DESTINATION, DESTINATION, " %s " % OTHER, "bogus"],
+                                              batch_size=1)
+        self.assertEqual(sorted(self.provider.requested), sorted([DESTINATION, OTHER]))
+        self.assertEqual((result["created"], result["existing"]), (2, 1))
+        self.assertEqual(result["invalid"], ["bogus"])
+        self.assertEqual(Address.objects.count(), 3)
+
+    def test_bech32_case_variants_are_one_address(self):
+        make_address(OTHER)
+        result = bulk_import.import_addresses([OTHER.upper(), DESTINATION])
+        self.assertEqual(self.provider.requested, [DESTINATION])
+        self.assertEqual((result["created"], result["existing"]), (1, 1))
+
+    def test_reimport_is_a_no_op(self):
+        bulk_import.import_addresses([SOURCE, DESTINATION])
+        self.provider.requested.clear()
+        result = bulk_import.import_addresses([SOURCE, DESTINATION])
+        self.assertEqual(self.provider.requested, [])
+        self.assertEqual((result["created"], result["existing"]), (0, 2))
+
+    def test_rows_added_while_fetching_count_as_existing(self):
+        fetch = bulk_import.fetch_addresses_details
+        with patch.object(bulk_import, 'fetch_addresses_details',
+                          side_effect=lambda addresses, **kwargs: make_address(DESTINATION) and fetch(addresses)):
+            result = bulk_import.import_addresses([DESTINATION, OTHER])
+        self.assertEqual((result["created"], result["existing"]), (1, 1))
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_batches_run_within_the_callers_deadline(self):
+        budgets = []
+        fetch = self.provider.get_addresses_details
+        with patch.object(self.provider, 'get_addresses_details',
+                          side_effect=lambda addresses: budgets.append(remaining()) or fetch(addresses)):
+            with deadline(60):
+                bulk_import.import_addresses([DESTINATION, OTHER], batch_size=1)
+        self.assertEqual(len(budgets), 2)
+        self.assertTrue(all(budget is not None and 0 < budget <= 60 for budget in budgets))
+
+    def test_failed_batches_are_reported(self):
+        with patch.object(self.provider, 'get_addresses_details', side_effect=RuntimeError("down")):
+            result = bulk_import.import_addresses([SOURCE])
+        self.assertEqual(result["failed"], [SOURCE])
+        self.assertFalse(Address.objects.exists())
+
+    def test_import_endpoint(self):
+        response = self.client.post("/api/import-addresses/", {"addresses": [SOURCE, SOURCE]},
+                                    content_type="application/json", secure=True)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertTrue(Address.objects.filter(address=SOURCE).exists())
+
+    def test_create_endpoint_stores_bech32_in_lower_case(self):
+        with patch('myapp.views.get_provider', return_value=self.provider), \
+                patch('myapp.utils.get_provider', return_value=self.provider):
+            self.client.post("/path/to/create_address_endpoint/", {"address": OTHER.upper()},
+                             content_type="application/json", secure=True)
+            response = self.client.post("/path/to/create_address_endpoint/", {"address": OTHER},
+                                        content_type="application/json", secure=True)
+        self.assertEqual(response.json()["message"], "Address already exists!")
+        self.assertEqual(list(Address.objects.values_list("address", flat=True)), [OTHER])
+        response = self.client.get("/path/to/search_addresses_endpoint/", {"q": "TB1QW5"}, secure=True)
+        self.assertEqual(response.json()["results"], [{"address": OTHER}])
+
@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime, timedelta
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from unittest.mock import patch
+from ..cache import LRUCache, StaleWhileRevalidateCache, make_entry
+from ..models import Address
+from ..views import address_details_cache
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+
+
+class TestLRUCache(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+
+class TestStaleWhileRevalidate(SimpleTestCase):
+
+    def test_serves_stale_entry_and_refreshes_once(self):
+        now = datetime.now(timezone.utc)
+        stale = make_entry({"balance": 1}, now - timedelta(hours=1))
+        release = threading.Event()
+        refreshes = []
+
+        def refresh(key):
+            refreshes.append(key)
+            release.wait(5)
+            return make_entry({"balance": 2}, datetime.now(timezone.utc))
+
+        cache = StaleWhileRevalidateCache(lambda key: stale, refresh, fresh_ttl=60, cache_ttl=60, maxsize=10)
+        self.assertEqual(cache.get("addr", now).data, {"balance": 1})
+        self.assertEqual(cache.get("addr", now).data, {"balance": 1})
+        self.assertIsNone(cache.revalidate("addr"))
+        release.set()
+        cache._executor.shutdown(wait=True)
+        self.assertEqual(refreshes, ["addr"])
+        self.assertEqual(cache.get("addr", now).data, {"balance": 2})
+
+
+class TestAddressDetailsView(TestCase):
+
+    def setUp(self):
+        address_details_cache.entries.clear()
+        Address.objects.create(address=ADDRESS, total_received=5, total_sent=0, balance=5, unconfirmed_balance=0,
+                               final_balance=5, n_tx=1, unconfirmed_n_tx=0, final_n_tx=1)
+
+    def test_conditional_get(self):
+        url = "/api/path-to-details/%s/" % ADDRESS
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["final_balance"], 5)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_row_is_served_without_waiting_for_upstream(self):
+        Address.objects.filter(address=ADDRESS).update(refreshed_at=timezone.now() - timedelta(hours=1))
+        with patch.object(address_details_cache, "revalidate") as revalidate:
+            response = self.client.get("/api/path-to-details/%s/" % ADDRESS, secure=True)
+        self.assertEqual(response.json()["final_balance"], 5)
+        revalidate.assert_called_once_with(ADDRESS)
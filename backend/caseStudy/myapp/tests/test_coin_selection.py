@@ -0,0 +1,55 @@
+import numpy as np
+from django.test import SimpleTestCase
+from ..coin_selection import (
+    DUST_THRESHOLD,
+    InsufficientFunds,
+    branch_and_bound,
+    estimate_fee,
+    knapsack,
+    largest_first,
+    select_coins
+)
+
+FEE_RATE = 1
+
+
+class TestCoinSelection(SimpleTestCase):
+
+    def assertCovers(self, amounts, selection, target):
+        self.assertEqual(selection.total, int(amounts[selection.indices].sum()))
+        self.assertEqual(selection.total, target + selection.fee + selection.change)
+        self.assertGreaterEqual(selection.fee, estimate_fee(len(selection.indices), 1, FEE_RATE))
+
+    def test_selects_multiple_inputs(self):
+        amounts = np.array([10000, 20000, 30000, 50000])
+        selection = select_coins(amounts, 90000, FEE_RATE)
+        self.assertGreater(len(selection.indices), 1)
+        self.assertCovers(amounts, selection, 90000)
+
+    def test_branch_and_bound_finds_changeless_match(self):
+        amounts = np.array([70000, 30000 + 148 + 44, 60000, 40000 + 148])
+        selection = branch_and_bound(amounts, 70000, FEE_RATE)
+        self.assertEqual(selection.change, 0)
+        self.assertEqual(sorted(selection.indices.tolist()), [1, 3])
+        self.assertCovers(amounts, selection, 70000)
+
+    def test_knapsack_adds_change_above_dust(self):
+        amounts = np.array([5000, 8000, 13000, 21000])
+        selection = knapsack(amounts, 20000, FEE_RATE, seed=1)
+        self.assertGreaterEqual(selection.change, DUST_THRESHOLD)
+        self.assertCovers(amounts, selection, 20000)
+
+    def test_largest_first(self):
+        amounts = np.array([1000, 90000, 5000, 40000])
+        selection = largest_first(amounts, 100000, FEE_RATE)
+        self.assertEqual(sorted(selection.indices.tolist()), [1, 3])
+        self.assertCovers(amounts, selection, 100000)
+
+    def test_insufficient_funds(self):
+        with self.assertRaises(InsufficientFunds):
+            select_coins(np.array([1000, 2000]), 5000, FEE_RATE)
+
+    def test_dust_inputs_are_never_selected(self):
+        amounts = np.array([100, 100, 100, 60000])
+        selection = select_coins(amounts, 50000, FEE_RATE)
+        self.assertEqual(selection.indices.tolist(), [3])
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from django.test import SimpleTestCase
+from unittest.mock import Mock, patch
+from .. import confirmations
+from ..confirmations import ConfirmationTracker, aconfirmation_events, confirmation_events
+from ..providers import FakeProvider
+
+PENDING = "aa" * 32
+MINED = "bb" * 32
+UNKNOWN = "cc" * 32
+
+
+class CountingProvider(FakeProvider):
+
+    def __init__(self):
+        super().__init__(fixtures='')
+        self.height = 100
+        self.transactions = {PENDING: {"hex": "00"}, MINED: {"hex": "00", "block_height": 99}}
+        self.lookups = 0
+
+    def get_transaction(self, tx_hash):
+        self.lookups += 1
+        if tx_hash not in self.transactions:
+            error = Exception("Transaction not found")
+            error.response = Mock(status_code=404)
+            raise error
+        return super().get_transaction(tx_hash)
+
+
+class TestConfirmationTracker(SimpleTestCase):
+
+    def setUp(self):
+        self.provider = CountingProvider()
+        patcher = patch.object(confirmations, "get_provider", return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracker = ConfirmationTracker(poll_interval=1, max_depth=6, max_tracked=10, autostart=False)
+
+    def test_confirmations_follow_the_chain_tip(self):
+        self.tracker.track(PENDING)
+        self.tracker.track(MINED)
+        self.assertIsNone(self.tracker.confirmations(PENDING))
+        self.tracker.poll_once()
+        self.assertEqual(self.tracker.statuses([PENDING, MINED]), {PENDING: 0, MINED: 2})
+
+        self.provider.mine_block()
+        self.tracker.poll_once()
+        self.assertEqual(self.tracker.statuses([PENDING, MINED]), {PENDING: 1, MINED: 3})
+
+    def test_only_unconfirmed_transactions_are_looked_up_per_block(self):
+        self.tracker.track(PENDING)
+        self.tracker.track(MINED)
+        self.tracker.poll_once()
+        self.assertEqual(self.provider.lookups, 2)
+
+        self.tracker.poll_once()
+        self.assertEqual(self.provider.lookups, 2)
+
+        self.provider.mine_block()
+        self.tracker.poll_once()
+        self.assertEqual(self.provider.lookups, 3)
+
+    def test_deep_transactions_are_answered_without_lookups(self):
+        self.tracker.track(MINED)
+        self.provider.height = 110
+        self.tracker.poll_once()
+        self.assertEqual(self.tracker.confirmations(MINED), 12)
+        self.provider.mine_block()
+        self.tracker.poll_once()
+        self.assertEqual((self.tracker.confirmations(MINED), self.provider.lookups), (13, 1))
+
+    def test_old_client_hashes_are_not_reported_missing(self):
+        self.tracker.track(MINED, verified=False)
+        self.provider.height = 1000
+        self.tracker.poll_once()
+        events = list(confirmation_events(self.tracker, MINED, target=20, timeout=1))
+        self.assertEqual(events, ["data: %s\n\n" % json.dumps({"hash": MINED, "confirmations": 902})])
+
+    def test_buried_transactions_are_bounded(self):
+        tracker = ConfirmationTracker(poll_interval=1, max_depth=1, max_tracked=10, max_buried=1, autostart=False)
+        self.provider.transactions[PENDING]["block_height"] = 98
+        tracker.track(PENDING)
+        tracker.track(MINED)
+        tracker.poll_once()
+        self.assertEqual(tracker.statuses([PENDING, MINED]), {PENDING: None, MINED: 2})
+
+    def test_tracking_limit(self):
+        tracker = ConfirmationTracker(poll_interval=1, max_depth=6, max_tracked=1, autostart=False)
+        tracker.track(PENDING)
+        with self.assertRaises(OverflowError):
+            tracker.track(MINED)
+
+    def test_untracked_transactions_are_not_looked_up(self):
+        self.tracker.track(PENDING)
+        self.tracker.untrack(PENDING)
+        self.tracker.poll_once()
+        self.assertFalse(self.tracker.is_tracked(PENDING))
+        self.assertEqual(self.provider.lookups, 0)
+
+    def test_unknown_client_hashes_are_dropped(self):
+        tracker = ConfirmationTracker(poll_interval=1, max_depth=6, max_tracked=1, max_unverified=1, max_misses=2,
+                                      autostart=False)
+        tracker.track(UNKNOWN, verified=False)
+        with self.assertRaises(OverflowError):
+            tracker.track(PENDING, verified=False)
+        tracker.poll_once()
+        self.assertTrue(tracker.is_tracked(UNKNOWN))
+        tracker.poll_once()
+        self.assertFalse(tracker.is_tracked(UNKNOWN))
+        self.assertEqual(self.provider.lookups, 2)
+        # Dropped hashes left room for the real broadcast
+        tracker.track(PENDING)
+        events = list(confirmation_events(tracker, UNKNOWN, target=1, timeout=1))
+        self.assertEqual(json.loads(events[0][len("data: "):])["error"], "Transaction not found")
+
+    def test_client_hashes_are_tracked_once_found(self):
+        self.tracker.track(MINED, verified=False)
+        self.assertIsNone(self.tracker.confirmations(MINED))
+        self.tracker.poll_once()
+        self.assertEqual(self.tracker.confirmations(MINED), 2)
+        self.provider.height = 101
+        self.tracker.poll_once()
+        self.assertEqual(self.provider.lookups, 1)
+
+    def test_event_stream_ends_at_target(self):
+        self.tracker.track(MINED)
+        self.tracker.poll_once()
+        events = list(confirmation_events(self.tracker, MINED, target=1, timeout=1))
+        self.assertEqual(events, ["data: %s\n\n" % json.dumps({"hash": MINED, "confirmations": 2})])
+
+    def test_event_stream_window_asks_for_a_reconnect(self):
+        self.tracker.track(PENDING)
+        self.tracker.poll_once()
+        events = list(confirmation_events(self.tracker, PENDING, target=1, timeout=0.01, retry=5))
+        self.assertEqual(events[0], "retry: 5000\n\n")
+        self.assertEqual(events[1], "data: %s\n\n" % json.dumps({"hash": PENDING, "confirmations": 0}))
+
+    def test_async_event_stream(self):
+        self.tracker.track(PENDING)
+        self.tracker.poll_once()
+
+        async def collect():
+            events = []
+            async for event in aconfirmation_events(self.tracker, PENDING, target=1, timeout=5, retry=5):
+                events.append(event)
+                if len(events) == 2:
+                    # A block confirms it while the stream waits
+                    self.provider.mine_block()
+                    await asyncio.to_thread(self.tracker.poll_once)
+            return events
+
+        with patch.object(confirmations, "ASYNC_STREAM_POLL", 0.01):
+            events = asyncio.run(collect())
+        self.assertEqual(events[2], "data: %s\n\n" % json.dumps({"hash": PENDING, "confirmations": 1}))
+        self.assertEqual(len(events), 3)
+
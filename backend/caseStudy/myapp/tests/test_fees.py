@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch
+from bit.network.meta import Unspent
+from .. import fees
+from ..fees import FeeService, estimate_fee
+from ..models import FeeRate
+from ..providers import FakeProvider
+from ..shared_cache import shared_cache
+from ..utxo_cache import utxo_cache
+
+SOURCE = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+
+
+class TestFeeService(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        self.provider.fee = 30
+        patcher = patch.object(fees, 'get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = FeeService(refresh_interval=60, autostart=False)
+
+    def test_cold_start_fetches_once_and_stores(self):
+        with patch.object(self.provider, 'get_fee_rates', wraps=self.provider.get_fee_rates) as get_fee_rates:
+            self.assertEqual(self.service.rates(), {"fast": 30, "normal": 20, "economy": 10})
+            self.service.rates()
+        get_fee_rates.assert_called_once()
+        self.assertEqual(FeeRate.objects.get(tier="normal").sat_per_byte, 20)
+
+    def test_restart_uses_stored_rates(self):
+        self.service.refresh()
+        restarted = FeeService(refresh_interval=60, autostart=False)
+        with patch.object(self.provider, 'get_fee_rates') as get_fee_rates:
+            self.assertEqual(restarted.rate("economy"), 10)
+        get_fee_rates.assert_not_called()
+
+    def test_old_stored_rates_are_refetched(self):
+        self.service.refresh()
+        FeeRate.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        self.provider.fee = 60
+        self.assertEqual(FeeService(refresh_interval=60, autostart=False).rate("fast"), 60)
+
+    def test_estimate_fee_by_size(self):
+        rates = {"fast": 30, "normal": 20, "economy": 10}
+        # 10 + 2 * 148 + 2 * 34 bytes
+        self.assertEqual(estimate_fee(2, 2, "economy", rates), 3740)
+
+
+class TestSendUsesCachedFees(TestCase):
+
+    def test_send_makes_no_fee_call(self):
+        provider = FakeProvider(fixtures='')
+        provider.unspent[SOURCE] = [Unspent(1000, 1, '', 'aa' * 32, 0)]
+        utxo_cache.clear()
+        with patch.object(fees.fee_service, 'rates', return_value={"fast": 5, "normal": 3, "economy": 1}), \
+                patch('myapp.utils.get_provider', return_value=provider), \
+                patch('myapp.utxo_cache.get_provider', return_value=provider), \
+                patch.object(shared_cache, 'path', ''), \
+                patch.object(provider, 'get_fee') as get_fee, \
+                patch.object(provider, 'get_fee_rates') as get_fee_rates:
+            response = self.client.post("/send_bitcoin/", {"from_address": SOURCE, "to_address": DESTINATION,
+                                                           "amount": "0.00001", "fee_tier": "economy"},
+                                        content_type="application/json", secure=True)
+        get_fee.assert_not_called()
+        get_fee_rates.assert_not_called()
+        # 1000 sats cannot cover a 1000 sat payment plus its fee
+        self.assertEqual(response.json()["message"], "Insufficient balance")
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from unittest.mock import patch
+from .. import history
+from ..models import TxRef
+from ..providers import FakeProvider
+from .test_search import make_address
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+
+
+def ref(height, n=0, value=1000):
+    return {"tx_hash": "%064x" % (height * 10 + n), "block_height": height, "tx_input_n": -1, "tx_output_n": n,
+            "value": value, "ref_balance": value, "confirmed": "2023-08-21T20:02:00Z", "double_spend": False}
+
+
+class TestHistory(TestCase):
+
+    def setUp(self):
+        history._last_sync.clear()
+        self.provider = FakeProvider(fixtures='')
+        self.provider.addresses[ADDRESS] = {"txrefs": [ref(h) for h in range(100, 110)],
+                                            "unconfirmed_txrefs": [{"tx_hash": "ff" * 32, "value": 5}]}
+        self.book = make_address(ADDRESS)
+        patcher = patch.object(history, 'get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_is_incremental(self):
+        history.sync_txrefs(self.book)
+        self.assertEqual(TxRef.objects.filter(address=self.book).count(), 10)
+        self.provider.addresses[ADDRESS]["txrefs"].append(ref(110))
+        with patch.object(self.provider, 'get_txrefs', wraps=self.provider.get_txrefs) as get_txrefs:
+            unconfirmed = history.sync_txrefs(self.book)
+        get_txrefs.assert_called_once_with(ADDRESS, after=109 - 6)
+        self.assertEqual(TxRef.objects.filter(address=self.book).count(), 11)
+        self.assertEqual(unconfirmed[0]["value"], 5)
+
+    def test_reorged_refs_are_replaced(self):
+        history.sync_txrefs(self.book)
+        self.provider.addresses[ADDRESS]["txrefs"] = [ref(h) for h in range(100, 108)] + [ref(108, n=1)]
+        history.sync_txrefs(self.book)
+        self.assertEqual(sorted(TxRef.objects.filter(block_height__gte=108).values_list('tx_output_n', flat=True)),
+                         [1])
+
+    def test_keyset_pages(self):
+        history.sync_txrefs(self.book)
+        first, cursor = history.history_page(self.book, limit=4)
+        self.assertEqual([r["block_height"] for r in first], [109, 108, 107, 106])
+        second, cursor = history.history_page(self.book, before=cursor, limit=4)
+        third, cursor = history.history_page(self.book, before=cursor, limit=4)
+        self.assertEqual([r["block_height"] for r in second + third], list(range(105, 99, -1)))
+        self.assertIsNone(cursor)
+
+    def test_history_endpoint(self):
+        url = "/api/history/%s/" % ADDRESS
+        response = self.client.get(url, {"limit": 5}, secure=True)
+        body = response.json()
+        self.assertEqual(len(body["txrefs"]), 5)
+        self.assertEqual(len(body["unconfirmed_txrefs"]), 1)
+        with patch.object(self.provider, 'get_txrefs') as get_txrefs:
+            response = self.client.get(url, {"before": body["next"]}, secure=True)
+        get_txrefs.assert_not_called()
+        self.assertEqual(len(response.json()["txrefs"]), 5)
+        self.assertEqual(self.client.get(url, {"before": "x"}, secure=True).status_code, 400)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import requests
+import tempfile
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest.mock import patch
+from blockcypher.api import RateLimitError
+from ..benchmarks.load import drive, fake_chain, report, seed
+from ..providers import FakeProvider, FaultInjectingProvider, get_provider
+from ..shared_cache import shared_cache
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+
+
+class TestFaultInjectingProvider(SimpleTestCase):
+
+    def test_passes_calls_through(self):
+        provider = FaultInjectingProvider(FakeProvider(fixtures=''))
+        self.assertEqual(provider.get_fee(), 10)
+        self.assertEqual(asyncio.run(provider.aget_fee()), 10)
+        self.assertEqual(provider.fee, 10)
+
+    def test_injects_errors(self):
+        provider = FaultInjectingProvider(FakeProvider(fixtures=''), error_rate=1)
+        with self.assertRaises(requests.ConnectionError):
+            provider.get_unspent(ADDRESS)
+        provider = FaultInjectingProvider(FakeProvider(fixtures=''), rate_limit_rate=1)
+        with self.assertRaises(RateLimitError):
+            asyncio.run(provider.aget_unspent(ADDRESS))
+
+    def test_error_rate_is_a_fraction_of_calls(self):
+        provider = FaultInjectingProvider(FakeProvider(fixtures=''), error_rate=0.25, seed=1)
+        failures = 0
+        for _ in range(1000):
+            try:
+                provider.get_fee()
+            except requests.ConnectionError:
+                failures += 1
+        self.assertTrue(200 < failures < 300)
+
+    @override_settings(CHAIN_PROVIDER='myapp.providers.FakeProvider', CHAIN_PROVIDER_FIXTURES='',
+                       CHAIN_FAULT_LATENCY=0.001)
+    def test_get_provider_wraps_when_configured(self):
+        get_provider.cache_clear()
+        self.addCleanup(get_provider.cache_clear)
+        self.assertIsInstance(get_provider().inner, FaultInjectingProvider)
+        self.assertIsInstance(fake_chain(get_provider()), FakeProvider)
+
+
+@override_settings(CHAIN_PROVIDER='myapp.providers.FakeProvider', CHAIN_PROVIDER_FIXTURES='',
+                   CHAIN_RATE_PER_SECOND=0, OUTBOX_IN_PROCESS=False)
+class TestLoadMix(TestCase):
+
+    def setUp(self):
+        get_provider.cache_clear()
+        self.addCleanup(get_provider.cache_clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = patch.object(shared_cache, 'path', os.path.join(directory.name, 'upstream_cache.sqlite3'))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_every_endpoint_succeeds_without_faults(self):
+        data = seed(n_addresses=30, n_sources=3, utxos_per_source=2)
+        durations, errors, wall = drive(data, requests=60, concurrency=1)
+        self.assertEqual(sum(len(values) for values in durations.values()), 60)
+        self.assertEqual(errors, dict.fromkeys(durations, 0))
+
+        rows = report(durations, errors, wall, concurrency=1)
+        self.assertEqual(rows[-1]["endpoint"], "all")
+        self.assertEqual(rows[-1]["requests"], 60)
+        for row in rows:
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+            self.assertLessEqual(row["p95_ms"], row["p99_ms"])
@@ -0,0 +1,114 @@
+import asyncio
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest.mock import patch
+from blockcypher.api import RateLimitError
+from ..metrics import (BACKGROUND, Histogram, RequestScope, StackSampler, _scope, request_latency, requests_total,
+                       slow_request_report, upstream_errors, upstream_latency)
+from ..providers import FakeProvider, GuardedProvider
+from ..throttle import Throttled, TokenBucket, low_priority
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+
+
+class TestHistogram(SimpleTestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Test.', ('view',), buckets=(0.1, 1, float('inf')))
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(('a',), value)
+        counts, total, count = histogram.snapshot()[('a',)]
+        self.assertEqual(counts, [1, 3, 4])
+        self.assertEqual(count, 4)
+        self.assertAlmostEqual(total, 4.25)
+        rendered = '\n'.join(histogram.render())
+        self.assertIn('test_seconds_bucket{view="a",le="1.0"} 3', rendered)
+        self.assertIn('test_seconds_bucket{view="a",le="+Inf"} 4', rendered)
+        self.assertIn('test_seconds_count{view="a"} 4', rendered)
+
+
+class TestUpstreamTiming(SimpleTestCase):
+
+    def setUp(self):
+        self.provider = GuardedProvider(FakeProvider(fixtures=''), TokenBucket(0, 1))
+
+    def count(self, view, operation):
+        return upstream_latency.snapshot().get((view, operation), ([], 0, 0))[2]
+
+    def test_calls_are_attributed_to_the_request_view(self):
+        scope = RequestScope()
+        scope.view = 'test_view'
+        token = _scope.set(scope)
+        try:
+            before = self.count('test_view', 'get_unspent')
+            self.provider.get_unspent(ADDRESS)
+            asyncio.run(self.provider.aget_unspent(ADDRESS))
+        finally:
+            _scope.reset(token)
+        self.assertEqual(self.count('test_view', 'get_unspent'), before + 2)
+        self.assertEqual([operation for operation, _, _ in scope.upstream], ['get_unspent', 'get_unspent'])
+
+    def test_calls_outside_requests_are_background(self):
+        before = self.count(BACKGROUND, 'get_fee_rates')
+        self.provider.get_fee_rates()
+        self.assertEqual(self.count(BACKGROUND, 'get_fee_rates'), before + 1)
+
+    def test_errors_are_counted_by_kind(self):
+        errors = upstream_errors.snapshot()
+        with patch.object(self.provider.inner, 'get_fee', side_effect=RateLimitError('Status Code 429', '')):
+            with self.assertRaises(RateLimitError):
+                self.provider.get_fee()
+        limited = GuardedProvider(FakeProvider(fixtures=''), TokenBucket(1, 1, reserve=1))
+        with low_priority(), self.assertRaises(Throttled):
+            limited.get_fee()
+        after = upstream_errors.snapshot()
+        for kind in ('rate_limited', 'throttled'):
+            key = (BACKGROUND, 'get_fee', kind)
+            self.assertEqual(after.get(key, 0), errors.get(key, 0) + 1)
+
+
+class TestSlowRequestReport(SimpleTestCase):
+
+    def test_sampler_records_the_request_stack(self):
+        sampler = StackSampler(interval=60)
+        scope = RequestScope()
+        scope.view = 'send_testnet_bitcoin'
+        scope.upstream = [('get_fee_rates', 0.01, None), ('get_unspent', 1.5, None)]
+        sampler.register(scope)
+        try:
+            sampler.sample()
+        finally:
+            sampler.unregister()
+        self.assertIn('test_sampler_records_the_request_stack', next(iter(scope.samples)))
+
+        request = type('Request', (), {'method': 'POST', 'path': '/send_bitcoin/'})
+        report = slow_request_report(request, scope, 1.6)
+        self.assertIn('upstream: 1.510s in 2 calls', report)
+        self.assertIn('get_unspent 1.500s', report)
+        self.assertIn('100% ', report)
+
+
+class TestMetricsMiddleware(TestCase):
+
+    def test_requests_are_recorded_per_view(self):
+        key = ('fee_rates', 'GET', '200')
+        before = requests_total.snapshot().get(key, 0)
+        with patch('myapp.views.fee_service.rates', return_value={"fast": 3, "normal": 2, "economy": 1}):
+            self.client.get("/api/fees/", secure=True)
+        self.assertEqual(requests_total.snapshot()[key], before + 1)
+        self.assertIn(('fee_rates', 'GET'), request_latency.snapshot())
+
+    @override_settings(METRICS_PROFILE_SLOW_REQUESTS=True, METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_are_reported(self):
+        with patch('myapp.metrics.print') as report:
+            self.client.get("/api/upstream-stats/", secure=True)
+        self.assertIn('view upstream_stats', report.call_args[0][0])
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/upstream-stats/", secure=True)
+        response = self.client.get("/metrics/", secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{view="upstream_stats",method="GET",status="200"}', body)
+        self.assertIn('upstream_events_total{event="calls"}', body)
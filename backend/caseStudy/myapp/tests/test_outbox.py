@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.core.signals import request_started
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest.mock import Mock, patch
+from blockcypher.api import RateLimitError
+from .. import outbox
+from ..models import OutboxTransaction
+from ..providers import FakeProvider
+
+# One input with a (dummy) scriptSig, so it passes the signed-transaction check
+SIGNED_TX = ("0100000001" + "11" * 32 + "00000000" + "0100" + "ffffffff" + "01" + "e803000000000000" + "00"
+             + "00000000")
+TXID = "ab" * 32
+
+
+@override_settings(OUTBOX_IN_PROCESS=False)
+class TestOutbox(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        patcher = patch.object(outbox, 'get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tracker = patch.object(outbox, 'track_confirmations')
+        self.track_confirmations = tracker.start()
+        self.addCleanup(tracker.stop)
+
+    def test_enqueue_is_idempotent_by_txid(self):
+        first = outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        second = outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(OutboxTransaction.objects.count(), 1)
+
+    def test_due_transactions_are_sent(self):
+        outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        self.assertEqual(outbox.process_due(), 1)
+        item = OutboxTransaction.objects.get(txid=TXID)
+        self.assertEqual((item.status, item.attempts), (OutboxTransaction.SENT, 1))
+        self.assertEqual([tx["hex"] for tx in self.provider.transactions.values()], [SIGNED_TX])
+
+    def test_transient_failures_back_off(self):
+        outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        with patch.object(self.provider, 'pushtx', side_effect=RateLimitError("slow down")):
+            outbox.process_due()
+        item = OutboxTransaction.objects.get(txid=TXID)
+        self.assertEqual((item.status, item.attempts), (OutboxTransaction.PENDING, 1))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        self.assertIsNone(outbox.claim())
+
+    def test_permanent_failures_and_duplicates(self):
+        rejected = Exception("bad")
+        rejected.response = Mock(status_code=400, text="Error validating transaction: script failed")
+        self.assertEqual(outbox.classify_error(rejected), outbox.PERMANENT)
+        known = Exception("dup")
+        known.response = Mock(status_code=400, text="Transaction with hash %s already exists." % TXID)
+        self.assertEqual(outbox.classify_error(known, TXID), outbox.DUPLICATE)
+        self.assertEqual(outbox.classify_error(known, "cd" * 32), outbox.PERMANENT)
+        in_mempool = Exception("dup")
+        in_mempool.response = Mock(status_code=400, text="258: txn-already-in-mempool")
+        self.assertEqual(outbox.classify_error(in_mempool, TXID), outbox.DUPLICATE)
+        for reason in ("Output %s:0 has already been spent." % ("11" * 32), "258: txn-mempool-conflict"):
+            conflict = Exception("conflict")
+            conflict.response = Mock(status_code=400, text=reason)
+            self.assertEqual(outbox.classify_error(conflict, TXID), outbox.PERMANENT)
+
+        outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        with patch.object(self.provider, 'pushtx', side_effect=rejected):
+            outbox.process_due()
+        self.assertEqual(OutboxTransaction.objects.get(txid=TXID).status, OutboxTransaction.FAILED)
+
+    def test_failed_broadcasts_are_untracked_and_requeued_on_resubmission(self):
+        rejected = Exception("bad")
+        rejected.response = Mock(status_code=400, text="Error validating transaction: script failed")
+        outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        self.track_confirmations.assert_not_called()
+        with patch.object(self.provider, 'pushtx', side_effect=rejected), \
+                patch.object(outbox, 'confirmation_tracker') as tracker:
+            outbox.process_due()
+        tracker.untrack.assert_called_once_with(TXID)
+        self.assertFalse(outbox.is_queued(TXID))
+
+        item = outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        self.assertEqual((item.status, item.attempts), (OutboxTransaction.PENDING, 0))
+        self.assertEqual(outbox.process_due(), 1)
+        self.track_confirmations.assert_called_once_with(TXID)
+
+    def test_workers_start_on_first_request(self):
+        self.addCleanup(request_started.connect, outbox.start_workers)
+        with patch.object(outbox.outbox_workers, 'ensure_started') as ensure_started:
+            self.client.get("/metrics/", secure=True)
+            ensure_started.assert_not_called()
+            with override_settings(OUTBOX_IN_PROCESS=True):
+                self.client.get("/metrics/", secure=True)
+                self.client.get("/metrics/", secure=True)
+        ensure_started.assert_called_once_with()
+
+    def test_expired_lease_is_reclaimed(self):
+        outbox.enqueue_broadcast(TXID, SIGNED_TX)
+        self.assertIsNotNone(outbox.claim())
+        self.assertIsNone(outbox.claim())
+        later = timezone.now() + timedelta(seconds=61)
+        self.assertIsNotNone(outbox.claim(now=later))
+
+    def test_endpoint_returns_once_queued(self):
+        with patch.object(self.provider, 'pushtx') as pushtx:
+            response = self.client.post("/broadcast_bitcoin/", {"signed_tx": SIGNED_TX},
+                                        content_type="application/json", secure=True)
+        pushtx.assert_not_called()
+        body = response.json()
+        self.assertEqual(body["broadcast_status"], OutboxTransaction.PENDING)
+        status = self.client.get("/broadcast_bitcoin/status/%s/" % body["tx_details"], secure=True)
+        self.assertEqual(status.json()["status"], OutboxTransaction.PENDING)
@@ -0,0 +1,83 @@
+import base64
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+from bit.network.meta import Unspent
+from .test_psbt import read_maps
+from ..payouts import Payment, parse_recipients
+from ..providers import FakeProvider
+from ..txparser import parse_transaction
+from ..shared_cache import shared_cache
+from ..utxo_cache import utxo_cache
+
+SEGWIT = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+RECIPIENTS = ["mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe", "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi",
+              "mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn"]
+
+
+class TestParseRecipients(TestCase):
+
+    def test_every_bad_entry_is_reported(self):
+        payments, errors = parse_recipients([
+            {"to_address": RECIPIENTS[0], "amount": "0.001"},
+            {"to_address": "not-an-address", "amount": "0.001"},
+            {"to_address": RECIPIENTS[1], "amount": "lots"},
+            {"to_address": RECIPIENTS[1], "amount": "0.000001"},
+            "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe",
+        ], "btc-testnet")
+        self.assertEqual(payments, [Payment(RECIPIENTS[0], 100000)])
+        self.assertEqual([(error["index"], error["message"]) for error in errors], [
+            (1, "Invalid address"), (2, "Invalid amount"), (3, "Amount below dust threshold"), (4, "Expected an object")])
+
+
+class TestSendBatch(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        self.provider.unspent[SEGWIT] = [Unspent(30000, 1, '', '%02x' % i * 32, 0) for i in range(1, 7)]
+        utxo_cache.clear()
+        patches = [patch('myapp.utils.get_provider', return_value=self.provider),
+                   patch.object(shared_cache, 'path', ''),
+                   patch('myapp.utxo_cache.get_provider', return_value=self.provider),
+                   patch('myapp.views.fee_service.rate', return_value=2)]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, **data):
+        recipients = [{"to_address": address, "amount": "0.0002"} for address in RECIPIENTS]
+        return self.client.post("/send_bitcoin/batch/", {"from_address": SEGWIT, "recipients": recipients, **data},
+                                content_type="application/json", secure=True)
+
+    def transactions(self, response):
+        body = response.json()
+        self.assertEqual(body["status"], "success")
+        return [parse_transaction(read_maps(base64.b64decode(tx["psbt"]))[0][b'\x00']) for tx in body["message"]]
+
+    def test_one_transaction_with_an_output_per_recipient(self):
+        with patch.object(self.provider, 'get_address_unspent',
+                          wraps=self.provider.get_address_unspent) as fetch:
+            response = self.send()
+        fetch.assert_called_once()
+        [tx] = self.transactions(response)
+        self.assertEqual(tx.n_outputs, 4)
+        self.assertEqual([output["amount"] for output in response.json()["message"][0]["outputs"]], [20000] * 3)
+
+    @override_settings(PAYOUT_MAX_OUTPUTS=1)
+    def test_split_transactions_spend_disjoint_outputs(self):
+        transactions = self.transactions(self.send(mode="split"))
+        self.assertEqual(len(transactions), 3)
+        spent = [(txin.txid, txin.vout) for tx in transactions for txin in tx.inputs]
+        self.assertEqual(len(spent), len(set(spent)))
+
+    def test_invalid_recipients_are_listed(self):
+        response = self.client.post("/send_bitcoin/batch/", {
+            "from_address": SEGWIT, "recipients": [{"to_address": RECIPIENTS[0], "amount": "0.0002"},
+                                                   {"to_address": "nope", "amount": "0.0002"}]},
+            content_type="application/json", secure=True)
+        self.assertEqual(response.json()["errors"], [{"index": 1, "message": "Invalid address"}])
+
+    def test_batch_larger_than_the_balance(self):
+        recipients = [{"to_address": RECIPIENTS[0], "amount": "0.001"}] * 3
+        response = self.client.post("/send_bitcoin/batch/", {"from_address": SEGWIT, "recipients": recipients},
+                                    content_type="application/json", secure=True)
+        self.assertEqual(response.json()["message"], "Insufficient balance")
@@ -0,0 +1,100 @@
+import json
+import tempfile
+from django.test import SimpleTestCase
+from unittest.mock import Mock
+from blockcypher.api import RateLimitError
+from ..providers import BlockCypherProvider, FakeProvider
+
+SIGNED_TX = ("0100000001" + "11" * 32 + "00000000" + "00" + "ffffffff" + "01" + "e803000000000000" + "00"
+             + "00000000")
+
+
+class TestFakeProvider(SimpleTestCase):
+
+    def setUp(self):
+        fixtures = {
+            "unspent": {"mSource": [{"amount": 5000, "txid": "aa" * 32, "txindex": 0},
+                                    {"amount": 7000, "txid": "bb" * 32, "txindex": 1}]},
+            "transactions": {"aa" * 32: {"hex": "00", "confirmations": 3}},
+            "fee": 4,
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(fixtures, f)
+        self.provider = FakeProvider(fixtures=f.name)
+
+    def test_balance_is_derived_from_unspent(self):
+        self.assertEqual(self.provider.get_address_details("mSource")["final_balance"], 12000)
+        self.assertEqual(self.provider.get_address_details("mUnknown")["final_balance"], 0)
+
+    def test_unspent_and_raw_transactions(self):
+        self.assertEqual([utxo.amount for utxo in self.provider.get_unspent("mSource")], [5000, 7000])
+        self.assertEqual(self.provider.get_raw_transaction("aa" * 32), "00")
+        self.assertIsNone(self.provider.get_raw_transaction("cc" * 32))
+        self.assertEqual(self.provider.get_confirmations("aa" * 32), 3)
+        self.assertEqual(self.provider.get_fee(), 4)
+
+    def test_pushtx_records_transaction(self):
+        tx_hash = self.provider.pushtx(SIGNED_TX)
+        self.assertEqual(len(tx_hash), 64)
+        self.assertEqual(self.provider.get_raw_transaction(tx_hash), SIGNED_TX)
+        self.assertEqual(self.provider.get_confirmations(tx_hash), 0)
+
+
+class TestBlockCypherProvider(SimpleTestCase):
+
+    def setUp(self):
+        self.provider = BlockCypherProvider(coin_symbol="btc-testnet", api_key="token")
+        self.provider.session = Mock()
+
+    def test_requests_go_through_the_pooled_session(self):
+        self.provider.session.get.return_value = Mock(status_code=200, json=lambda: {"confirmations": 2})
+        self.assertEqual(self.provider.get_confirmations("aa" * 32), 2)
+        url = self.provider.session.get.call_args[0][0]
+        self.assertEqual(url, "https://api.blockcypher.com/v1/btc/test3/txs/" + "aa" * 32)
+        self.assertEqual(self.provider.session.get.call_args[1]["params"]["token"], "token")
+
+    def test_unspent_outputs(self):
+        details = {"final_balance": 900, "final_n_tx": 1,
+                   "txrefs": [{"tx_hash": "aa" * 32, "tx_output_n": 1, "value": 900, "confirmations": 5,
+                               "script": "76a9", "block_height": 10}]}
+        self.provider.session.get.return_value = Mock(status_code=200, json=lambda: details)
+        unspent = self.provider.get_unspent("mSource")
+        self.assertEqual((unspent[0].txid, unspent[0].txindex, unspent[0].amount), ("aa" * 32, 1, 900))
+        result = self.provider.get_address_unspent("mSource")
+        self.assertEqual((result["final_balance"], result["final_n_tx"], len(result["unspent"])), (900, 1, 1))
+        self.assertEqual(self.provider.session.get.call_count, 2)
+
+    def test_rate_limit(self):
+        self.provider.session.get.return_value = Mock(status_code=429, text="slow down")
+        with self.assertRaises(RateLimitError):
+            self.provider.get_fee()
+
+    def test_addresses_details_are_batched(self):
+        results = [{"address": "mA", "final_balance": 1}, {"address": "mB", "error": "not found"}]
+        self.provider.session.get.return_value = Mock(status_code=200, json=lambda: results)
+        details = self.provider.get_addresses_details(["mA", "mB"])
+        self.assertEqual(list(details), ["mA"])
+        url = self.provider.session.get.call_args[0][0]
+        self.assertEqual(url, "https://api.blockcypher.com/v1/btc/test3/addrs/mA;mB/balance")
+
+    def test_pages_split_inside_a_block_are_not_skipped(self):
+        def ref(txid, height):
+            return {"tx_hash": txid * 32, "tx_output_n": 0, "value": 100, "block_height": height}
+
+        pages = [{"final_balance": 300, "final_n_tx": 3, "hasMore": True, "txrefs": [ref("aa", 12), ref("bb", 11)]},
+                 {"final_balance": 300, "final_n_tx": 3, "txrefs": [ref("bb", 11), ref("cc", 11)]}]
+        self.provider.session.get.side_effect = [Mock(status_code=200, json=lambda page=page: page) for page in pages]
+        unspent = self.provider.get_unspent("mSource")
+        self.assertEqual([utxo.txid for utxo in unspent], ["aa" * 32, "bb" * 32, "cc" * 32])
+        self.assertEqual(self.provider.session.get.call_args[1]["params"]["before"], 12)
+
+    def test_history_steps_past_a_block_larger_than_a_page(self):
+        page = {"hasMore": True, "txrefs": [{"tx_hash": "aa" * 32, "tx_output_n": 0, "block_height": 11}]}
+        last = {"txrefs": [{"tx_hash": "bb" * 32, "tx_input_n": 0, "tx_output_n": -1, "block_height": 10}]}
+        self.provider.session.get.side_effect = [Mock(status_code=200, json=lambda body=body: body)
+                                                 for body in (page, page, last)]
+        txrefs = self.provider.get_txrefs("mSource")["txrefs"]
+        self.assertEqual([ref["tx_hash"] for ref in txrefs], ["aa" * 32, "bb" * 32])
+        befores = [call[1]["params"]["before"] for call in self.provider.session.get.call_args_list[1:]]
+        self.assertEqual(befores, [12, 11])
+
@@ -0,0 +1,113 @@
+import base64
+import gzip
+from django.test import TestCase
+from unittest.mock import patch
+from bit.network.meta import Unspent
+from ..addresses import script_pubkey
+from ..coin_selection import CoinSelection
+from ..providers import FakeProvider
+from ..psbt import build_psbt, is_segwit_script
+from ..txparser import parse_transaction
+from ..shared_cache import shared_cache
+from ..utxo_cache import utxo_cache
+
+LEGACY = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+SEGWIT = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+PREV_TX = ("0100000001" + "11" * 32 + "00000000" + "0100" + "ffffffff" + "01" + "50c3000000000000" + "00"
+           + "00000000")
+
+
+def read_varint(buf, i):
+    if buf[i] < 0xfd:
+        return buf[i], i + 1
+    size = {0xfd: 2, 0xfe: 4, 0xff: 8}[buf[i]]
+    return int.from_bytes(buf[i + 1:i + 1 + size], 'little'), i + 1 + size
+
+
+def read_maps(psbt):
+    """
+    Split a serialized PSBT into its key-value maps.
+    """
+    assert psbt[:5] == b'psbt\xff'
+    maps, current, i = [], {}, 5
+    while i < len(psbt):
+        key_len, i = read_varint(psbt, i)
+        if key_len == 0:
+            maps.append(current)
+            current = {}
+            continue
+        key, i = psbt[i:i + key_len], i + key_len
+        value_len, i = read_varint(psbt, i)
+        current[key], i = psbt[i:i + value_len], i + value_len
+    return maps
+
+
+class TestPsbt(TestCase):
+
+    def setUp(self):
+        self.selected = [Unspent(50000, 1, '', 'aa' * 32, 0), Unspent(20000, 1, '', 'bb' * 32, 3)]
+        self.selection = CoinSelection([0, 1], 70000, 1000, 9000, 'bnb')
+
+    def test_script_pubkeys(self):
+        self.assertEqual(script_pubkey(LEGACY, "btc-testnet")[:3], b'\x76\xa9\x14')
+        self.assertTrue(is_segwit_script(script_pubkey(SEGWIT, "btc-testnet")))
+        self.assertFalse(is_segwit_script(script_pubkey(LEGACY, "btc-testnet")))
+
+    def test_segwit_inputs_carry_only_the_spent_output(self):
+        psbt = build_psbt(self.selected, self.selection, SEGWIT, DESTINATION, 60000, "btc-testnet")
+        global_map, first, second, *outputs = read_maps(psbt)
+        tx = parse_transaction(global_map[b'\x00'])
+        self.assertEqual([(txin.txid, txin.vout) for txin in tx.inputs], [('aa' * 32, 0), ('bb' * 32, 3)])
+        self.assertEqual(tx.n_outputs, 2)
+        self.assertEqual(len(outputs), 2)
+        witness_utxo = first[b'\x01']
+        self.assertEqual(int.from_bytes(witness_utxo[:8], 'little'), 50000)
+        self.assertEqual(witness_utxo[9:], script_pubkey(SEGWIT, "btc-testnet"))
+
+    def test_legacy_inputs_carry_the_previous_transaction(self):
+        raw = {'aa' * 32: PREV_TX, 'bb' * 32: PREV_TX}
+        psbt = build_psbt(self.selected, self.selection, LEGACY, DESTINATION, 60000, "btc-testnet", raw)
+        maps = read_maps(psbt)
+        self.assertEqual(maps[1][b'\x00'].hex(), PREV_TX)
+
+    def test_no_change_output_when_there_is_no_change(self):
+        selection = self.selection._replace(change=0)
+        psbt = build_psbt(self.selected, selection, SEGWIT, DESTINATION, 60000, "btc-testnet")
+        self.assertEqual(parse_transaction(read_maps(psbt)[0][b'\x00']).n_outputs, 1)
+
+
+class TestSendPsbt(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        self.provider.unspent[SEGWIT] = [Unspent(50000, 1, '', 'aa' * 32, 0)]
+        utxo_cache.clear()
+        patches = [patch('myapp.utils.get_provider', return_value=self.provider),
+                   patch('myapp.utxo_cache.get_provider', return_value=self.provider),
+                   patch.object(shared_cache, 'path', ''),
+                   patch('myapp.views.fee_service.rates', return_value={"fast": 2, "normal": 2, "economy": 1})]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, **extra):
+        return self.client.post("/send_bitcoin/", {"from_address": SEGWIT, "to_address": DESTINATION,
+                                                   "amount": "0.0001", "format": "psbt"},
+                                content_type="application/json", secure=True, **extra)
+
+    def test_base64_psbt_without_previous_transactions(self):
+        with patch.object(self.provider, 'get_raw_transaction') as get_raw_transaction:
+            response = self.send()
+        get_raw_transaction.assert_not_called()
+        message = response.json()["message"]
+        self.assertEqual(base64.b64decode(message["psbt"])[:5], b'psbt\xff')
+        self.assertEqual(message["amount"], 10000)
+
+    @patch('myapp.compression.MIN_COMPRESS_SIZE', 0)
+    def test_binary_psbt_is_compressed_when_accepted(self):
+        response = self.send(HTTP_ACCEPT="application/octet-stream", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Type"], "application/octet-stream")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content)[:5], b'psbt\xff')
+        self.assertIn("Accept-Encoding", response["Vary"])
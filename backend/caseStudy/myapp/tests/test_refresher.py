@@ -0,0 +1,61 @@
+from datetime import timedelta
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch
+from .. import refresher
+from ..models import Address
+from ..providers import FakeProvider
+from ..throttle import Throttled
+from .test_search import make_address
+
+STALE = ["mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi", "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe", "mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn"]
+FRESH = "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"
+
+
+class TestRefresher(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        for i, address in enumerate(STALE):
+            self.provider.addresses[address] = dict(self.provider.get_address_details(address), final_balance=100 + i)
+            make_address(address)
+        make_address(FRESH)
+        self.now = timezone.now()
+        Address.objects.filter(address__in=STALE).update(refreshed_at=self.now - timedelta(hours=2))
+        patcher = patch.object(refresher, 'get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        refresher._retry_at.clear()
+        self.addCleanup(refresher._retry_at.clear)
+
+    def test_refreshes_only_stale_rows_in_batches(self):
+        with patch.object(self.provider, 'get_addresses_details',
+                          wraps=self.provider.get_addresses_details) as fetch:
+            refreshed, skipped, missing = refresher.refresh_stale_addresses(now=self.now, batch_size=2)
+        self.assertEqual((refreshed, skipped, missing), (3, 0, 0))
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(sorted(Address.objects.filter(address__in=STALE).values_list('final_balance', flat=True)),
+                         [100, 101, 102])
+        self.assertFalse(Address.objects.filter(refreshed_at__lt=self.now - timedelta(hours=1)).exists())
+
+    def test_per_cycle_limit(self):
+        refreshed, _, _ = refresher.refresh_stale_addresses(now=self.now, limit=1)
+        self.assertEqual(refreshed, 1)
+        self.assertEqual(Address.objects.filter(refreshed_at__lt=self.now - timedelta(hours=1)).count(), 2)
+
+    def test_shed_batches_stay_stale(self):
+        with patch.object(self.provider, 'get_addresses_details', side_effect=Throttled("budget")):
+            refreshed, skipped, missing = refresher.refresh_stale_addresses(now=self.now)
+        self.assertEqual((refreshed, skipped, missing), (0, 3, 0))
+        self.assertEqual(Address.objects.filter(refreshed_at__lt=self.now - timedelta(hours=1)).count(), 3)
+
+    def test_rows_upstream_did_not_return_stay_stale(self):
+        details = self.provider.get_addresses_details(STALE[1:])
+        with patch.object(self.provider, 'get_addresses_details', return_value=details):
+            self.assertEqual(refresher.refresh_stale_addresses(now=self.now), (2, 0, 1))
+        self.assertEqual(Address.objects.get(address=STALE[0]).refreshed_at, self.now - timedelta(hours=2))
+        # Backed off, so the next cycle moves on instead of asking again
+        self.assertEqual(refresher.refresh_stale_addresses(now=self.now), (0, 0, 0))
+        later = self.now + timedelta(seconds=settings.ADDRESS_REFRESH_RETRY + 1)
+        self.assertEqual(refresher.refresh_stale_addresses(now=later, limit=1)[0], 1)
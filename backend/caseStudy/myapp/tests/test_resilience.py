@@ -0,0 +1,214 @@
+import asyncio
+import json
+import requests
+from datetime import timedelta
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from unittest.mock import Mock, patch
+from ..models import Address
+from ..providers import FakeProvider, GuardedProvider
+from ..resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpen,
+    DeadlineExceeded,
+    breakers,
+    call_timeout,
+    deadline,
+    fail_fast,
+    remaining
+)
+from ..throttle import Throttled, TokenBucket
+from ..views import ADDRESS_REFRESH_OPERATIONS, address_details_cache
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+TX_HASH = "ab" * 32
+OTHER_ADDRESS = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+
+
+def http_error(status):
+    return requests.HTTPError(response=Mock(status_code=status))
+
+
+class TestCircuitBreaker(SimpleTestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+    def test_one_trial_call_after_the_reset_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_client_errors_and_local_throttling_are_not_failures(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_error(http_error(404))
+        breaker.record_error(Throttled('Upstream budget exhausted'))
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_error(http_error(503))
+        self.assertEqual(breaker.state, OPEN)
+
+
+class TestGuardedCalls(SimpleTestCase):
+
+    def setUp(self):
+        self.inner = FakeProvider(fixtures='')
+        self.breakers = CircuitBreakers(failure_threshold=2, reset_timeout=60)
+        self.provider = GuardedProvider(self.inner, TokenBucket(0, 0), breakers=self.breakers)
+
+    def test_open_circuit_fails_fast_per_operation(self):
+        with patch.object(self.inner, 'get_confirmations', side_effect=requests.ConnectionError('down')) as call:
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    self.provider.get_confirmations(TX_HASH)
+            with self.assertRaises(CircuitOpen):
+                self.provider.get_confirmations(TX_HASH)
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(self.breakers.snapshot(), {'get_confirmations': OPEN})
+        self.assertEqual(self.provider.get_fee(), 10)
+
+    def test_spent_budget_makes_no_call(self):
+        with patch.object(self.inner, 'get_confirmations') as call, deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                self.provider.get_confirmations(TX_HASH)
+        call.assert_not_called()
+
+    def test_http_timeout_is_cut_to_the_budget(self):
+        self.assertEqual(call_timeout(10), 10)
+        with deadline(0.5):
+            self.assertLessEqual(call_timeout(10), 0.5)
+
+    def test_slow_async_call_is_abandoned_at_the_deadline(self):
+        async def slow(tx_hash):
+            await asyncio.sleep(5)
+
+        async def main():
+            with deadline(0.05):
+                return await self.provider.aget_confirmations(TX_HASH)
+
+        with patch.object(self.inner, 'aget_confirmations', slow):
+            with self.assertRaises(DeadlineExceeded):
+                asyncio.run(main())
+        self.assertEqual(self.breakers.get('get_confirmations').failures, 1)
+
+
+class TestFailFast(SimpleTestCase):
+
+    def test_wraps_sync_and_async_views_alike(self):
+        @fail_fast
+        def view(request):
+            raise Throttled('Upstream budget exhausted')
+
+        @fail_fast
+        async def aview(request):
+            raise CircuitOpen('Upstream circuit is open')
+
+        self.assertEqual(json.loads(view(None).content)["message"], "API rate limit exceeded. Please try again later.")
+        self.assertTrue(asyncio.iscoroutinefunction(aview))
+        self.assertEqual(json.loads(asyncio.run(aview(None)).content)["message"],
+                         "Chain provider unavailable. Please try again later.")
+
+    def test_other_errors_propagate(self):
+        @fail_fast
+        def view(request):
+            raise ValueError("bug")
+
+        with self.assertRaises(ValueError):
+            view(None)
+
+
+class TestDegradedViews(TestCase):
+
+    def setUp(self):
+        address_details_cache.entries.clear()
+        Address.objects.create(address=ADDRESS, total_received=5, total_sent=0, balance=5, unconfirmed_balance=0,
+                               final_balance=5, n_tx=1, unconfirmed_n_tx=0, final_n_tx=1)
+        self.addCleanup(breakers.reset)
+
+    def open_circuit(self):
+        for operation in ADDRESS_REFRESH_OPERATIONS:
+            breaker = breakers.get(operation)
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+
+    def test_list_is_flagged_stale_while_refreshes_fail_fast(self):
+        response = self.client.get("/path/to/get_addresses_endpoint/", secure=True)
+        self.assertFalse(response.json()["stale"])
+        etag = response["ETag"]
+        self.open_circuit()
+        response = self.client.get("/path/to/get_addresses_endpoint/", secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["stale"])
+        self.assertEqual(response.json()["results"][0]["address"], ADDRESS)
+        self.assertIn("Warning", response)
+
+    def test_old_details_are_flagged_stale(self):
+        Address.objects.filter(address=ADDRESS).update(refreshed_at=timezone.now() - timedelta(hours=1))
+        self.open_circuit()
+        with patch.object(address_details_cache, "revalidate"):
+            response = self.client.get("/api/path-to-details/%s/" % ADDRESS, secure=True)
+        self.assertTrue(response.json()["stale"])
+        self.assertEqual(response.json()["final_balance"], 5)
+
+    def test_fresh_details_are_not_flagged(self):
+        self.open_circuit()
+        self.assertNotIn("stale", self.client.get("/api/path-to-details/%s/" % ADDRESS, secure=True).json())
+
+    def test_view_budget_applies_to_upstream_calls(self):
+        budgets = []
+        provider = Mock()
+        provider.get_confirmations.side_effect = lambda tx_hash: budgets.append(remaining()) or 3
+        with patch('myapp.views.get_provider', return_value=provider):
+            response = self.client.post("/get_confirmations/", {"hash": TX_HASH},
+                                        content_type="application/json", secure=True)
+        self.assertEqual(response.json()["confirmations"], 3)
+        self.assertLessEqual(budgets[0], 3)
+
+    def test_open_circuit_answers_immediately(self):
+        provider = Mock()
+        provider.get_confirmations.side_effect = CircuitOpen('Upstream circuit is open')
+        with patch('myapp.views.get_provider', return_value=provider):
+            response = self.client.post("/get_confirmations/", {"hash": TX_HASH},
+                                        content_type="application/json", secure=True)
+        self.assertEqual(response.json()["message"], "Chain provider unavailable. Please try again later.")
+
+    def test_rate_limits_become_an_error_response(self):
+        payload = {"from_address": ADDRESS, "to_address": ADDRESS, "amount": 0.001}
+        with patch('myapp.views.fee_service') as fee_service, \
+                patch('myapp.views.get_source_balance', side_effect=Throttled('Upstream budget exhausted')):
+            fee_service.rates.return_value = {"fast": 20, "normal": 10, "economy": 2}
+            response = self.client.post("/send_bitcoin/", payload, content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "API rate limit exceeded. Please try again later.")
+
+    def test_upstream_errors_become_an_error_response(self):
+        payload = {"from_address": ADDRESS, "to_address": ADDRESS, "amount": 0.001}
+        with patch('myapp.views.fee_service') as fee_service, \
+                patch('myapp.views.get_source_balance', side_effect=requests.ConnectionError('reset')):
+            fee_service.rates.return_value = {"fast": 20, "normal": 10, "economy": 2}
+            response = self.client.post("/send_bitcoin/", payload, content_type="application/json", secure=True)
+        self.assertEqual(response.json()["message"], "Chain provider unavailable. Please try again later.")
+        with patch('myapp.views.fetch_new_data_for_address', side_effect=http_error(503)):
+            response = self.client.post("/path/to/create_address_endpoint/", {"address": OTHER_ADDRESS},
+                                        content_type="application/json", secure=True)
+        self.assertEqual(response.json()["message"], "Chain provider unavailable. Please try again later.")
+
@@ -0,0 +1,37 @@
+from django.test import TestCase
+from ..models import Address
+from ..search import address_index, search_addresses
+
+
+def make_address(address):
+    return Address.objects.create(address=address, total_received=0, total_sent=0, balance=0,
+                                  unconfirmed_balance=0, final_balance=0, n_tx=0, unconfirmed_n_tx=0,
+                                  final_n_tx=0)
+
+
+class TestAddressSearch(TestCase):
+
+    def setUp(self):
+        address_index.invalidate()
+        for address in ["mabc1", "mabc2", "mabc3", "mxyz1", "n1234"]:
+            make_address(address)
+
+    def test_prefix_matches_in_order(self):
+        addresses, next_cursor = search_addresses("mabc")
+        self.assertEqual(addresses, ["mabc1", "mabc2", "mabc3"])
+        self.assertIsNone(next_cursor)
+
+    def test_keyset_pagination(self):
+        first, cursor = search_addresses("m", limit=2)
+        self.assertEqual(first, ["mabc1", "mabc2"])
+        self.assertEqual(cursor, "mabc2")
+        second, cursor = search_addresses("m", after=cursor, limit=2)
+        self.assertEqual(second, ["mabc3", "mxyz1"])
+        self.assertIsNone(cursor)
+
+    def test_new_and_deleted_addresses_update_index(self):
+        search_addresses("")
+        make_address("mabc0")
+        Address.objects.get(address="mabc3").delete()
+        addresses, _ = search_addresses("mabc")
+        self.assertEqual(addresses, ["mabc0", "mabc1", "mabc2"])
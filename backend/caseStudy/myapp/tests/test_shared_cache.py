@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from django.test import SimpleTestCase
+from unittest.mock import Mock, patch
+from bit.network.meta import Unspent
+from ..shared_cache import ADDRESS_UNSPENT, HEX, JSON, SharedCache, shared_cache
+from ..utils import fetch_new_data_for_address, fetch_raw_transactions
+
+ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+SCRIPT = "76a914" + "11" * 20 + "88ac"
+
+
+class TestSharedCache(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'upstream_cache.sqlite3')
+        self.cache = SharedCache(self.path, max_bytes=1 << 20, lease_timeout=2)
+
+    def test_values_are_packed_per_kind(self):
+        value = {'final_balance': 70000, 'final_n_tx': 3,
+                 'unspent': [Unspent(50000, 2, SCRIPT, 'aa' * 32, 1), Unspent(20000, 0, '', 'bb' * 32, 0, 'p2wkh')]}
+        packed = ADDRESS_UNSPENT.pack(value)
+        unpacked = ADDRESS_UNSPENT.unpack(packed)
+        self.assertEqual(unpacked['final_n_tx'], 3)
+        self.assertEqual([utxo.to_dict() for utxo in unpacked['unspent']], [utxo.to_dict() for utxo in value['unspent']])
+        self.assertLess(len(packed), len(json.dumps([utxo.to_dict() for utxo in value['unspent']])) / 2)
+        self.assertEqual(HEX.unpack(HEX.pack('00ff')), '00ff')
+        self.assertEqual(JSON.unpack(JSON.pack({'a': [1, 2]})), {'a': [1, 2]})
+
+    def test_read_through_until_the_ttl(self):
+        fetch = Mock(return_value={'balance': 5})
+        self.assertEqual(self.cache.get_or_fetch('address:a', 60, fetch), {'balance': 5})
+        self.assertEqual(self.cache.get_or_fetch('address:a', 60, fetch), {'balance': 5})
+        self.assertEqual(fetch.call_count, 1)
+        self.cache.get_or_fetch('address:b', 0, fetch)
+        self.cache.get_or_fetch('address:b', 0, fetch)
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_missing_upstream_data_is_not_stored(self):
+        fetch = Mock(return_value=None)
+        self.cache.get_or_fetch('rawtx:a', 60, fetch, HEX)
+        self.cache.get_or_fetch('rawtx:a', 60, fetch, HEX)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_other_workers_wait_for_the_one_fetching(self):
+        other_worker = SharedCache(self.path, max_bytes=1 << 20, lease_timeout=2)
+        started = threading.Event()
+
+        def slow_fetch():
+            started.set()
+            time.sleep(0.1)
+            return {'balance': 7}
+
+        leader = threading.Thread(target=self.cache.get_or_fetch, args=('address:a', 60, slow_fetch))
+        leader.start()
+        started.wait(5)
+        follower_fetch = Mock(return_value={'balance': 0})
+        self.assertEqual(other_worker.get_or_fetch('address:a', 60, follower_fetch), {'balance': 7})
+        leader.join(5)
+        follower_fetch.assert_not_called()
+
+    def test_oldest_entries_go_past_the_size_limit(self):
+        cache = SharedCache(self.path, max_bytes=100, lease_timeout=2)
+        for i in range(5):
+            cache.set('rawtx:%d' % i, '00' * 40, 60, HEX)
+        cache.evict()
+        self.assertIsNone(cache.get('rawtx:0', HEX))
+        self.assertIsNone(cache.get('rawtx:2', HEX))
+        self.assertEqual(cache.get('rawtx:4', HEX), '00' * 40)
+
+    def test_disabled_without_a_path(self):
+        cache = SharedCache('', max_bytes=100, lease_timeout=2)
+        fetch = Mock(return_value={'balance': 5})
+        cache.get_or_fetch('address:a', 60, fetch)
+        cache.get_or_fetch('address:a', 60, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+
+class TestUtilsReadThrough(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.provider = Mock()
+        for patcher in (patch.object(shared_cache, 'path', os.path.join(directory.name, 'cache.sqlite3')),
+                        patch('myapp.utils.get_provider', return_value=self.provider)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_address_details_are_fetched_once_per_ttl(self):
+        self.provider.get_address_details.return_value = {'address': ADDRESS, 'balance': 5, 'txrefs': []}
+        self.assertEqual(fetch_new_data_for_address(ADDRESS), {'address': ADDRESS, 'balance': 5})
+        self.assertEqual(fetch_new_data_for_address(ADDRESS), {'address': ADDRESS, 'balance': 5})
+        self.provider.get_address_details.assert_called_once()
+
+    def test_raw_transactions_are_shared(self):
+        self.provider.get_raw_transaction.side_effect = lambda txid: 'ab' * 10
+        fetch_raw_transactions({'aa' * 32, 'bb' * 32})
+        self.assertEqual(fetch_raw_transactions({'aa' * 32}), {'aa' * 32: 'ab' * 10})
+        self.assertEqual(self.provider.get_raw_transaction.call_count, 2)
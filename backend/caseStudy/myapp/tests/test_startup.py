@@ -0,0 +1,49 @@
+import sys
+from django.test import SimpleTestCase
+from ..lazy import lazy_import, lazy_isinstance
+from ..startup import by_package, deferred_imports, parse_importtime, profile
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     myapp.lazy
+import time:       300 |        900 |   myapp.coin_selection
+import time:       480 |        480 |   django.utils
+import time:       200 |       1580 | myapp.utils
+"""
+
+
+class TestImportTime(SimpleTestCase):
+
+    def test_parse(self):
+        records = parse_importtime(IMPORTTIME.splitlines())
+        self.assertEqual([(r.module, r.self_us, r.cumulative_us, r.depth) for r in records], [
+            ('myapp.lazy', 120, 120, 2),
+            ('myapp.coin_selection', 300, 900, 1),
+            ('django.utils', 480, 480, 1),
+            ('myapp.utils', 200, 1580, 0),
+        ])
+
+    def test_by_package(self):
+        self.assertEqual(list(by_package(parse_importtime(IMPORTTIME.splitlines())).items()),
+                         [('myapp', (3, 620)), ('django', (1, 480))])
+
+    def test_deferred_imports(self):
+        self.assertEqual(deferred_imports(['django', 'numpy.core', 'bitcoin'], ('numpy', 'bit', 'bitcoin')),
+                         ['numpy', 'bitcoin'])
+
+
+class TestLazyImport(SimpleTestCase):
+
+    def test_imports_on_first_attribute(self):
+        sys.modules.pop('colorsys', None)
+        self.addCleanup(sys.modules.pop, 'colorsys', None)
+        module = lazy_import('colorsys')
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertFalse(lazy_isinstance(ValueError(), module, 'ValueError'))
+        self.assertEqual(module.rgb_to_hsv, sys.modules['colorsys'].rgb_to_hsv)
+
+    def test_cold_start_defers_chain_libraries(self):
+        result = profile(runs=1)
+        self.assertGreater(result.setup, 0)
+        self.assertEqual(deferred_imports(result.modules), [])
+        self.assertIn('myapp.views', result.modules)
@@ -0,0 +1,83 @@
+import gzip
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from ..static_assets import IMMUTABLE, REVALIDATE, AssetFinder, asset_finder, index_page, precompress, root_finder
+
+BUNDLE = b"console.log('hello');\n" * 200
+
+
+class TestStaticAssets(SimpleTestCase):
+
+    def setUp(self):
+        self.build = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build)
+        os.makedirs(os.path.join(self.build, 'static', 'js'))
+        self.bundle = os.path.join(self.build, 'static', 'js', 'main.dce1a395.js')
+        with open(self.bundle, 'wb') as f:
+            f.write(BUNDLE)
+        with open(os.path.join(self.build, 'manifest.json'), 'w') as f:
+            f.write('{"short_name": "React App"}')
+        for finder, roots in ((asset_finder, [os.path.join(self.build, 'static')]), (root_finder, [self.build])):
+            patcher = patch.object(finder, 'roots', roots)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        index_page.clear()
+        self.addCleanup(index_page.clear)
+
+    def test_hashed_file_is_immutable(self):
+        response = self.client.get('/static/js/main.dce1a395.js', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), BUNDLE)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertTrue(response['Content-Type'].endswith('javascript'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_precompressed_variant_when_accepted(self):
+        written = precompress(self.bundle)
+        self.assertIn(self.bundle + '.gz', written)
+        response = self.client.get('/static/js/main.dce1a395.js', HTTP_ACCEPT_ENCODING='gzip', secure=True)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), BUNDLE)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # Already up to date
+        self.assertEqual(precompress(self.bundle), [])
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/manifest.json', secure=True)
+        self.assertEqual(response['Cache-Control'], REVALIDATE)
+        response = self.client.get('/manifest.json', HTTP_IF_NONE_MATCH=response['ETag'], secure=True)
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_variant_is_ignored(self):
+        precompress(self.bundle)
+        stat = os.stat(self.bundle)
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(self.bundle + suffix):
+                os.utime(self.bundle + suffix, (stat.st_atime, stat.st_mtime - 10))
+        self.assertEqual(AssetFinder([os.path.join(self.build, 'static')]).find('js/main.dce1a395.js').variants, {})
+
+    def test_missing_and_traversal(self):
+        self.assertEqual(self.client.get('/static/js/missing.js', secure=True).status_code, 404)
+        self.assertIsNone(asset_finder.find('../manifest.json'))
+        self.assertEqual(self.client.post('/static/js/main.dce1a395.js', secure=True).status_code, 405)
+
+    def test_index_rendered_once_with_csrf_cookie(self):
+        with patch('myapp.static_assets.render_to_string', return_value='<html></html>') as render:
+            response = self.client.get('/', secure=True)
+            self.client.get('/wallet/some/route', secure=True)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'<html></html>')
+        self.assertEqual(response['Cache-Control'], REVALIDATE)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_index_compressed_and_revalidated(self):
+        response = self.client.get('/accounts', HTTP_ACCEPT_ENCODING='gzip', secure=True)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'<div id="root">', gzip.decompress(response.content))
+        response = self.client.get('/accounts', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'],
+                                   secure=True)
+        self.assertEqual(response.status_code, 304)
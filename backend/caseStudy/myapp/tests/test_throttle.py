@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from django.test import SimpleTestCase
+from ..providers import FakeProvider, GuardedProvider
+from ..throttle import HIGH, LOW, Counters, SingleFlight, Throttled, TokenBucket, low_priority
+
+
+class TestSingleFlight(SimpleTestCase):
+
+    def test_concurrent_calls_share_one_upstream_call(self):
+        counters = Counters()
+        flight = SingleFlight(counters)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def upstream():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", upstream)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("key", upstream))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while counters.snapshot().get("coalesced", 0) < 3:
+            pass
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["result"] * 4)
+
+    def test_async_calls_are_coalesced(self):
+        counters = Counters()
+        flight = SingleFlight(counters)
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def main():
+            return await asyncio.gather(*(flight.ado("key", upstream) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), [42] * 5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(counters.snapshot()["coalesced"], 4)
+
+
+class TestTokenBucket(SimpleTestCase):
+
+    def test_low_priority_is_shed_before_reserve(self):
+        counters = Counters()
+        bucket = TokenBucket(rate=0.001, capacity=3, reserve=2, counters=counters)
+        bucket.acquire(LOW)
+        with self.assertRaises(Throttled):
+            bucket.acquire(LOW)
+        bucket.acquire(HIGH)
+        bucket.acquire(HIGH)
+        self.assertEqual(counters.snapshot()["shed"], 1)
+
+    def test_high_priority_queues_for_a_token(self):
+        counters = Counters()
+        bucket = TokenBucket(rate=100, capacity=1, timeout=1, counters=counters)
+        bucket.acquire(HIGH)
+        bucket.acquire(HIGH)
+        self.assertEqual(counters.snapshot()["throttled"], 1)
+
+    def test_high_priority_gives_up_after_timeout(self):
+        bucket = TokenBucket(rate=0.001, capacity=1, timeout=0.01, counters=Counters())
+        bucket.acquire(HIGH)
+        with self.assertRaises(Throttled):
+            bucket.acquire(HIGH)
+
+
+class TestGuardedProvider(SimpleTestCase):
+
+    def test_background_calls_are_shed(self):
+        provider = GuardedProvider(FakeProvider(fixtures=''), TokenBucket(rate=0.001, capacity=1, reserve=1))
+        with low_priority():
+            with self.assertRaises(Throttled):
+                provider.get_fee()
+        self.assertEqual(provider.get_fee(), 10)
+
+    def test_requests_do_not_share_a_shed_background_call(self):
+        in_flight = threading.Event()
+        release = threading.Event()
+
+        class SlowToShedBucket(TokenBucket):
+            def acquire(self, priority, timeout=None):
+                if priority == LOW:
+                    in_flight.set()
+                    release.wait(5)
+                return super().acquire(priority, timeout)
+
+        provider = GuardedProvider(FakeProvider(fixtures=''), SlowToShedBucket(rate=0.001, capacity=1, reserve=1))
+        errors, results = [], []
+
+        def background():
+            with low_priority():
+                try:
+                    provider.get_fee()
+                except Throttled as e:
+                    errors.append(e)
+
+        shed = threading.Thread(target=background)
+        shed.start()
+        in_flight.wait(5)
+        request = threading.Thread(target=lambda: results.append(provider.get_fee()))
+        request.start()
+        request.join(5)
+        release.set()
+        shed.join(5)
+        self.assertEqual(results, [10])
+        self.assertEqual(len(errors), 1)
+
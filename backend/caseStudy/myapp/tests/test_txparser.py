@@ -0,0 +1,49 @@
+from bitcoin.core import CTransaction, b2lx
+from django.test import SimpleTestCase
+from ..benchmarks.tx_parser import synthetic_transaction
+from ..txparser import TxParseError, parse_transaction, parse_transactions
+
+GENESIS_COINBASE = (
+    "01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468"
+    "652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e642062"
+    "61696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a82"
+    "8e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000"
+)
+
+
+class TestTxParser(SimpleTestCase):
+
+    def test_genesis_coinbase_txid(self):
+        tx = parse_transaction(GENESIS_COINBASE, require_signatures=True)
+        self.assertEqual(tx.txid, "4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b")
+        self.assertEqual(tx.txid, tx.wtxid)
+        self.assertEqual(tx.n_outputs, 1)
+        self.assertFalse(tx.has_witness)
+
+    def test_matches_reference_implementation(self):
+        for segwit in (False, True):
+            raw = synthetic_transaction(3, 2, segwit=segwit)
+            reference = CTransaction.deserialize(bytes.fromhex(raw))
+            tx = parse_transaction(raw, require_signatures=True)
+            self.assertEqual(tx.txid, b2lx(reference.GetTxid()))
+            self.assertEqual(tx.wtxid, b2lx(reference.GetHash()))
+            self.assertEqual(tx.has_witness, segwit)
+            self.assertEqual([txin.txid for txin in tx.inputs], [b2lx(txin.prevout.hash) for txin in reference.vin])
+            self.assertLess(tx.vsize, tx.size) if segwit else self.assertEqual(tx.vsize, tx.size)
+
+    def test_rejects_malformed_transactions(self):
+        for raw in ["validTransaction", GENESIS_COINBASE[:-2], GENESIS_COINBASE + "00", "", 12345]:
+            with self.assertRaises(TxParseError):
+                parse_transaction(raw)
+
+    def test_requires_signatures(self):
+        outputs = GENESIS_COINBASE[GENESIS_COINBASE.index("0100f2052a"):]
+        unsigned = "01000000" + "01" + "00" * 32 + "ffffffff" + "00" + "ffffffff" + outputs
+        self.assertEqual(parse_transaction(unsigned).inputs[0].script_sig_size, 0)
+        with self.assertRaises(TxParseError):
+            parse_transaction(unsigned, require_signatures=True)
+
+    def test_batch_parsing_reports_errors_in_place(self):
+        results = list(parse_transactions([GENESIS_COINBASE, "00"]))
+        self.assertEqual(results[0].txid[:8], "4a5e1e4b")
+        self.assertIsInstance(results[1], TxParseError)
@@ -1,8 +1,6 @@
 from django.test import TestCase
-from unittest.mock import patch, Mock
-from ..views import (
+from ..utils import (
     validate_address,
-    first_fit_utxo_selection,
     is_valid_bitcoin_address,
     is_valid_bitcoin_address_format,
     is_valid_amount,
@@ -10,36 +8,30 @@ from ..views import (
     is_valid_tx_hash
 )
 
-# Mock data
-mock_unspent = [
-    Mock(amount=100),
-    Mock(amount=200),
-    Mock(amount=300),
-    Mock(amount=500)
-]
+TESTNET_ADDRESS = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+# One input with a (dummy) one-byte scriptSig, one output
+SIGNED_TX = ("0100000001" + "11" * 32 + "00000000" + "0100" + "ffffffff" + "01" + "e803000000000000" + "00"
+             + "00000000")
 
 
 class TestUtils(TestCase):
 
     def test_validate_address_valid(self):
-        with patch("blockcypher.utils.is_valid_address_for_coinsymbol", return_value=True):
-            self.assertTrue(validate_address("validAddress"))
+        self.assertTrue(validate_address(TESTNET_ADDRESS))
 
     def test_validate_address_invalid(self):
-        with patch("blockcypher.utils.is_valid_address_for_coinsymbol", return_value=False):
-            with self.assertRaises(AssertionError):
-                validate_address("invalidAddress")
-
-    def test_first_fit_utxo_selection(self):
-        result = first_fit_utxo_selection(mock_unspent, 500)
-        self.assertEqual(result.amount, 500)
+        self.assertFalse(validate_address("invalidAddress"))
 
     def test_is_valid_bitcoin_address(self):
-        with patch("blockcypher.utils.is_valid_address_for_coinsymbol", return_value=True):
-            self.assertTrue(is_valid_bitcoin_address("validAddress"))
+        self.assertTrue(is_valid_bitcoin_address(TESTNET_ADDRESS))
+        self.assertTrue(is_valid_bitcoin_address("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx"))
+
+    def test_is_valid_bitcoin_address_wrong_network(self):
+        self.assertFalse(is_valid_bitcoin_address("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"))
 
     def test_is_valid_bitcoin_address_format_valid(self):
         self.assertTrue(is_valid_bitcoin_address_format("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"))
+        self.assertTrue(is_valid_bitcoin_address_format("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4"))
 
     def test_is_valid_bitcoin_address_format_invalid(self):
         self.assertFalse(is_valid_bitcoin_address_format("invalidAddress"))
@@ -51,7 +43,10 @@ class TestUtils(TestCase):
         self.assertFalse(is_valid_amount("invalid"))
 
     def test_is_valid_signed_transaction_valid(self):
-        self.assertTrue(is_valid_signed_transaction("validTransaction"))
+        self.assertTrue(is_valid_signed_transaction(SIGNED_TX))
+
+    def test_is_valid_signed_transaction_invalid(self):
+        self.assertFalse(is_valid_signed_transaction("validTransaction"))
 
     def test_is_valid_tx_hash_valid(self):
         self.assertTrue(is_valid_tx_hash("a" * 64))
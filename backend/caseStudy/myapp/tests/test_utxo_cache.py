@@ -0,0 +1,118 @@
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+from bit.network.meta import Unspent
+from .. import outbox
+from ..benchmarks.tx_parser import synthetic_transaction
+from ..confirmations import confirmation_tracker
+from ..models import Address, OutboxTransaction
+from ..providers import FakeProvider
+from ..shared_cache import shared_cache
+from ..txparser import parse_transaction
+from ..utxo_cache import UtxoCache
+
+SOURCE = "mmyMVSKtu27ekKRE8pfVwhV1XNXEYvsCKi"
+DESTINATION = "mn6fTARqWbC3n6WRYheuURMsSb1cHCNNAe"
+# Spends output 0 of 'aa' * 32; one-byte (dummy) scriptSig
+SIGNED_TX = ("0100000001" + "aa" * 32 + "00000000" + "0100" + "ffffffff" + "01" + "e803000000000000" + "00"
+             + "00000000")
+
+
+class TestUtxoCache(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        self.provider.unspent[SOURCE] = [Unspent(60000, 1, '', 'aa' * 32, 0), Unspent(50000, 1, '', 'bb' * 32, 1)]
+        self.cache = UtxoCache(max_entries=100, ttl=300, pending_ttl=3600)
+        for patcher in (patch('myapp.utxo_cache.get_provider', return_value=self.provider),
+                        patch.object(shared_cache, 'path', '')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tip = patch.object(confirmation_tracker, 'tip', {'height': 1, 'hash': 'a'})
+        tip.start()
+        self.addCleanup(tip.stop)
+
+    def fetches(self, fn, *args):
+        with patch.object(self.provider, 'get_address_unspent', wraps=self.provider.get_address_unspent) as fetch:
+            fn(*args)
+        return fetch.call_count
+
+    def test_set_is_reused_until_a_new_block(self):
+        self.assertEqual(self.fetches(self.cache.available, SOURCE), 1)
+        self.assertEqual(self.fetches(self.cache.available, SOURCE), 0)
+        confirmation_tracker.tip = {'height': 2, 'hash': 'b'}
+        self.assertEqual(self.fetches(self.cache.available, SOURCE), 1)
+
+    def test_n_tx_change_refreshes(self):
+        self.cache.available(SOURCE)
+        Address.objects.create(address=SOURCE, total_received=0, total_sent=0, balance=0, unconfirmed_balance=0,
+                               final_balance=0, n_tx=2, unconfirmed_n_tx=0, final_n_tx=2)
+        self.assertEqual(self.fetches(self.cache.available, SOURCE), 0)
+        Address.objects.filter(address=SOURCE).update(final_n_tx=3)
+        self.assertEqual(self.fetches(self.cache.available, SOURCE), 1)
+
+    def test_held_outputs_are_not_selectable(self):
+        self.cache.hold([('aa' * 32, 0)], 'cc' * 32)
+        self.assertEqual([utxo.txid for utxo in self.cache.available(SOURCE)], ['bb' * 32])
+        self.cache.release('cc' * 32)
+        self.assertEqual(len(self.cache.available(SOURCE)), 2)
+
+    def test_hold_ends_once_upstream_drops_the_output(self):
+        self.cache.available(SOURCE)
+        self.cache.hold([('aa' * 32, 0)], 'cc' * 32)
+        # Still listed upstream (not propagated yet): stays held across refreshes
+        confirmation_tracker.tip = {'height': 2, 'hash': 'b'}
+        self.assertEqual(len(self.cache.available(SOURCE)), 1)
+        self.provider.unspent[SOURCE] = self.provider.unspent[SOURCE][1:] + [Unspent(9000, 0, '', 'cc' * 32, 1)]
+        confirmation_tracker.tip = {'height': 3, 'hash': 'c'}
+        self.assertEqual(sorted(utxo.txid for utxo in self.cache.available(SOURCE)), ['bb' * 32, 'cc' * 32])
+        self.assertEqual(self.cache._pending, {})
+
+    def test_least_recently_used_sets_are_dropped(self):
+        cache = UtxoCache(max_entries=1, ttl=300, pending_ttl=3600)
+        cache.available(SOURCE)
+        cache.available(DESTINATION)
+        self.assertEqual(list(cache._entries), [DESTINATION])
+
+
+@override_settings(OUTBOX_IN_PROCESS=False)
+class TestBroadcastHolds(TestCase):
+
+    def setUp(self):
+        self.provider = FakeProvider(fixtures='')
+        self.provider.unspent[SOURCE] = [Unspent(60000, 1, '', 'aa' * 32, 0), Unspent(50000, 1, '', 'bb' * 32, 1)]
+        self.cache = UtxoCache(max_entries=100, ttl=300, pending_ttl=3600)
+        for target in ('myapp.utxo_cache.get_provider', 'myapp.outbox.get_provider', 'myapp.utils.get_provider'):
+            patcher = patch(target, return_value=self.provider)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in (patch.object(outbox, 'utxo_cache', self.cache), patch.object(shared_cache, 'path', ''),
+                        patch.object(outbox, 'track_confirmations')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_queued_broadcast_holds_its_inputs_until_it_fails(self):
+        item = outbox.enqueue_broadcast("dd" * 32, SIGNED_TX)
+        self.assertEqual([utxo.txid for utxo in self.cache.available(SOURCE)], ['bb' * 32])
+
+        with patch.object(self.provider, 'pushtx', side_effect=ValueError("bad")), \
+                override_settings(OUTBOX_MAX_ATTEMPTS=1):
+            self.assertEqual(outbox.broadcast(outbox.claim()), OutboxTransaction.FAILED)
+        self.assertEqual(item.txid, "dd" * 32)
+        self.assertEqual(len(self.cache.available(SOURCE)), 2)
+
+    def test_send_uses_one_upstream_call(self):
+        # The legacy inputs need their previous transactions, so fund the source from real ones
+        raw = synthetic_transaction(1, 2)
+        txid = parse_transaction(raw).txid
+        self.provider.transactions[txid] = {'hex': raw, 'confirmations': 1}
+        self.provider.unspent[SOURCE] = [Unspent(100000, 1, '', txid, 0)]
+        with patch('myapp.utils.utxo_cache', self.cache), \
+                patch('myapp.views.fee_service.rates', return_value={"fast": 2, "normal": 2, "economy": 1}), \
+                patch.object(self.provider, 'get_address_unspent',
+                             wraps=self.provider.get_address_unspent) as fetch:
+            response = self.client.post("/send_bitcoin/", {"from_address": SOURCE, "to_address": DESTINATION,
+                                                           "amount": "0.0001", "format": "psbt"},
+                                        content_type="application/json", secure=True)
+        self.assertEqual(response.json()["status"], "success")
+        # Balance check and coin selection share one fetch
+        self.assertEqual(fetch.call_count, 1)
@@ -0,0 +1,194 @@
+"""
+Request coalescing and rate limiting for upstream chain calls.
+
+SingleFlight makes identical in-flight calls share one upstream request, and TokenBucket keeps the
+remaining calls under the provider's quota. Both feed the counters in ``upstream_stats``.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+HIGH = 'high'
+LOW = 'low'
+
+_priority = ContextVar('upstream_priority', default=HIGH)
+
+
+@contextmanager
+def low_priority():
+    """
+    Mark upstream calls made inside the block as sheddable (background refreshes, polling).
+    """
+    token = _priority.set(LOW)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class Throttled(Exception):
+    """
+    Raised instead of calling upstream when the local budget is exhausted. Handled like
+    blockcypher's RateLimitError, which it no longer subclasses so that importing this module
+    does not import blockcypher.
+    """
+    pass
+
+
+class Counters:
+
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(names, 0)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+upstream_stats = Counters('calls', 'coalesced', 'throttled', 'shed')
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same key wait for
+    the leader and share its result (or exception).
+    """
+
+    def __init__(self, counters=upstream_stats):
+        self.counters = counters
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self.counters.incr('coalesced')
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, coro_fn):
+        # Futures belong to one event loop, so in-flight calls are tracked per loop
+        calls = self._async_calls.setdefault(asyncio.get_running_loop(), {})
+        future = calls.get(key)
+        if future is not None:
+            self.counters.incr('coalesced')
+            return await asyncio.shield(future)
+
+        future = calls[key] = asyncio.ensure_future(coro_fn())
+        try:
+            # Shielded so a cancelled leader does not cancel the call for everyone waiting on it
+            return await asyncio.shield(future)
+        finally:
+            if calls.get(key) is future:
+                del calls[key]
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` calls per second with bursts of up to ``capacity``.
+
+    High-priority callers queue for up to ``timeout`` seconds (or less, when the caller passes its own). Low-priority callers never wait and
+    may not take the last ``reserve`` tokens, so background work is shed before the quota is reached.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, capacity, reserve=0, timeout=5, counters=upstream_stats):
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = reserve
+        self.timeout = timeout
+        self.counters = counters
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, priority):
+        """
+        Take a token and return 0, or return the number of seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            floor = self.reserve if priority == LOW else 0
+            if self._tokens - 1 >= floor:
+                self._tokens -= 1
+                return 0
+            return (floor + 1 - self._tokens) / self.rate
+
+    def _wait_time(self, priority, deadline):
+        if not self.rate:
+            return 0
+        wait = self._take(priority)
+        if wait == 0:
+            return 0
+        if priority == LOW:
+            self.counters.incr('shed')
+            raise Throttled('Upstream budget reserved for interactive requests')
+        if time.monotonic() + wait > deadline:
+            self.counters.incr('shed')
+            raise Throttled('Upstream budget exhausted')
+        return wait
+
+    def acquire(self, priority=HIGH, timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else min(self.timeout, timeout))
+        throttled = False
+        while True:
+            wait = self._wait_time(priority, deadline)
+            if wait == 0:
+                break
+            throttled = True
+            time.sleep(wait)
+        if throttled:
+            self.counters.incr('throttled')
+
+    async def aacquire(self, priority=HIGH, timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else min(self.timeout, timeout))
+        throttled = False
+        while True:
+            wait = self._wait_time(priority, deadline)
+            if wait == 0:
+                break
+            throttled = True
+            await asyncio.sleep(wait)
+        if throttled:
+            self.counters.incr('throttled')
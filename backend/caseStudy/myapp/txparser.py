@@ -0,0 +1,173 @@
+"""
+Single-pass parser for serialized Bitcoin transactions.
+
+Parsing walks a memoryview of the raw bytes once, validating the structure as it goes, and hashes
+the right byte ranges in place to get the txid (legacy serialization, witness stripped) and the
+wtxid (full serialization). Nothing is copied, so large batches and whole blocks parse cheaply.
+"""
+import hashlib
+from collections import namedtuple
+
+ParsedTransaction = namedtuple('ParsedTransaction', [
+    'txid', 'wtxid', 'version', 'inputs', 'n_outputs', 'locktime', 'has_witness', 'size', 'vsize',
+])
+
+# Outpoint spent by an input; ``txid`` is in the usual display (big-endian) hex
+TxInput = namedtuple('TxInput', ['txid', 'vout', 'script_sig_size', 'witness_items'])
+
+TxOutput = namedtuple('TxOutput', ['value', 'script'])
+
+MAX_MONEY = 21000000 * 100000000
+
+
+class TxParseError(ValueError):
+    pass
+
+
+def _read_varint(buf, offset):
+    if offset >= len(buf):
+        raise TxParseError("Unexpected end of transaction")
+    prefix = buf[offset]
+    if prefix < 0xfd:
+        return prefix, offset + 1
+    size = {0xfd: 2, 0xfe: 4, 0xff: 8}[prefix]
+    end = offset + 1 + size
+    if end > len(buf):
+        raise TxParseError("Unexpected end of transaction")
+    return int.from_bytes(buf[offset + 1:end], 'little'), end
+
+
+def _skip(buf, offset, size):
+    end = offset + size
+    if end > len(buf):
+        raise TxParseError("Unexpected end of transaction")
+    return end
+
+
+def _double_sha256(*chunks):
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk)
+    return hashlib.sha256(h.digest()).digest()
+
+
+def parse_transaction_at(buf, offset=0, outputs=None):
+    """
+    Parse one transaction starting at ``offset`` of a memoryview and return (ParsedTransaction, end offset).
+    When ``outputs`` is a list, the transaction's outputs are appended to it as TxOutput tuples.
+    """
+    start = offset
+    version_end = _skip(buf, offset, 4)
+    version = int.from_bytes(buf[offset:version_end], 'little')
+    offset = version_end
+
+    has_witness = offset + 1 < len(buf) and buf[offset] == 0 and buf[offset + 1] == 1
+    if has_witness:
+        offset += 2
+    body_start = offset
+
+    n_inputs, offset = _read_varint(buf, offset)
+    if n_inputs == 0:
+        raise TxParseError("Transaction has no inputs")
+    # Every input is at least 41 bytes, which bounds the count before we allocate anything
+    if n_inputs * 41 > len(buf) - offset:
+        raise TxParseError("Input count exceeds transaction size")
+    inputs = []
+    for _ in range(n_inputs):
+        outpoint_end = _skip(buf, offset, 36)
+        prev_txid = bytes(buf[offset:offset + 32])[::-1].hex()
+        vout = int.from_bytes(buf[offset + 32:outpoint_end], 'little')
+        script_size, offset = _read_varint(buf, outpoint_end)
+        offset = _skip(buf, offset, script_size + 4)
+        inputs.append((prev_txid, vout, script_size))
+
+    n_outputs, offset = _read_varint(buf, offset)
+    if n_outputs == 0:
+        raise TxParseError("Transaction has no outputs")
+    if n_outputs * 9 > len(buf) - offset:
+        raise TxParseError("Output count exceeds transaction size")
+    total = 0
+    for _ in range(n_outputs):
+        value_end = _skip(buf, offset, 8)
+        value = int.from_bytes(buf[offset:value_end], 'little')
+        total += value
+        if value > MAX_MONEY or total > MAX_MONEY:
+            raise TxParseError("Output value out of range")
+        script_size, script_start = _read_varint(buf, value_end)
+        offset = _skip(buf, script_start, script_size)
+        if outputs is not None:
+            outputs.append(TxOutput(value, buf[script_start:offset]))
+    body_end = offset
+
+    witness_items = [0] * n_inputs
+    if has_witness:
+        for i in range(n_inputs):
+            n_items, offset = _read_varint(buf, offset)
+            witness_items[i] = n_items
+            for _ in range(n_items):
+                item_size, offset = _read_varint(buf, offset)
+                offset = _skip(buf, offset, item_size)
+        if not any(witness_items):
+            raise TxParseError("Witness flag set but no witness data")
+
+    locktime_end = _skip(buf, offset, 4)
+    locktime = int.from_bytes(buf[offset:locktime_end], 'little')
+
+    wtxid = _double_sha256(buf[start:locktime_end])
+    if has_witness:
+        txid = _double_sha256(buf[start:start + 4], buf[body_start:body_end], buf[offset:locktime_end])
+        stripped_size = 4 + (body_end - body_start) + 4
+    else:
+        txid = wtxid
+        stripped_size = locktime_end - start
+    size = locktime_end - start
+    weight = stripped_size * 3 + size
+
+    parsed = ParsedTransaction(
+        txid=txid[::-1].hex(),
+        wtxid=wtxid[::-1].hex(),
+        version=version,
+        inputs=[TxInput(prev_txid, vout, script_size, witness_items[i])
+                for i, (prev_txid, vout, script_size) in enumerate(inputs)],
+        n_outputs=n_outputs,
+        locktime=locktime,
+        has_witness=has_witness,
+        size=size,
+        vsize=(weight + 3) // 4,
+    )
+    return parsed, locktime_end
+
+
+def parse_transaction(raw, require_signatures=False):
+    """
+    Parse a complete serialized transaction given as hex, bytes, bytearray or memoryview.
+    With ``require_signatures``, every input must carry a scriptSig or witness data.
+    Raises TxParseError on any structural problem.
+    """
+    if isinstance(raw, str):
+        try:
+            raw = bytes.fromhex(raw)
+        except ValueError as e:
+            raise TxParseError("Transaction is not valid hex") from e
+    if not isinstance(raw, (bytes, bytearray, memoryview)):
+        raise TxParseError("Transaction must be hex or bytes")
+    buf = memoryview(raw)
+    parsed, end = parse_transaction_at(buf)
+    if end != len(buf):
+        raise TxParseError("Trailing data after transaction")
+    if require_signatures:
+        for txin in parsed.inputs:
+            if txin.script_sig_size == 0 and txin.witness_items == 0:
+                raise TxParseError("Input %s:%d is not signed" % (txin.txid, txin.vout))
+    return parsed
+
+
+def parse_transactions(raws, require_signatures=False):
+    """
+    Parse many transactions; yields a ParsedTransaction, or the TxParseError, for each one in order.
+    """
+    for raw in raws:
+        try:
+            yield parse_transaction(raw, require_signatures=require_signatures)
+        except TxParseError as e:
+            yield e
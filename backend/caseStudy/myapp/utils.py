@@ -1,73 +1,136 @@
 import re
-import blockcypher
-from bit.network import NetworkAPI
-from bitcoin.core import CTransaction, ValidationError
 from decouple import config
-from bitcoin import deserialize
+from django.conf import settings
 
+from .addresses import is_valid_address, normalize_address
+from .models import Address
+from .coin_selection import np, select_coins
+from .providers import get_provider
+from .psbt import build_psbt, needs_previous_transactions, psbt_to_base64
+from .txparser import TxParseError, parse_transaction
+from .shared_cache import HEX, shared_cache
+from .utxo_cache import utxo_cache
 
-def get_txid_from_signed_transaction(signed_hex):
-    tx_data = deserialize(signed_hex)
+ADDRESS_FIELDS = {field.name for field in Address._meta.concrete_fields} - {'id', 'created_at', 'refreshed_at'}
+
+
+def parse_signed_transaction(signed_hex):
+    """
+    Parse and validate a signed transaction in one pass; returns a ParsedTransaction or None when invalid.
+    """
     try:
-        tx_id = tx_data['ins'][0]['outpoint']['hash']
-    except Exception as e:
+        return parse_transaction(signed_hex, require_signatures=True)
+    except TxParseError as e:
         print(e)
+        return None
+
+
+def get_txid_from_signed_transaction(signed_hex):
+    tx = parse_signed_transaction(signed_hex)
+    if tx is None:
         raise KeyError("There is something wrong with the signed transaction")
-    return tx_id
+    return tx.txid
 
 
 def validate_address(address):
-    try:
-        return blockcypher.utils.is_valid_address_for_coinsymbol(address, coin_symbol=config('COIN_SYMBOL'))
-    except AssertionError as e:
-        print(e)
-        raise AssertionError("Invalid")
+    return is_valid_address(address, config('COIN_SYMBOL'))
 
 
-def first_fit_utxo_selection(unspent, required_amount):
-    """
-    This function implements the First Fit algorithm for UTXO selection.
-    It selects UTXOs sequentially until the required amount is reached or exceeded.
-    """
-    total_input = 0
-    selected_utxo = None
+def canonical_address(address):
+    return normalize_address(address, config('COIN_SYMBOL'))
 
-    for utxo in unspent:
-        total_input += utxo.amount
-        if total_input >= required_amount:
-            selected_utxo = utxo
-            break
 
-    return selected_utxo
+def select_unspent(unspent, amount_in_satoshis, fee_rate, n_outputs=1):
+    """
+    Run coin selection over a list of bit Unspent outputs and return (selected outputs, CoinSelection).
+    ``amount_in_satoshis`` is the total paid to ``n_outputs`` outputs (change not included).
+    """
+    amounts = np.fromiter((utxo.amount for utxo in unspent), dtype=np.int64, count=len(unspent))
+    input_sizes = np.fromiter((utxo.vsize for utxo in unspent), dtype=np.int64, count=len(unspent))
+    selection = select_coins(amounts, amount_in_satoshis, fee_rate, n_outputs=n_outputs, input_sizes=input_sizes)
+    return [unspent[i] for i in selection.indices], selection
+
+
+def unsigned_transaction_payload(selected, selection, raw_transactions, source_address, to_address,
+                                 amount_in_satoshis):
+    return {
+        "inputs": [{"txid": utxo.txid, "output_n": utxo.txindex, "tx_hex": raw_transactions[utxo.txid]}
+                   for utxo in selected],
+        "to_address": to_address,
+        "amount": amount_in_satoshis,
+        "change_address": source_address,
+        "change": selection.change,
+        "fee": selection.fee,
+    }
+
+
+def fetch_raw_transactions(txids):
+    """
+    ``{txid: hex}``, read through the cache shared by all workers (transactions never change).
+    """
+    provider = get_provider()
+    return {txid: shared_cache.get_or_fetch('rawtx:%s' % txid, settings.SHARED_CACHE_RAW_TX_TTL,
+                                            lambda: provider.get_raw_transaction(txid), HEX)
+            for txid in txids}
 
 
-def generate_unsigned_transaction(source_address, amount_in_btc, to_address):
-    unspent = NetworkAPI.get_unspent_testnet(source_address)
-    amount_in_satoshis = int(amount_in_btc * 100000000)  # 1 BTC = 100,000,000 satoshis
-    tx_input = first_fit_utxo_selection(unspent, amount_in_satoshis)
-    tx_id = tx_input.txid
-    tx_output_n = tx_input.txindex
+def generate_unsigned_transaction(source_address, amount_in_btc, to_address, fee_rate):
+    """
+    Select inputs for the payment and return everything the client needs to sign it.
+    Change goes back to the source address.
+    """
+    unspent = utxo_cache.available(source_address)
+    amount_in_satoshis = to_satoshis(amount_in_btc)
+    selected, selection = select_unspent(unspent, amount_in_satoshis, fee_rate)
+    raw_transactions = fetch_raw_transactions({utxo.txid for utxo in selected})
+    return unsigned_transaction_payload(selected, selection, raw_transactions, source_address, to_address,
+                                        amount_in_satoshis)
 
-    tx_hex = (NetworkAPI.get_transaction_by_id_testnet(tx_input.txid))
 
-    return tx_id, tx_output_n, tx_hex, to_address, amount_in_satoshis
+def generate_unsigned_psbt(source_address, amount_in_btc, to_address, fee_rate):
+    """
+    Select inputs like generate_unsigned_transaction, but return (PSBT bytes, CoinSelection).
+    Previous transactions are only downloaded when the source address is not segwit.
+    """
+    unspent = utxo_cache.available(source_address)
+    amount_in_satoshis = to_satoshis(amount_in_btc)
+    selected, selection = select_unspent(unspent, amount_in_satoshis, fee_rate)
+    raw_transactions = None
+    if needs_previous_transactions(source_address, config('COIN_SYMBOL')):
+        raw_transactions = fetch_raw_transactions({utxo.txid for utxo in selected})
+    psbt = build_psbt(selected, selection, source_address, to_address, amount_in_satoshis, config('COIN_SYMBOL'),
+                      raw_transactions)
+    return psbt, selection
+
+
+def psbt_payload(psbt, selection, source_address, to_address, amount_in_satoshis):
+    return {
+        "psbt": psbt_to_base64(psbt),
+        "to_address": to_address,
+        "amount": amount_in_satoshis,
+        "change_address": source_address,
+        "change": selection.change,
+        "fee": selection.fee,
+    }
 
 
 def is_valid_bitcoin_address(address):
-    if not is_valid_bitcoin_address_format(address) or not blockcypher.utils.is_valid_address_for_coinsymbol(address,
-                                                                                                             coin_symbol=config(
-                                                                                                                 'COIN_SYMBOL')):
-        return False
-    return True
+    return is_valid_address(address, config('COIN_SYMBOL'))
 
 
 def is_valid_bitcoin_address_format(address):
-    pattern = re.compile(r"^[123mn][a-km-zA-HJ-NP-Z1-9]{25,34}$")
-    if pattern.match(address):
+    # Shape only (base58 or bech32 characters); is_valid_bitcoin_address also checks checksum and network
+    pattern = re.compile(r"^([123mn][a-km-zA-HJ-NP-Z1-9]{25,34}|(?i:(bc|tb|bcy)1[ac-hj-np-z02-9]{11,71}))$")
+    if isinstance(address, str) and pattern.match(address):
         return True
     return False
 
 
+def to_satoshis(amount_in_btc):
+    # Rounded, since e.g. 0.29 * 100000000 is 28999999.999999996 in floating point
+    return int(round(amount_in_btc * 100000000))  # 1 BTC = 100,000,000 satoshis
+
+
 def is_valid_amount(amount):
     try:
         sanitized_amount = float(amount)
@@ -78,30 +141,25 @@ def is_valid_amount(amount):
 
 
 def get_source_balance(source_address):
-    return blockcypher.get_address_details(source_address, coin_symbol=config('COIN_SYMBOL'))['final_balance']
+    # The same cached set coin selection uses, minus outputs held for queued broadcasts
+    return sum(utxo.amount for utxo in utxo_cache.available(source_address))
 
 
 def is_valid_signed_transaction(hex_signed_transaction):
-    try:
-        tx = CTransaction.deserialize(bytes.fromhex(hex_signed_transaction))
-
-        if len(tx.vin) == 0:
-            return False
+    return parse_signed_transaction(hex_signed_transaction) is not None
 
-        for txin in tx.vin:
-            if len(txin.scriptSig) == 0:
-                return False
 
-        return True
-    except (ValidationError, ValueError) as e:
-        print(e)
-        return False
+def address_fields(address_details):
+    """
+    The Address model fields out of an upstream address summary (drops txrefs, paging flags, ...).
+    """
+    return {key: val for key, val in address_details.items() if key in ADDRESS_FIELDS}
 
 
 def fetch_new_data_for_address(bookId):
-    address_details = blockcypher.get_address_details(address=bookId, coin_symbol=config('COIN_SYMBOL'))
-    address_fields = {key: val for key, val in address_details.items() if key not in ['txrefs', 'unconfirmed_txrefs']}
-    return address_fields
+    # Shared by all workers, so a popular address costs one upstream call per TTL, not one per worker
+    return shared_cache.get_or_fetch('address:%s' % bookId, settings.SHARED_CACHE_ADDRESS_TTL,
+                                     lambda: address_fields(get_provider().get_address_details(bookId)))
 
 
 def is_valid_tx_hash(tx_hash):
@@ -0,0 +1,164 @@
+"""
+Per-address UTXO sets shared by the send flow's balance check and coin selection.
+
+A set is fetched with one upstream call (``get_address_unspent``) and reused until a new block
+arrives (seen by the confirmation tracker), the address's stored ``final_n_tx`` moves, or
+UTXO_CACHE_TTL passes. Outputs spent by a transaction we queued for broadcast are held as pending
+and never offered to coin selection again, until an upstream refresh no longer lists them or the
+broadcast fails. Pending holds are per process.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .confirmations import confirmation_tracker
+from .models import Address
+from .providers import get_provider
+from .shared_cache import ADDRESS_UNSPENT, shared_cache
+
+
+class UtxoSet:
+    __slots__ = ('address', 'outputs', 'n_tx', 'tip_hash', 'fetched_at')
+
+    def __init__(self, address, outputs, n_tx, tip_hash, fetched_at):
+        self.address = address
+        self.outputs = outputs
+        self.n_tx = n_tx
+        self.tip_hash = tip_hash
+        self.fetched_at = fetched_at
+
+
+class Hold:
+    __slots__ = ('txid', 'expires')
+
+    def __init__(self, txid, expires):
+        self.txid = txid
+        self.expires = expires
+
+
+def _tip_hash():
+    tip = confirmation_tracker.tip
+    return tip['hash'] if tip is not None else None
+
+
+def _shared_key(address, tip_hash, n_tx):
+    # A new block or a new stored n_tx is a new key, so other workers' older copies are never used
+    return 'unspent:%s:%s:%s' % (address, tip_hash, n_tx)
+
+
+def _outpoint(utxo):
+    return utxo.txid, utxo.txindex
+
+
+class UtxoCache:
+
+    def __init__(self, max_entries, ttl, pending_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, address):
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is not None:
+                self._entries.move_to_end(address)
+            return entry
+
+    def _fresh(self, entry, stored_n_tx):
+        if entry is None or time.monotonic() - entry.fetched_at > self.ttl:
+            return False
+        tip_hash = _tip_hash()
+        if tip_hash is not None and tip_hash != entry.tip_hash:
+            return False
+        return stored_n_tx is None or stored_n_tx == entry.n_tx
+
+    def _store(self, address, result, tip_hash):
+        entry = UtxoSet(address, result['unspent'], result['final_n_tx'], tip_hash, time.monotonic())
+        listed = {_outpoint(utxo) for utxo in entry.outputs}
+        with self._lock:
+            previous = self._entries.get(address)
+            if previous is not None:
+                # Holds on outputs upstream no longer lists have done their job
+                for outpoint in {_outpoint(utxo) for utxo in previous.outputs} - listed:
+                    self._pending.pop(outpoint, None)
+            self._entries[address] = entry
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, address):
+        """
+        The UtxoSet for ``address``, fetched upstream when missing or stale.
+        """
+        entry = self._lookup(address)
+        stored_n_tx = Address.objects.filter(address=address).values_list('final_n_tx', flat=True).first()
+        if self._fresh(entry, stored_n_tx):
+            return entry
+        tip_hash = _tip_hash()
+        result = shared_cache.get_or_fetch(_shared_key(address, tip_hash, stored_n_tx),
+                                           settings.SHARED_CACHE_UNSPENT_TTL,
+                                           lambda: get_provider().get_address_unspent(address), ADDRESS_UNSPENT)
+        return self._store(address, result, tip_hash)
+
+    async def aget(self, address):
+        entry = self._lookup(address)
+        stored_n_tx = await Address.objects.filter(address=address).values_list('final_n_tx', flat=True).afirst()
+        if self._fresh(entry, stored_n_tx):
+            return entry
+        tip_hash = _tip_hash()
+        result = await shared_cache.aget_or_fetch(_shared_key(address, tip_hash, stored_n_tx),
+                                                  settings.SHARED_CACHE_UNSPENT_TTL,
+                                                  lambda: get_provider().aget_address_unspent(address),
+                                                  ADDRESS_UNSPENT)
+        return self._store(address, result, tip_hash)
+
+    def _available(self, entry):
+        now = time.monotonic()
+        with self._lock:
+            for outpoint in [outpoint for outpoint, hold in self._pending.items() if hold.expires <= now]:
+                del self._pending[outpoint]
+            return [utxo for utxo in entry.outputs if _outpoint(utxo) not in self._pending]
+
+    def available(self, address):
+        """
+        Unspent outputs of ``address`` that no queued broadcast is spending.
+        """
+        return self._available(self.get(address))
+
+    async def aavailable(self, address):
+        return self._available(await self.aget(address))
+
+    def hold(self, outpoints, txid):
+        """
+        Keep ``outpoints`` (txid, vout) out of coin selection while ``txid`` is being broadcast.
+        """
+        expires = time.monotonic() + self.pending_ttl
+        with self._lock:
+            for outpoint in outpoints:
+                self._pending[outpoint] = Hold(txid, expires)
+
+    def release(self, txid):
+        """
+        Make the outputs held for ``txid`` selectable again (its broadcast failed).
+        """
+        with self._lock:
+            for outpoint in [outpoint for outpoint, hold in self._pending.items() if hold.txid == txid]:
+                del self._pending[outpoint]
+
+    def invalidate(self, address):
+        with self._lock:
+            self._entries.pop(address, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+
+utxo_cache = UtxoCache(settings.UTXO_CACHE_SIZE, settings.UTXO_CACHE_TTL, settings.UTXO_PENDING_TTL)
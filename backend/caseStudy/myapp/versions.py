@@ -0,0 +1,39 @@
+"""
+Per-table version counters used as cheap validators for list responses.
+
+Row-level saves and deletes bump the counter through signals; bulk writes, which skip signals,
+call ``bump_table_version`` themselves.
+"""
+import hashlib
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import quote_etag
+
+from .models import Address, TableVersion
+
+ADDRESSES = 'addresses'
+
+
+def bump_table_version(name):
+    if not TableVersion.objects.filter(name=name).update(version=F('version') + 1):
+        TableVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def table_version(name):
+    return TableVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def table_etag(name, variant=''):
+    """
+    ETag for a response built from table ``name``; ``variant`` distinguishes pages and formats.
+    """
+    digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+    return quote_etag('%s-%d-%s' % (name, table_version(name), digest))
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def _bump_addresses_version(sender, **kwargs):
+    bump_table_version(ADDRESSES)
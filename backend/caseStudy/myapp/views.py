@@ -1,22 +1,69 @@
-import blockcypher.api
-
-from .utils import *
-from .models import Address
+from .addresses import validate_addresses as validate_address_batch
+from .bulk_import import import_addresses as bulk_import_addresses
+from .models import Address, OutboxTransaction
 from .serializers import AddressSerializer
+from .address_list import address_page, export_addresses
+from .cache import StaleWhileRevalidateCache, entry_headers, make_entry
+from .coin_selection import InsufficientFunds
+from .compression import accepts_binary, compressed_json_response, compressed_response
+from .confirmations import confirmation_events, confirmation_tracker, track_confirmations
+from .fees import TIERS as FEE_TIERS, estimate_fee, fee_service
+from .history import history_page, unconfirmed_txrefs
+from .lazy import lazy_import
+from .metrics import render_prometheus
+from .outbox import enqueue_broadcast, is_queued
+from .payouts import MODES as PAYOUT_MODES, build_payouts, parse_recipients
+from .psbt import psbt_to_base64
+from .providers import get_provider
+from .resilience import RATE_LIMITED, UPSTREAM_UNAVAILABLE, UpstreamUnavailable, breakers, fail_fast
+from .search import search_addresses as search_address_index
+from .static_assets import REVALIDATE, asset_finder, asset_response, best_encoding, index_page, root_finder
+from .throttle import Throttled, low_priority, upstream_stats
+from .utils import (
+    address_fields,
+    canonical_address,
+    fetch_new_data_for_address,
+    generate_unsigned_psbt,
+    generate_unsigned_transaction,
+    get_source_balance,
+    is_valid_amount,
+    is_valid_bitcoin_address,
+    is_valid_tx_hash,
+    parse_signed_transaction,
+    psbt_payload,
+    to_satoshis,
+    validate_address,
+)
+from .versions import ADDRESSES, table_etag
 
-from datetime import timedelta, datetime
+from datetime import datetime
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST, require_safe
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from caseStudy import settings
 import json
-from bit.network import get_fee
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+blockcypher_api = lazy_import('blockcypher.api')
+
+EXPORT_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Upstream operations that keep stored address data fresh (details refresh, background refresher)
+ADDRESS_REFRESH_OPERATIONS = ('get_address_details', 'get_addresses_details')
+
+STALE_WARNING = '110 - "Response is Stale"'
+
 
 @require_POST
+@fail_fast
 def get_transaction_data(request):
     data = json.loads(request.body)
     source_address = (data.get('from_address'))
@@ -28,16 +75,83 @@ def get_transaction_data(request):
     if not is_valid_bitcoin_address(to_address) or not is_valid_bitcoin_address(source_address):
         return JsonResponse({"status": "error", "message": "Invalid input type"})
 
+    fee_tier = data.get('fee_tier') or settings.FEE_DEFAULT_TIER
+    if fee_tier not in FEE_TIERS:
+        return JsonResponse({"status": "error", "message": "Invalid fee tier"})
+
+    # Cached rates, refreshed in the background; no upstream fee call here
+    fee_rates = fee_service.rates()
+    fee_rate = fee_rates[fee_tier]
+
     balance = get_source_balance(source_address)
 
-    # Ensure you have enough balance in the fetched UTXOs
-    total_utxo_balance = balance
-    if total_utxo_balance + get_fee() < amount:
+    # Everything in satoshis; the cheapest possible spend has one input and one output,
+    # coin selection does the exact check
+    if balance < to_satoshis(amount) + estimate_fee(1, 1, fee_tier, fee_rates):
+        return JsonResponse({"status": "error", "message": "Insufficient balance"})
+
+    # format=psbt returns a BIP174 PSBT (base64 in JSON, or raw with Accept: application/octet-stream)
+    # instead of the previous transactions' full hex
+    try:
+        if data.get('format') == 'psbt':
+            psbt, selection = generate_unsigned_psbt(source_address, amount, to_address, fee_rate)
+        else:
+            psbt, hsh = None, generate_unsigned_transaction(source_address, amount, to_address, fee_rate)
+    except InsufficientFunds as e:
+        print(e)
         return JsonResponse({"status": "error", "message": "Insufficient balance"})
 
-    hsh = generate_unsigned_transaction(source_address, amount, to_address)
+    if psbt is None:
+        return compressed_json_response(request, {"status": "success", 'message': hsh})
+    if accepts_binary(request):
+        return compressed_response(request, psbt, 'application/octet-stream')
+    return compressed_json_response(request, {"status": "success", 'message': psbt_payload(
+        psbt, selection, source_address, to_address, to_satoshis(amount))})
+
 
-    return JsonResponse({"status": "success", 'message': hsh})
+@require_POST
+@fail_fast
+def send_batch(request):
+    """
+    Unsigned PSBTs paying every recipient from one source address.
+    mode=single builds one transaction with an output per recipient; mode=split builds
+    transactions of at most PAYOUT_MAX_OUTPUTS recipients that spend disjoint outputs.
+    """
+    data = json.loads(request.body)
+    source_address = data.get('from_address')
+    recipients = data.get('recipients')
+    if not is_valid_bitcoin_address(source_address):
+        return JsonResponse({"status": "error", "message": "Invalid input type"})
+    if not isinstance(recipients, list) or not recipients:
+        return JsonResponse({"status": "error", "message": "Expected a list of recipients"})
+    if len(recipients) > settings.PAYOUT_BATCH_LIMIT:
+        return JsonResponse({"status": "error",
+                             "message": "At most %d recipients per request" % settings.PAYOUT_BATCH_LIMIT})
+
+    mode = data.get('mode') or 'single'
+    if mode not in PAYOUT_MODES:
+        return JsonResponse({"status": "error", "message": "Invalid mode"})
+    fee_tier = data.get('fee_tier') or settings.FEE_DEFAULT_TIER
+    if fee_tier not in FEE_TIERS:
+        return JsonResponse({"status": "error", "message": "Invalid fee tier"})
+
+    payments, errors = parse_recipients(recipients, settings.COIN_SYMBOL)
+    if errors:
+        return JsonResponse({"status": "error", "message": "Invalid recipients", "errors": errors})
+
+    try:
+        payouts = build_payouts(source_address, payments, fee_service.rate(fee_tier), mode)
+    except InsufficientFunds as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": "Insufficient balance"})
+
+    return compressed_json_response(request, {"status": "success", "message": [{
+        "psbt": psbt_to_base64(payout.psbt),
+        "outputs": [{"to_address": payment.address, "amount": payment.amount} for payment in payout.payments],
+        "change_address": source_address,
+        "change": payout.selection.change,
+        "fee": payout.selection.fee,
+    } for payout in payouts]})
 
 
 @require_POST
@@ -51,23 +165,38 @@ def broadcast_signed_transaction(request):
         print("Missing signed transaction data")
         return JsonResponse({"status": "error", "message": "Missing signed transaction data"})
 
-    if not is_valid_signed_transaction(signed_tx):
+    tx = parse_signed_transaction(signed_tx)
+    if tx is None:
         print("Invalid signed transaction")
         return JsonResponse({"status": "error", "message": "Invalid signed transaction"})
 
     try:
-        # Broadcast the signed transaction to the network
-        if not blockcypher.pushtx(signed_tx, coin_symbol=config('COIN_SYMBOL'),
-                                  api_key=settings.BLOCKCYPHER_API_KEY):
-            print("Error broadcasting the transaction")
-            return JsonResponse({"status": "error", "message": "Error broadcasting the transaction"})
-        hash = get_txid_from_signed_transaction(signed_tx)
-        return JsonResponse({"status": "success", "tx_details": hash})
+        # Queued durably; an outbox worker pushes it to the network and retries on failure
+        item = enqueue_broadcast(tx.txid, signed_tx)
+        return JsonResponse({"status": "success", "tx_details": item.txid, "broadcast_status": item.status})
     except Exception as e:
         print(e)
         return JsonResponse({"status": "error", "message": "Error broadcasting the transaction"})
 
 
+@api_view(['GET'])
+@fail_fast
+def get_fee_rates(request):
+    fee_rates = fee_service.rates()
+    return Response({**fee_rates, "default": settings.FEE_DEFAULT_TIER, "updated_at": fee_service.updated_at})
+
+
+@api_view(['GET'])
+def get_broadcast_status(request, tx_hash):
+    try:
+        item = OutboxTransaction.objects.get(txid=tx_hash)
+    except OutboxTransaction.DoesNotExist as e:
+        print(e)
+        return Response({"error": "Transaction not found"}, status=404)
+    return Response({"txid": item.txid, "status": item.status, "attempts": item.attempts,
+                     "last_error": item.last_error, "sent_at": item.sent_at})
+
+
 @require_POST
 def get_confirmations(request):
     data = json.loads(request.body)
@@ -80,66 +209,269 @@ def get_confirmations(request):
         return JsonResponse({"status": "error", "message": "Invalid transaction hash"})
 
     try:
-        confirmations = blockcypher.get_num_confirmations(tx_hash, coin_symbol=config('COIN_SYMBOL'))
-        print(confirmations)
+        confirmations = confirmation_tracker.confirmations(tx_hash)
+        if confirmations is None:
+            confirmations = get_provider().get_confirmations(tx_hash)
+            if confirmations < 1:
+                track_confirmations(tx_hash)
         return JsonResponse({"status": "success", "confirmations": confirmations})
 
-    except blockcypher.api.RateLimitError:
-        return JsonResponse({"status": "error", "message": "API rate limit exceeded. Please try again later."})
+    except UpstreamUnavailable as e:
+        print(e)
+        return JsonResponse({"status": "error", "message": UPSTREAM_UNAVAILABLE})
+    except (Throttled, blockcypher_api.RateLimitError):
+        return JsonResponse({"status": "error", "message": RATE_LIMITED})
     except Exception as e:
         print(e)
         return JsonResponse({"status": "error", "message": "Error getting confirmations"})
 
 
+@require_POST
+def get_confirmations_batch(request):
+    data = json.loads(request.body)
+    tx_hashes = data.get('hashes')
+
+    if not isinstance(tx_hashes, list) or not tx_hashes:
+        return JsonResponse({"status": "error", "message": "Missing transaction hashes"})
+
+    if len(tx_hashes) > settings.CONFIRMATION_BATCH_LIMIT:
+        return JsonResponse({"status": "error", "message": "Too many transaction hashes"})
+
+    if not all(isinstance(tx_hash, str) and is_valid_tx_hash(tx_hash) for tx_hash in tx_hashes):
+        return JsonResponse({"status": "error", "message": "Invalid transaction hash"})
+
+    for tx_hash in tx_hashes:
+        track_confirmations(tx_hash, verified=False)
+    # null means the transaction was just registered and is looked up on the tracker's next cycle
+    return JsonResponse({"status": "success", "confirmations": confirmation_tracker.statuses(tx_hashes)})
+
+
+@require_GET
+def stream_confirmations(request, tx_hash):
+    if not is_valid_tx_hash(tx_hash):
+        return JsonResponse({"status": "error", "message": "Invalid transaction hash"}, status=400)
+    try:
+        target = int(request.GET.get('target', 1))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid target"}, status=400)
+
+    # Our own queued broadcasts are tracked even before the outbox has pushed them
+    track_confirmations(tx_hash, verified=is_queued(tx_hash))
+    response = StreamingHttpResponse(
+        confirmation_events(confirmation_tracker, tx_hash, target, settings.CONFIRMATION_STREAM_TIMEOUT,
+                            retry=settings.CONFIRMATION_STREAM_RETRY),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+def get_upstream_stats(request):
+    return Response({**upstream_stats.snapshot(), "circuits": breakers.snapshot()})
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @api_view(['GET'])
 def get_addresses(request):
-    all_addresses = Address.objects.all()
-    serializer = AddressSerializer(all_addresses, many=True)
-    return Response(serializer.data)
+    export = request.query_params.get('export')
+    if export is not None and export not in EXPORT_CONTENT_TYPES:
+        return Response({"success": False, "message": "Unknown export format"}, status=400)
+
+    # Stored rows are all there is while upstream refreshes are failing fast
+    stale = breakers.is_open(*ADDRESS_REFRESH_OPERATIONS)
+    # Any write to the table bumps its version, so an unchanged list revalidates with one PK read
+    etag = table_etag(ADDRESSES, request.get_full_path() + (' stale' if stale else ''))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if export:
+            response = StreamingHttpResponse(export_addresses(export), content_type=EXPORT_CONTENT_TYPES[export])
+        else:
+            try:
+                limit = int(request.query_params.get('limit', settings.ADDRESS_LIST_DEFAULT_LIMIT))
+                rows, next_cursor = address_page(before=request.query_params.get('before'), limit=limit)
+            except ValueError:
+                return Response({"success": False, "message": "Invalid limit or cursor"}, status=400)
+            response = Response({"results": rows, "next": next_cursor, "stale": stale})
+    if stale:
+        response['Warning'] = STALE_WARNING
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api_view(['GET'])
+def search_addresses(request):
+    prefix = canonical_address(request.query_params.get('q', '').strip())
+    after = request.query_params.get('after') or None
+    try:
+        limit = int(request.query_params.get('limit', settings.ADDRESS_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({"success": False, "message": "Invalid limit"}, status=400)
+    addresses, next_cursor = search_address_index(prefix, after=after, limit=limit)
+    return Response({"results": [{"address": address} for address in addresses], "next": next_cursor})
+
+
+@api_view(['POST'])
+def validate_addresses(request):
+    addresses = request.data.get('addresses')
+    if not isinstance(addresses, list):
+        return Response({"success": False, "message": "Expected a list of addresses"}, status=400)
+    if len(addresses) > settings.ADDRESS_VALIDATION_BATCH_LIMIT:
+        return Response({"success": False,
+                         "message": "At most %d addresses per request" % settings.ADDRESS_VALIDATION_BATCH_LIMIT},
+                        status=400)
+    return Response({"success": True, "results": validate_address_batch(addresses, settings.COIN_SYMBOL)})
 
 
 @api_view(['POST'])
+@fail_fast
 def create_address(request):
     address = request.data.get('address')
-    try:
-        if not validate_address(address):
-            return Response({"success": False, "message": "Invalid address"})
-    except AssertionError as e:
-        print(e)
+    if not validate_address(address):
         return Response({"success": False, "message": "Invalid address"})
+    address = canonical_address(address)
+    # Check locally first so duplicates never cost an upstream call
+    if Address.objects.filter(address=address).exists():
+        return Response({"success": False, "message": "Address already exists!"})
     address_fields = fetch_new_data_for_address(address)
     try:
-        Address.objects.get(address=address)
+        with transaction.atomic():
+            Address.objects.create(**address_fields)
+    except IntegrityError as e:
+        # Another request added it between the check and the insert
+        print(e)
         return Response({"success": False, "message": "Address already exists!"})
-    except Address.DoesNotExist:
-        pass
-    Address.objects.create(**address_fields)
     return Response({"success": True, "message": "Address added successfully."})
 
 
+@api_view(['POST'])
+def import_addresses(request):
+    addresses = request.data.get('addresses')
+    if not isinstance(addresses, list):
+        return Response({"success": False, "message": "Expected a list of addresses"}, status=400)
+    if len(addresses) > settings.ADDRESS_IMPORT_MAX:
+        return Response({"success": False, "message": "At most %d addresses per request" % settings.ADDRESS_IMPORT_MAX},
+                        status=400)
+    return Response({"success": True, **bulk_import_addresses(addresses)})
+
+
+def load_address_entry(address):
+    book = Address.objects.get(address=address)
+    return make_entry(AddressSerializer(book).data, book.refreshed_at)
+
+
+def refresh_address_entry(address):
+    book = Address.objects.get(address=address)
+    with low_priority():
+        new_data = fetch_new_data_for_address(address)
+    setattr(book, "refreshed_at", datetime.now(timezone.utc))
+    for key, value in new_data.items():
+        setattr(book, key, value)
+    book.save()
+    return make_entry(AddressSerializer(book).data, book.refreshed_at)
+
+
+address_details_cache = StaleWhileRevalidateCache(
+    load_address_entry,
+    refresh_address_entry,
+    fresh_ttl=settings.ADDRESS_FRESH_TTL,
+    cache_ttl=settings.ADDRESS_CACHE_TTL,
+    maxsize=settings.ADDRESS_CACHE_SIZE,
+    max_workers=settings.ADDRESS_REFRESH_WORKERS,
+)
+
+
 @api_view(['GET'])
 def get_address_details(request, bookId):
     try:
-        try:
-            if not validate_address(bookId):
-                return Response({"success": False, "message": "Invalid address"})
-        except AssertionError as e:
-            print(e)
+        if not validate_address(bookId):
             return Response({"success": False, "message": "Invalid address"})
-        book = Address.objects.get(address=bookId)
 
-        if datetime.now(timezone.utc) - book.created_at > timedelta(minutes=30):
-            new_data = fetch_new_data_for_address(bookId)
-            setattr(book, "created_at", datetime.now(timezone.utc))
-            for key, value in new_data.items():
-                setattr(book, key, value)
-            book.save()
+        # Stale data is served as-is; the upstream refresh happens in the background
+        now = datetime.now(timezone.utc)
+        entry = address_details_cache.get(bookId, now)
 
-        serializer = AddressSerializer(book)
-        return Response(serializer.data)
+        if (now - entry.updated_at).total_seconds() > settings.ADDRESS_FRESH_TTL \
+                and breakers.is_open(*ADDRESS_REFRESH_OPERATIONS):
+            # The refresh cannot happen while the circuit is open; say that this copy is the last known one
+            response = Response({**entry.data, "stale": True})
+            response['Warning'] = STALE_WARNING
+        else:
+            response = get_conditional_response(request, etag=entry.etag,
+                                                last_modified=int(entry.updated_at.timestamp()))
+            if response is None:
+                response = Response(entry.data)
+        for header, value in entry_headers(entry).items():
+            response[header] = value
+        return response
     except Address.DoesNotExist as e:
         print(e)
         return Response({"error": "Address not found"}, status=404)
-    except AssertionError as e:
+
+
+@api_view(['GET'])
+def get_address_history(request, bookId):
+    if not validate_address(bookId):
+        return Response({"success": False, "message": "Invalid address"})
+    try:
+        book = Address.objects.get(address=bookId)
+    except Address.DoesNotExist as e:
         print(e)
-        return Response({"error": "Address not valid"}, status=404)
+        return Response({"error": "Address not found"}, status=404)
+
+    before = request.query_params.get('before')
+    try:
+        limit = int(request.query_params.get('limit', settings.HISTORY_PAGE_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({"success": False, "message": "Invalid limit"}, status=400)
+
+    unconfirmed = []
+    if before is None:
+        # Only the first page pulls the (small) upstream delta; later pages are pure index reads
+        try:
+            unconfirmed = unconfirmed_txrefs(book)
+        except Exception as e:
+            print(e)
+    try:
+        txrefs, next_cursor = history_page(book, before=before, limit=limit)
+    except ValueError:
+        return Response({"success": False, "message": "Invalid cursor"}, status=400)
+    return Response({"unconfirmed_txrefs": unconfirmed, "txrefs": txrefs, "next": next_cursor})
+
+
+@require_safe
+def static_file(request, path):
+    asset = asset_finder.find(path)
+    if asset is None:
+        raise Http404("No such file")
+    return asset_response(request, asset)
+
+
+@require_safe
+@ensure_csrf_cookie
+def index(request, path=''):
+    # Top-level build files (favicon.ico, manifest.json, ...); any other path is a client-side route
+    if path and '/' not in path and path != 'index.html':
+        asset = root_finder.find(path)
+        if asset is not None:
+            return asset_response(request, asset)
+
+    # Rendered once per process; the CSRF cookie comes from ensure_csrf_cookie, not the page
+    variants, etag = index_page.get()
+    encoding = best_encoding(request, variants)
+    if encoding is not None:
+        etag = '%s-%s"' % (etag[:-1], encoding)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(variants[encoding], content_type='text/html; charset=utf-8')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = REVALIDATE
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -40,14 +40,33 @@ CustomOption.propTypes = {
 };
 
 
-function AddressDropdown({ placeholder, fetchEndpoint, createEndpoint, onAddressChange: onAddressChangeProp }) {
+function AddressDropdown({ placeholder, searchEndpoint, createEndpoint, onAddressChange: onAddressChangeProp }) {
     const [options, setOptions] = useState([]);
+    const [query, setQuery] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [isLoading, setIsLoading] = useState(false);
+
+    const searchAddresses = (q, after) => {
+        const params = new URLSearchParams({ q });
+        if (after) {
+            params.append('after', after);
+        }
+        setIsLoading(true);
+        return fetch(`${searchEndpoint}?${params.toString()}`)
+            .then(response => response.json())
+            .then(data => {
+                const page = data.results.map(item => ({ label: item.address, value: item.address }));
+                setOptions(prevOptions => (after ? [...prevOptions, ...page] : page));
+                setNextCursor(data.next);
+            })
+            .finally(() => setIsLoading(false));
+    };
 
     useEffect(() => {
-        fetch(fetchEndpoint)
-            .then(response => response.json())
-            .then(data => setOptions(data.map(item => ({ label: item.address, value: item.address }))));
-    }, [fetchEndpoint]);
+        // Debounce keystrokes so typing an address costs one request, not one per character
+        const timer = setTimeout(() => searchAddresses(query, null), 250);
+        return () => clearTimeout(timer);
+    }, [searchEndpoint, query]);
 
     const handleCreateOption = (inputValue) => {
         fetch(createEndpoint, {
@@ -77,6 +96,18 @@ function AddressDropdown({ placeholder, fetchEndpoint, createEndpoint, onAddress
                 onAddressChangeProp(selectedOption ? selectedOption.value : '');
             }}
             onCreateOption={handleCreateOption}  // Add this prop
+            onInputChange={(inputValue, { action }) => {
+                if (action === 'input-change') {
+                    setQuery(inputValue);
+                }
+            }}
+            onMenuScrollToBottom={() => {
+                if (nextCursor && !isLoading) {
+                    searchAddresses(query, nextCursor);
+                }
+            }}
+            filterOption={null}
+            isLoading={isLoading}
             isClearable
             name={placeholder.toLowerCase().replace(" ", "")}
             components={{
@@ -94,7 +125,7 @@ function AddressDropdown({ placeholder, fetchEndpoint, createEndpoint, onAddress
 }
 AddressDropdown.propTypes = {
     placeholder: PropTypes.string.isRequired,
-    fetchEndpoint: PropTypes.string.isRequired,
+    searchEndpoint: PropTypes.string.isRequired,
     createEndpoint: PropTypes.string.isRequired,
     onAddressChange: PropTypes.func.isRequired
 };
@@ -107,10 +138,6 @@ function createWallet() {
         privateKey: keyPair.toWIF()
     };
 }
-function sleep(ms) {
-  return new Promise(resolve => setTimeout(resolve, ms));
-}
-
 function BitcoinTransaction() {
     const [toAddress, setToAddress] = useState('');
     const [fromAddress, setFromAddress] = useState('');
@@ -147,27 +174,43 @@ function BitcoinTransaction() {
         return !isNaN(amt) && parseFloat(amt) > 0;
     };
 
-    const signTransaction = (txid, txout, txHex, to_address, amount_in_satoshis, privateKey) => {
+    const signTransaction = (unsignedTx, privateKey) => {
 
-        const psbt = new bitcoin.Psbt({network:TESTNET});
-        psbt.addInput({
-            hash: txid, // reverse order of txid
-            index: txout,  // the output index
-            nonWitnessUtxo: Buffer.from(txHex, 'hex'),
-        });
-        psbt.addOutput({
-            address: to_address,
-            value: amount_in_satoshis,
-        });
+        const psbt = unsignedTx.psbt
+            ? bitcoin.Psbt.fromBase64(unsignedTx.psbt, {network:TESTNET})  // built server-side
+            : legacyPsbt(unsignedTx);
 
         const keyPair = ECPair.fromWIF(privateKey, TESTNET);
-        psbt.signInput(0, keyPair);
+        psbt.signAllInputs(keyPair);
         psbt.finalizeAllInputs();
         const finalTransaction = psbt.extractTransaction();
 
         return finalTransaction.toHex();
     }
 
+    const legacyPsbt = (unsignedTx) => {
+
+        const psbt = new bitcoin.Psbt({network:TESTNET});
+        unsignedTx.inputs.forEach(input => {
+            psbt.addInput({
+                hash: input.txid, // reverse order of txid
+                index: input.output_n,  // the output index
+                nonWitnessUtxo: Buffer.from(input.tx_hex, 'hex'),
+            });
+        });
+        psbt.addOutput({
+            address: unsignedTx.to_address,
+            value: unsignedTx.amount,
+        });
+        if (unsignedTx.change > 0) {
+            psbt.addOutput({
+                address: unsignedTx.change_address,
+                value: unsignedTx.change,
+            });
+        }
+        return psbt;
+    }
+
     const broadcastTransaction = (signedTx) => {
 
         fetch('/broadcast_bitcoin/', {
@@ -199,42 +242,29 @@ function BitcoinTransaction() {
     const getConfirmations = (txHash) => {
         setLoading(true);
 
-        fetch('/get_confirmations/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCookie('csrftoken') // Include CSRF token if needed
-            },
-            body: JSON.stringify({
-                hash: txHash
-            })
-        })
-        .then(response => response.json())
-        .then(data => {
-
-            if (data.status === 'success') {
-                if (data.confirmations < 1)
-                {
-                    return sleep(10000) // Wait for 10 seconds
-                        .then(() => getConfirmations(txHash));
-                }
-                else
-                {
-                    setLoading(false);
-                    alert("Transaction confirmed!");
-                    console.log("Transaction confirmed");
-                }
-            } else {
+        // The server watches new blocks and pushes the count, so there is nothing to poll here
+        const events = new EventSource(`/get_confirmations/stream/${txHash}/`);
+        events.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.error) {
+                events.close();
+                setLoading(false);
                 alert("Could not confirm transaction")
-                console.error("Error broadcasting transaction:", data.message);
+                console.error("Error:", data.error);
+            } else if (data.confirmations >= 1) {
+                events.close();
+                setLoading(false);
+                alert("Transaction confirmed!");
+                console.log("Transaction confirmed");
             }
-        })
-        .catch(error => {
-            setLoading(false);
-
-            alert("Could not confirm transaction")
-            console.error("Error:", error);
-        });
+        };
+        events.onerror = (error) => {
+            if (events.readyState === EventSource.CLOSED) {
+                setLoading(false);
+                alert("Could not confirm transaction")
+                console.error("Error:", error);
+            }
+        };
     }
 
 
@@ -282,12 +312,13 @@ function BitcoinTransaction() {
             body: JSON.stringify({
                 to_address: toAddress,
                 from_address: fromAddress,
-                amount: amount
+                amount: amount,
+                format: 'psbt'
             })
         })
         .then(response => response.json())
         .then(data => {
-            const signedTx = signTransaction(data.message[0],data.message[1],data.message[2],data.message[3],data.message[4], privateKeyValue);
+            const signedTx = signTransaction(data.message, privateKeyValue);
             // After signing, call the broadcast_signed_transaction endpoint
             broadcastTransaction(signedTx);
         })
@@ -306,14 +337,14 @@ function BitcoinTransaction() {
             <div className="input-group">
                 <AddressDropdown
                     placeholder="To Address"
-                    fetchEndpoint="/path/to/get_addresses_endpoint/"
+                    searchEndpoint="/path/to/search_addresses_endpoint/"
                     createEndpoint="/path/to/create_address_endpoint/"
                     onAddressChange={setToAddress}
 
                 />
                 <AddressDropdown
                     placeholder="From Address"
-                    fetchEndpoint="/path/to/get_addresses_endpoint/"
+                    searchEndpoint="/path/to/search_addresses_endpoint/"
                     createEndpoint="/path/to/create_address_endpoint/"
                     onAddressChange={setFromAddress}
                 />